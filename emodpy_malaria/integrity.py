@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+Integrity index module, implementing a sidecar file which records the size and hashes of an EMOD binary input file
+(.bin) and its metadata file (.bin.json), like weather and vector migration files.
+
+The index allows checking whether a binary file is complete and matches its metadata without parsing either file.
+For binary file "name.bin" the index file is "name.integrity.json".
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Dict, Iterator, Union
+
+_INDEX_SUFFIX = ".integrity.json"
+_HASH_ALGORITHM = "blake2b"
+_CHUNK_SIZE = 1 << 20           # Number of bytes read at once when hashing files.
+
+_SIZE = "Size"
+_MTIME = "ModifiedTimeNs"
+_DATA_HASH = "DataHash"
+_METADATA_HASH = "MetadataHash"
+_ALGORITHM = "HashAlgorithm"
+
+# Permissions of replaced files, the same as of files created with open(), as temp files are only user-accessible.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_FILE_MODE = 0o666 & ~_UMASK
+
+
+@contextmanager
+def atomic_write(file_path: Union[str, Path], mode: str = "wb") -> Iterator[IO]:
+    """
+    Open a temp file in the directory of the given file for writing and, once written without errors, move it to
+    the file path. The file is replaced rather than modified in place, so readers never see a partially written file
+    and other hardlinks to the previous file (e.g. shared weather files) keep the previous content.
+
+        **Example**::
+
+            with atomic_write("path/to/file.bin") as file:
+                data.tofile(file)
+
+    Args:
+        file_path: The file path.
+        mode: (Optional) The file open mode, "wb" (the default) or "wt".
+
+    Returns:
+        Context manager providing the open temp file.
+    """
+    file_path = Path(file_path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent)
+    try:
+        with os.fdopen(fd, mode) as file:
+            yield file
+
+        os.chmod(temp_path, _FILE_MODE)
+        os.replace(temp_path, file_path)
+    finally:
+        if Path(temp_path).exists():
+            Path(temp_path).unlink()
+
+
+def index_path(binary_file: Union[str, Path]) -> Path:
+    """Construct the integrity index file path for the given binary file path."""
+    return Path(binary_file).with_suffix(_INDEX_SUFFIX)
+
+
+def hash_file(file_path: Union[str, Path]) -> str:
+    """
+    Calculate file content hash, reading the file in chunks.
+
+    Args:
+        file_path: The file path.
+
+    Returns:
+        Hash value, as a hex string.
+    """
+    h = hashlib.blake2b()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def write_index(binary_file: Union[str, Path], metadata_file: Union[str, Path] = None) -> Path:
+    """
+    Create an integrity index file for the given binary and metadata files.
+
+    Args:
+        binary_file: The binary (.bin) file path.
+        metadata_file: (Optional) The metadata file path. The default is the binary file path with ".json" appended.
+
+    Returns:
+        The index file path.
+    """
+    binary_file = Path(binary_file)
+    metadata_file = Path(metadata_file or f"{binary_file}.json")
+    stat = binary_file.stat()
+    content = {
+        _SIZE: stat.st_size,
+        _MTIME: stat.st_mtime_ns,
+        _DATA_HASH: hash_file(binary_file),
+        _METADATA_HASH: hash_file(metadata_file),
+        _ALGORITHM: _HASH_ALGORITHM}
+
+    file_path = index_path(binary_file)
+    with atomic_write(file_path, "wt") as file:
+        file.write(json.dumps(content, indent=2))
+
+    return file_path
+
+
+def read_index(binary_file: Union[str, Path]) -> Union[Dict[str, Union[int, str]], None]:
+    """Read the integrity index of the given binary file, or return None if the index doesn't exist or is invalid."""
+    file_path = index_path(binary_file)
+    try:
+        content = json.loads(file_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+    required = [_SIZE, _MTIME, _DATA_HASH, _METADATA_HASH]
+    is_valid = isinstance(content, dict) and all(k in content for k in required)
+    return content if is_valid and content.get(_ALGORITHM) == _HASH_ALGORITHM else None
+
+
+def verify(binary_file: Union[str, Path], metadata_file: Union[str, Path] = None, deep: bool = False) -> Union[bool, None]:
+    """
+    Verify the binary and metadata files match their integrity index. The binary file size and the metadata hash
+    are always checked. The binary file content is hashed only if its modification time changed or 'deep' is set.
+
+    Args:
+        binary_file: The binary (.bin) file path.
+        metadata_file: (Optional) The metadata file path. The default is the binary file path with ".json" appended.
+        deep: (Optional) Flag forcing the binary file content to be hashed, regardless of its modification time.
+
+    Returns:
+        True if files match the index, False if they don't or are missing, None if there is no index.
+    """
+    index = read_index(binary_file)
+    if index is None:
+        return None
+
+    binary_file = Path(binary_file)
+    metadata_file = Path(metadata_file or f"{binary_file}.json")
+    if not binary_file.is_file() or not metadata_file.is_file():
+        return False
+
+    stat = binary_file.stat()
+    if stat.st_size != index[_SIZE] or hash_file(metadata_file) != index[_METADATA_HASH]:
+        return False
+
+    if not deep and stat.st_mtime_ns == index[_MTIME]:
+        return True
+
+    return hash_file(binary_file) == index[_DATA_HASH]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Node offsets module, implementing the codec for the "NodeOffsets" string used by EMOD binary input files metadata
+(.bin.json), like weather and vector migration files.
+
+The string is a sequence of 16 hex characters per node: 8 for the node id followed by 8 for the byte offset
+of that node's data in the binary file, both representing unsigned 32-bit integers.
+"""
+
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+_ENTRY_LEN = 16                 # Number of hex characters per node offset entry.
+_ENTRY_DTYPE = np.dtype(">u4")  # Node ids and offsets are stored as big-endian (most significant digit first) uint32.
+
+
+def encode_node_offsets(node_ids: Iterable[int], offsets: Iterable[int]) -> str:
+    """
+    Encode node ids and corresponding offsets into a node offsets string.
+
+    Args:
+        node_ids: Node ids, as an array or an iterable of integers.
+        offsets: Node offsets, as an array or an iterable of integers, in the same order as node ids.
+
+    Returns:
+        The node offsets string, as it appears in the metadata file.
+    """
+    node_ids = np.fromiter(node_ids, dtype=np.int64) if not isinstance(node_ids, np.ndarray) else node_ids
+    offsets = np.fromiter(offsets, dtype=np.int64) if not isinstance(offsets, np.ndarray) else offsets
+    if node_ids.shape != offsets.shape:
+        raise ValueError("The number of node ids and offsets must be the same.")
+
+    entries = np.empty((len(node_ids), 2), dtype=_ENTRY_DTYPE)
+    entries[:, 0] = node_ids
+    entries[:, 1] = offsets
+    return entries.tobytes().hex()
+
+
+def decode_node_offsets(offset_str: str, count: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode node offsets string into arrays of node ids and offsets.
+
+    Args:
+        offset_str: The node offsets string.
+        count: (Optional) The expected number of nodes. If specified, the string length is validated.
+
+    Returns:
+        Tuple of uint32 arrays of node ids and corresponding offsets, in the order they appear in the string.
+    """
+    if count is not None and len(offset_str) != _ENTRY_LEN * count:
+        raise ValueError(f"Length of node offsets string {len(offset_str)} != {_ENTRY_LEN} * node count {count}.")
+
+    entry_count = len(offset_str) // _ENTRY_LEN
+    entries = np.frombuffer(bytes.fromhex(offset_str[:entry_count * _ENTRY_LEN]), dtype=_ENTRY_DTYPE)
+    entries = entries.reshape(-1, 2).astype(np.uint32)
+    return entries[:, 0], entries[:, 1]
+
+
+def node_offsets_to_str(node_offsets: Dict[int, int]) -> str:
+    """
+    Encode node-offset dictionary into a node offsets string.
+
+    Args:
+        node_offsets: Dictionary with node ids as keys and offsets as values.
+
+    Returns:
+        The node offsets string, as it appears in the metadata file.
+    """
+    count = len(node_offsets)
+    node_ids = np.fromiter(node_offsets.keys(), dtype=np.int64, count=count)
+    offsets = np.fromiter(node_offsets.values(), dtype=np.int64, count=count)
+    return encode_node_offsets(node_ids, offsets)
+
+
+def str_to_node_offsets(offset_str: str, count: int = None) -> Dict[int, int]:
+    """
+    Decode node offsets string into a node-offset dictionary.
+
+    Args:
+        offset_str: The node offsets string.
+        count: (Optional) The expected number of nodes. If specified, the string length is validated.
+
+    Returns:
+        Dictionary with node ids as keys and offsets as values.
+    """
+    node_ids, offsets = decode_node_offsets(offset_str, count=count)
+    return dict(zip(node_ids.tolist(), offsets.tolist()))
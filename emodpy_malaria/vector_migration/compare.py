@@ -0,0 +1,165 @@
+"""
+Comparison of vector migration files, reporting added and removed edges (source and destination node pairs),
+rate changes and changes in destinations truncated by the value limit, for each layer.
+Files are compared as arrays (see vector_migration.read_arrays()), so millions of edges are compared in seconds.
+
+Usage:
+    python -m emodpy_malaria.vector_migration.compare old.bin new.bin [--atol 0] [--json report.json]
+"""
+
+import argparse
+import json
+
+from pathlib import Path
+
+import numpy as np
+
+from emodpy_malaria.vector_migration.vector_migration import MigrationArrays, read_arrays
+
+
+def compare_arrays(old: MigrationArrays, new: MigrationArrays, atol: float = 0.0) -> dict:
+    """
+    Compare migration data of two files, layer by layer. Edges are source and destination node pairs with rate > 0.
+    If a file contains the same edge more than once, only its last rate is used (as from_file() does).
+
+    For each layer the report contains:
+        - edge counts of both files and the number of added, removed and common edges
+        - the number of common edges with changed rates (by more than 'atol'), max absolute and relative rate deltas
+          and mean absolute and relative rate deltas of changed rates (relative deltas are relative to old rates)
+        - the number of source nodes using all DatavalueCount destinations in each file (possibly truncated by
+          the value limit) and the number of removed edges whose source node uses all destinations in the new file,
+          which were likely truncated rather than removed
+
+    Args:
+        old: Migration arrays of the old file.
+        new: Migration arrays of the new file.
+        atol: (Optional) Absolute tolerance, rate deltas within it are not counted as changes. The default is 0.
+
+    Returns:
+        Dictionary containing metadata of both files and a list of layer reports.
+    """
+    report = {"old": _summary(old), "new": _summary(new), "layers": []}
+    for index in range(min(old.layer_count, new.layer_count)):
+        report["layers"].append(_compare_layer(old, new, index, atol))
+
+    return report
+
+
+def compare_files(old_file: Path, new_file: Path, atol: float = 0.0) -> dict:
+    """
+    Compare two migration files, see compare_arrays(). Metadata files are expected next to binary files.
+
+    Args:
+        old_file: Path to the old migration binary file.
+        new_file: Path to the new migration binary file.
+        atol: (Optional) Absolute tolerance, rate deltas within it are not counted as changes. The default is 0.
+
+    Returns:
+        Dictionary containing metadata of both files and a list of layer reports.
+    """
+    return compare_arrays(read_arrays(old_file), read_arrays(new_file), atol=atol)
+
+
+def format_report(report: dict) -> str:
+    """Format the comparison report as text, one block per layer."""
+    lines = []
+    for name in ["old", "new"]:
+        s = report[name]
+        lines.append(f"{name}: layers={s['layers']} nodes={s['nodes']} datavalue_count={s['datavalue_count']} "
+                     f"id_reference={s['id_reference']}")
+    if report["old"]["layers"] != report["new"]["layers"]:
+        lines.append(f"Layer counts differ, only the first {len(report['layers'])} layers are compared.")
+
+    for r in report["layers"]:
+        lines.append(f"layer {r['layer']}:")
+        lines.append(f"  edges:     old={r['old_edges']} new={r['new_edges']} added={r['added_edges']} "
+                     f"removed={r['removed_edges']} common={r['common_edges']}")
+        lines.append(f"  nodes:     added={r['added_nodes']} removed={r['removed_nodes']}")
+        lines.append(f"  rates:     changed={r['changed_rates']} max_delta={r['max_delta']:.6g} "
+                     f"mean_delta={r['mean_delta']:.6g} max_relative_delta={r['max_relative_delta']:.6g} "
+                     f"mean_relative_delta={r['mean_relative_delta']:.6g}")
+        lines.append(f"  truncated: old_full_nodes={r['old_full_nodes']} new_full_nodes={r['new_full_nodes']} "
+                     f"removed_from_full_nodes={r['removed_from_full_nodes']}")
+
+    return "\n".join(lines)
+
+
+def _summary(arrays: MigrationArrays) -> dict:
+    """File properties included in the report."""
+    return {"layers": arrays.layer_count,
+            "nodes": len(arrays.node_ids),
+            "datavalue_count": arrays.rates.shape[-1],
+            "id_reference": arrays.metadata.get("IdReference", ""),
+            "migration_type": arrays.metadata.get("MigrationType", "")}
+
+
+def _compare_layer(old: MigrationArrays, new: MigrationArrays, index: int, atol: float) -> dict:
+    """Compare edges and rates of a layer."""
+    old_keys, old_rates = _edge_keys(*old.edges(index))
+    new_keys, new_rates = _edge_keys(*new.edges(index))
+    old_sources, new_sources = old_keys >> 32, new_keys >> 32
+    _, old_common, new_common = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+    is_removed = ~np.isin(old_keys, new_keys, assume_unique=True)
+
+    deltas = np.abs(new_rates[new_common] - old_rates[old_common])
+    relative_deltas = deltas / old_rates[old_common]
+    is_changed = deltas > atol
+
+    # source nodes using all destinations, which may have had more destinations than the value limit
+    old_full = old.node_ids[np.count_nonzero(old.rates[index] > 0, axis=-1) == old.rates.shape[-1]]
+    new_full = new.node_ids[np.count_nonzero(new.rates[index] > 0, axis=-1) == new.rates.shape[-1]]
+    old_nodes, new_nodes = np.unique(old_sources), np.unique(new_sources)
+
+    return {"layer": index,
+            "old_edges": len(old_keys),
+            "new_edges": len(new_keys),
+            "added_edges": len(new_keys) - len(new_common),
+            "removed_edges": len(old_keys) - len(old_common),
+            "common_edges": len(old_common),
+            "added_nodes": len(np.setdiff1d(new_nodes, old_nodes)),
+            "removed_nodes": len(np.setdiff1d(old_nodes, new_nodes)),
+            "changed_rates": int(np.count_nonzero(is_changed)),
+            "max_delta": float(deltas.max()) if len(deltas) else 0.0,
+            "mean_delta": float(deltas[is_changed].mean()) if np.any(is_changed) else 0.0,
+            "max_relative_delta": float(relative_deltas.max()) if len(deltas) else 0.0,
+            "mean_relative_delta": float(relative_deltas[is_changed].mean()) if np.any(is_changed) else 0.0,
+            "old_full_nodes": len(old_full),
+            "new_full_nodes": len(new_full),
+            "removed_from_full_nodes": int(np.count_nonzero(np.isin(old_sources[is_removed], new_full)))}
+
+
+def _edge_keys(sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray) -> tuple:
+    """Sorted unique edge keys and their rates, keeping the last rate of duplicate edges."""
+    # node ids are uint32, so a pair of them is a unique 64 bit key
+    keys = (sources << 32) | destinations
+    keys, last = np.unique(keys[::-1], return_index=True)
+    return keys, rates[::-1][last]
+
+
+def main(args: list = None) -> dict:
+    """
+    Command line entry point, comparing two migration files and printing the report (see module usage).
+
+    Args:
+        args: (Optional) Command line arguments. The default are arguments of the current process (sys.argv).
+
+    Returns:
+        Dictionary containing metadata of both files and a list of layer reports.
+    """
+    parser = argparse.ArgumentParser(description="Compare two vector migration files.")
+    parser.add_argument("old", type=Path, help="old migration binary file (.bin)")
+    parser.add_argument("new", type=Path, help="new migration binary file (.bin)")
+    parser.add_argument("--atol", type=float, default=0.0, help="rate deltas within this tolerance are not changes")
+    parser.add_argument("--json", type=Path, default=None, help="also save the report into this JSON file")
+    args = parser.parse_args(args)
+
+    report = compare_files(args.old, args.new, atol=args.atol)
+    print(format_report(report))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    return report
+
+
+if __name__ == '__main__':
+    main()
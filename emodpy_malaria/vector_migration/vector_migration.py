@@ -1,25 +1,28 @@
 from collections import defaultdict
+from collections.abc import Mapping
 from datetime import datetime
-from functools import partial
 import json
 from numbers import Integral
-from os import environ, SEEK_SET
+from os import environ
 from pathlib import Path
 from platform import system
+from typing import Union
 from warnings import warn
 
 import numpy as np
 import csv
 
 # for from_params()
+import scipy.sparse as spsparse
 import scipy.spatial.distance as spspd
 from emod_api.demographics import Demographics as Demog
 
-# for from_demog_and_param_gravity()
-from geographiclib.geodesic import Geodesic
-
 from emod_api.migration.client import client
 
+from emodpy_malaria.integrity import write_index
+from emodpy_malaria.vector_migration.gravity import gravity_migration
+from emodpy_malaria.node_offsets import decode_node_offsets, node_offsets_to_str
+
 
 class Layer(dict):
     """
@@ -34,6 +37,21 @@ class Layer(dict):
 
         return
 
+    def to_arrays(self) -> tuple:
+        """Get rates of this layer as arrays of source node ids, destination node ids and rates
+
+        Returns:
+            Tuple of arrays (sources, destinations, rates), ordered by source node id
+        """
+        counts = np.fromiter((len(entry) for entry in self.values()), dtype=np.int64, count=len(self))
+        sources = np.repeat(np.fromiter(self.keys(), dtype=np.int64, count=len(self)), counts)
+        destinations = np.fromiter((d for entry in self.values() for d in entry.keys()), dtype=np.int64,
+                                   count=counts.sum())
+        rates = np.fromiter((r for entry in self.values() for r in entry.values()), dtype=np.float64,
+                            count=counts.sum())
+        order = np.argsort(sources, kind="stable")
+        return sources[order], destinations[order], rates[order]
+
     @property
     def DatavalueCount(self) -> int:
         """Get (maximum) number of data values for any node in this layer
@@ -72,6 +90,128 @@ class Layer(dict):
         return super().__getitem__(key)
 
 
+class ArrayLayer(Mapping):
+    """
+    Read-only layer of rates kept in compressed sparse row (CSR) arrays, built in bulk from (source, destination, rate)
+    arrays or a scipy.sparse matrix, see from_arrays() and from_sparse(). Indexing a source node id returns a new
+    dictionary of its outbound rates, so no per-pair Python objects are kept.
+
+    VectorMigration keeps an ArrayLayer (see VectorMigration.set_layer()) until rates are indexed through the
+    migration object, e.g. migration[source_id][destination_id], which replaces it with an equivalent Layer.
+    """
+
+    def __init__(self, node_ids: np.ndarray, indptr: np.ndarray, destinations: np.ndarray, rates: np.ndarray):
+        """Create a layer from CSR arrays, use from_arrays() or from_sparse() instead
+
+        Args:
+            node_ids: sorted unique source node ids
+            indptr: row pointers, rates of node_ids[i] are at indptr[i]:indptr[i + 1]
+            destinations: destination node ids
+            rates: migration rates from source to destination nodes
+        """
+        self._node_ids = node_ids
+        self._indptr = indptr
+        self._destinations = destinations
+        self._rates = rates
+        for array in [node_ids, indptr, destinations, rates]:
+            array.flags.writeable = False
+
+        return
+
+    @classmethod
+    def from_arrays(cls, sources, destinations, rates) -> "ArrayLayer":
+        """Create a layer from arrays of source node ids, destination node ids and rates (one entry per pair)
+
+        Args:
+            sources: source node ids
+            destinations: destination node ids
+            rates: migration rates from source to destination nodes
+
+        Returns:
+            ArrayLayer object
+        """
+        sources = np.asarray(sources, dtype=np.int64).reshape(-1)
+        destinations = np.asarray(destinations, dtype=np.int64).reshape(-1)
+        rates = np.asarray(rates, dtype=np.float64).reshape(-1)
+        if not (len(sources) == len(destinations) == len(rates)):
+            raise ValueError("Sources, destinations and rates must have the same length.")
+
+        # Rows ordered by source and destination node ids.
+        order = np.lexsort((destinations, sources))
+        sources, destinations, rates = sources[order], destinations[order], rates[order]
+        duplicates = (sources[1:] == sources[:-1]) & (destinations[1:] == destinations[:-1])
+        if np.any(duplicates):
+            i = np.flatnonzero(duplicates)[0]
+            raise ValueError(f"Duplicate rate for source {sources[i]} and destination {destinations[i]}.")
+
+        node_ids, starts = np.unique(sources, return_index=True)
+        indptr = np.append(starts, len(sources))
+
+        return cls(node_ids, indptr, destinations, rates)
+
+    @classmethod
+    def from_sparse(cls, matrix, node_ids=None) -> "ArrayLayer":
+        """Create a layer from a scipy.sparse matrix of rates, having source nodes as rows and destinations as columns
+
+        Args:
+            matrix: scipy.sparse matrix (or array), entries which are not stored are not included in the layer
+            node_ids: node ids corresponding to matrix row/column indices, default: indices are node ids
+
+        Returns:
+            ArrayLayer object
+        """
+        coo = spsparse.coo_matrix(matrix)
+        rows, columns = coo.row.astype(np.int64), coo.col.astype(np.int64)
+        if node_ids is not None:
+            node_ids = np.asarray(node_ids, dtype=np.int64)
+            rows, columns = node_ids[rows], node_ids[columns]
+
+        return cls.from_arrays(rows, columns, coo.data)
+
+    def to_arrays(self) -> tuple:
+        """Get rates of this layer as arrays of source node ids, destination node ids and rates
+
+        Returns:
+            Tuple of (read-only) arrays (sources, destinations, rates), ordered by source node id
+        """
+        return np.repeat(self._node_ids, np.diff(self._indptr)), self._destinations, self._rates
+
+    def to_layer(self) -> Layer:
+        """Create a Layer, with a dictionary of outbound rates for each source node
+
+        Returns:
+            Layer object with the same rates
+        """
+        layer = Layer()
+        for node in self:
+            layer[node].update(self[node])
+
+        return layer
+
+    @property
+    def DatavalueCount(self) -> int:
+        """int: (maximum) number of data values for any node in this layer"""
+        return int(np.max(np.diff(self._indptr))) if len(self) else 0
+
+    @property
+    def NodeCount(self) -> int:
+        """int: number of (source) nodes with rates in this layer"""
+        return len(self)
+
+    def __getitem__(self, key) -> dict:
+        row = np.searchsorted(self._node_ids, key) if isinstance(key, Integral) else len(self)
+        if row == len(self) or self._node_ids[row] != key:
+            raise KeyError(key)
+        entries = slice(self._indptr[row], self._indptr[row + 1])
+        return dict(zip(self._destinations[entries].tolist(), self._rates[entries].tolist()))
+
+    def __iter__(self):
+        return iter(self._node_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._node_ids)
+
+
 _METADATA = "Metadata"
 _AUTHOR = "Author"
 _DATECREATED = "DateCreated"
@@ -115,6 +255,8 @@ class VectorMigration(object):
     LOCAL_MIGRATION = 1
     REGIONAL_MIGRATION = 3
 
+    IDREF_LEGACY = "Legacy"
+
     def __init__(self):
 
         self._agesyears = []
@@ -310,7 +452,7 @@ class VectorMigration(object):
         if self.GenderDataType == VectorMigration.SAME_FOR_BOTH_GENDERS:
             if not self.AgesYears:
                 # Case 1 - no gender or age differentiation - key (integer) == node id
-                return self._layers[0][key]
+                return self._layer(0)[key]
             else:
                 # Case 3 - age buckets, no gender differentiation - key (tuple or slice) == node id:age
                 if isinstance(key, tuple):
@@ -320,7 +462,7 @@ class VectorMigration(object):
                 else:
                     raise RuntimeError(f"Invalid indexing for migration - {key}")
                 layer_index = self._index_for_gender_and_age(None, age)
-                return self._layers[layer_index][node_id]
+                return self._layer(layer_index)[node_id]
         else:
             if not self.AgesYears:
                 # Case 2 - by gender, no age differentiation - key (tuple or slice) == node id:gender
@@ -333,7 +475,7 @@ class VectorMigration(object):
                 if gender not in [VectorMigration.SAME_FOR_BOTH_GENDERS, VectorMigration.ONE_FOR_EACH_GENDER]:
                     raise RuntimeError(f"Invalid gender ({gender}) for migration.")
                 layer_index = self._index_for_gender_and_age(gender, None)
-                return self._layers[layer_index][node_id]
+                return self._layer(layer_index)[node_id]
             else:
                 # Case 4 - by gender and age - key (slice) == node id:gender:age
                 if isinstance(key, tuple):
@@ -345,7 +487,13 @@ class VectorMigration(object):
                 if gender not in [VectorMigration.SAME_FOR_BOTH_GENDERS, VectorMigration.ONE_FOR_EACH_GENDER]:
                     raise RuntimeError(f"Invalid gender ({gender}) for migration.")
                 layer_index = self._index_for_gender_and_age(gender, age)
-                return self._layers[layer_index][node_id]
+                return self._layer(layer_index)[node_id]
+
+    def _layer(self, index: int) -> Layer:
+        """Get a layer for item access, replacing an ArrayLayer with an equivalent Layer first."""
+        if isinstance(self._layers[index], ArrayLayer):
+            self._layers[index] = self._layers[index].to_layer()
+        return self._layers[index]
 
     def _index_for_gender_and_age(self, gender: int, age: float) -> int:
         """
@@ -365,6 +513,19 @@ class VectorMigration(object):
     def __iter__(self):
         return iter(self._layers)
 
+    def set_layer(self, layer: Union[Layer, ArrayLayer], gender: int = 0, age: float = 0) -> None:
+        """Replace the layer for given gender and age, e.g. with a layer built from arrays (see ArrayLayer)
+
+        Args:
+            layer (Layer or ArrayLayer): layer of rates
+            gender (int): gender, used if GenderDataType is ONE_FOR_EACH_GENDER
+            age (float): age, used if AgesYears are set
+        """
+        if not isinstance(layer, (Layer, ArrayLayer)):
+            raise RuntimeError(f"Migration layer must be a Layer or ArrayLayer object (got {type(layer)}).")
+        self._layers[self._index_for_gender_and_age(gender, age)] = layer
+        return
+
     _MIGRATION_TYPE_ENUMS = {
         LOCAL_MIGRATION: "LOCAL_MIGRATION",
         REGIONAL_MIGRATION: "REGIONAL_MIGRATION"
@@ -380,7 +541,7 @@ class VectorMigration(object):
     }
 
     def to_file(self, binaryfile: Path, metafile: Path = None, value_limit: int = 100):
-        """Write current data to given file (and .json metadata file)
+        """Write current data to given file (and .json metadata file and integrity index file)
 
         Args:
             binaryfile (Path): path to output file (metadata will be written to same path with ".json" appended)
@@ -401,7 +562,7 @@ class VectorMigration(object):
         node_ids = sorted(node_ids)
 
         offsets = self.get_node_offsets(actual_datavalue_count)
-        node_offsets_string = ''.join([f"{node:08x}{offsets[node]:08x}" for node in sorted(offsets.keys())])
+        node_offsets_string = node_offsets_to_str(dict(sorted(offsets.items())))
 
         metadata = {
             _METADATA: {
@@ -418,42 +579,60 @@ class VectorMigration(object):
         if self.AgesYears:
             # older versions of Eradication do not handle empty AgesYears lists robustly
             metadata[_METADATA][_AGESYEARS] = self.AgesYears
+        if self.GenderDataType != self.SAME_FOR_BOTH_GENDERS:
+            # layers for each gender are written, so the file can only be read with this entry
+            metadata[_METADATA][_GENDERDATATYPE] = self._GENDER_DATATYPE_ENUMS[self.GenderDataType]
 
         # "Writing metadata to '{metafile}'
         with metafile.open("w") as handle:
             json.dump(metadata, handle, indent=4, separators=(",", ": "))
 
-        def key_func(k, d=None):
-            return d[k]
-
         # layers are in age bucket order by gender, e.g. male 0-5, 5-10, 10+, female 0-5, 5-10, 10+
         # see _index_for_gender_and_age()
         # "Writing binary data to '{binaryfile}'
+        records = self._to_records(node_ids, actual_datavalue_count)
         with binaryfile.open("wb") as file:
-            for layer in self:
-                for node in node_ids:
-                    destinations = np.zeros(actual_datavalue_count, dtype=np.uint32)
-                    rates = np.zeros(actual_datavalue_count, dtype=np.float64)
-                    if node in layer:
-
-                        # Sort keys descending on rate and ascending on node ID.
-                        # That way if we are truncating the list, we include the "most important" nodes.
-                        keys = sorted(layer[node].keys())  # sorted ascending on node ID
-                        keys = sorted(keys, key=partial(key_func, d=layer[node]), reverse=True)  # descending on rate
-
-                        if len(keys) > actual_datavalue_count:
-                            keys = keys[0:actual_datavalue_count]
-                        # save rates in ascending order so small rates are not lost when looking at the cumulative sum
-                        keys = list(reversed(keys))
-                        destinations[0:len(keys)] = keys
-                        rates[0:len(keys)] = [layer[node][key] for key in keys]
-                    else:
-                        warn(f"No destination nodes found for node {node}", category=UserWarning)
-                    destinations.tofile(file)
-                    rates.tofile(file)
+            records.tofile(file)
+
+        write_index(binaryfile, metafile)
 
         return binaryfile
 
+    def _to_records(self, node_ids: list, datavalue_count: int) -> np.ndarray:
+        """
+        Build binary file content as a structured array of shape (layers, nodes), each record containing destinations
+        (uint32) followed by rates (float64) of a source node, zero padded to datavalue_count values.
+        For each source node, destinations are sorted descending on rate and ascending on node ID and only the first
+        datavalue_count are kept, so if we are truncating the list, we include the "most important" nodes. Kept
+        destinations are saved in ascending order of rates so small rates are not lost when looking at the cumulative
+        sum.
+        """
+        records = np.zeros((len(self._layers), len(node_ids)), dtype=_record_dtype(datavalue_count))
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+
+        for index, layer in enumerate(self):
+            sources, destinations, rates = layer.to_arrays()
+            # nodes present in the layer with no destinations are written as zeros, without a warning
+            for node in np.setdiff1d(node_ids, np.fromiter(layer, dtype=np.int64, count=len(layer))).tolist():
+                warn(f"No destination nodes found for node {node}", category=UserWarning)
+
+            # sort descending on rate and ascending on node id, within each source node
+            order = np.lexsort((destinations, -rates, sources))
+            sources, destinations, rates = sources[order], destinations[order], rates[order]
+            starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+            counts = np.diff(np.r_[starts, len(sources)])
+            rank = np.arange(len(sources)) - np.repeat(starts, counts)
+            kept = np.minimum(counts, datavalue_count)
+
+            # keep the top ranks and reverse them, so rates are in ascending order
+            is_kept = rank < datavalue_count
+            slots = (np.repeat(kept, counts) - 1 - rank)[is_kept]
+            rows = np.searchsorted(node_ids, sources[is_kept])
+            records["destinations"][index, rows, slots] = destinations[is_kept]
+            records["rates"][index, rows, slots] = rates[is_kept]
+
+        return records
+
     _MIGRATION_TYPE_LOOKUP = {
         "LOCAL_MIGRATION": LOCAL_MIGRATION,
         "REGIONAL_MIGRATION": REGIONAL_MIGRATION
@@ -470,15 +649,129 @@ class VectorMigration(object):
     }
 
 
-def from_file(binaryfile: Path, metafile: Path = None):
-    """Reads migration data file from given binary (and associated JSON metadata file)
+class MigrationArrays(object):
+    """Vector migration file content as arrays, see read_arrays().
+
+    Binary data is a structured array of shape (layers, nodes), each record containing destinations (uint32) and
+    rates (float64) of a source node, so destinations and rates are arrays of shape (layers, nodes, DatavalueCount).
+    Layers are in the same order as VectorMigration layers (age bucket order by gender) and nodes are in the order
+    they appear in the file. Dictionary views of layers are available for compatibility, see layer().
+    """
+
+    def __init__(self, metadata: dict, node_ids: np.ndarray, records: np.ndarray):
+        self.metadata = metadata
+        self.node_ids = node_ids
+        self.records = records
+        return
+
+    @property
+    def destinations(self) -> np.ndarray:
+        """np.ndarray: destination node ids, shape (layers, nodes, DatavalueCount)"""
+        return self.records["destinations"]
+
+    @property
+    def rates(self) -> np.ndarray:
+        """np.ndarray: migration rates, shape (layers, nodes, DatavalueCount), rates of unused entries are 0"""
+        return self.records["rates"]
+
+    @property
+    def layer_count(self) -> int:
+        """int: number of layers"""
+        return self.records.shape[0]
+
+    @property
+    def DatavalueCount(self) -> int:
+        """int: maximum number of destinations with rates > 0 for any node in any layer"""
+        return int(np.max(np.count_nonzero(self.rates > 0, axis=-1))) if self.rates.size else 0
+
+    @property
+    def NodeCount(self) -> int:
+        """int: maximum number of source nodes with rates > 0 in any layer"""
+        return int(np.max(np.count_nonzero(self._has_rates(), axis=-1))) if self.records.size else 0
+
+    @property
+    def Nodes(self) -> list:
+        """list: sorted ids of source nodes with rates > 0 in any layer"""
+        return sorted(self.node_ids[np.any(self._has_rates(), axis=0)].tolist()) if self.records.size else []
+
+    def edges(self, index: int = 0) -> tuple:
+        """Get rates > 0 of a layer as arrays
+
+        Args:
+            index (int): layer index
+
+        Returns:
+            Tuple of arrays (sources, destinations, rates), in the order they appear in the file
+        """
+        rates = self.rates[index]
+        rows, columns = np.nonzero(rates > 0)
+        return self.node_ids[rows].astype(np.int64), self.destinations[index][rows, columns].astype(np.int64), \
+            rates[rows, columns]
+
+    def layer(self, index: int = 0) -> "LayerView":
+        """Get a read-only dictionary view of a layer, mapping source node ids to dictionaries of destination rates
+
+        Args:
+            index (int): layer index
+
+        Returns:
+            LayerView object, dictionaries of rates are created when nodes are indexed
+        """
+        return LayerView(self, index)
+
+    def to_migration(self) -> VectorMigration:
+        """Create VectorMigration object, with layers backed by arrays (see ArrayLayer)
+
+        Returns:
+            Migration object representing binary data
+        """
+        migration = _migration_from_metadata(self.metadata)
+        for index in range(self.layer_count):
+            sources, destinations, rates = self.edges(index)
+            if len(sources):
+                migration._layers[index] = ArrayLayer.from_arrays(*_drop_duplicate_edges(sources, destinations, rates))
+
+        return migration
+
+    def _has_rates(self) -> np.ndarray:
+        """Flags of source nodes with rates > 0, shape (layers, nodes)."""
+        return np.any(self.rates > 0, axis=-1)
+
+
+class LayerView(Mapping):
+    """Read-only dictionary view of a migration file layer, see MigrationArrays.layer()."""
+
+    def __init__(self, arrays: MigrationArrays, index: int):
+        self._destinations = arrays.destinations[index]
+        self._rates = arrays.rates[index]
+        has_rates = np.any(self._rates > 0, axis=-1)
+        self._rows = dict(zip(arrays.node_ids[has_rates].tolist(), np.flatnonzero(has_rates).tolist()))
+        return
+
+    def __getitem__(self, key) -> dict:
+        row = self._rows[key]
+        rates = self._rates[row]
+        is_rate = rates > 0
+        return dict(zip(self._destinations[row][is_rate].tolist(), rates[is_rate].tolist()))
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+def read_arrays(binaryfile: Path, metafile: Path = None, mmap: bool = True) -> MigrationArrays:
+    """Reads migration data file from given binary (and associated JSON metadata file) into arrays, without
+    creating dictionaries of rates, so large files can be inspected or compared quickly.
 
     Args:
         binaryfile (Path): path to binary file (metadata file is assumed to be at same location with ".json" suffix)
         metafile (Path): use given metafile rather than inferring metafile name from the binary file name
+        mmap (bool): memory-map the binary file (read-only), rather than reading it into memory (default = True)
 
     Returns:
-        Migration object representing binary data in the given file.
+        MigrationArrays object representing binary data in the given file.
     """
     binaryfile = Path(binaryfile).absolute()
     metafile = metafile if metafile else binaryfile.parent / (binaryfile.name + ".json")
@@ -497,41 +790,48 @@ def from_file(binaryfile: Path, metafile: Path = None):
     assert _DATAVALUECOUNT in metadata, f"Metadata file '{metafile}' does not have a 'DatavalueCount' entry."
     assert _NODEOFFSETS in jason, f"Metadata file '{metafile}' does not have a 'NodeOffsets' entry."
 
-    migration = VectorMigration()
-    migration.Author = _value_with_default(metadata, _AUTHOR, _author())
-    migration.DateCreated = _try_parse_date(metadata[_DATECREATED]) if _DATECREATED in metadata else datetime.now()
-    migration.Tool = _value_with_default(metadata, _TOOLNAME, _EMODPYMALARIA)
-    migration.IdReference = _value_with_default(metadata, _IDREFERENCE, VectorMigration.IDREF_LEGACY)
-    migration.MigrationType = VectorMigration._MIGRATION_TYPE_LOOKUP[_value_with_default(metadata,
-                                                                                         _MIGRATIONTYPE,
-                                                                                         "LOCAL_MIGRATION")]
-    migration.GenderDataType = VectorMigration._GENDER_DATATYPE_LOOKUP[_value_with_default(metadata,
-                                                                                           _GENDERDATATYPE,
-                                                                                           "SAME_FOR_BOTH_GENDERS")]
-    migration.AgesYears = _value_with_default(metadata, _AGESYEARS, [])
-    migration.InterpolationType = VectorMigration._INTERPOLATION_TYPE_LOOKUP[_value_with_default(metadata,
-                                                                                                 _INTERPOLATIONTYPE,
-                                                                                                 "PIECEWISE_CONSTANT")]
-
     node_count = metadata[_NODECOUNT]
     node_offsets = jason[_NODEOFFSETS]
     if len(node_offsets) != 16 * node_count:
         raise RuntimeError(f"Length of node offsets string {len(node_offsets)} != 16 * node count {node_count}.")
-    offsets = _parse_node_offsets(node_offsets, node_count)
-    datavalue_count = metadata[_DATAVALUECOUNT]
-    with binaryfile.open("rb") as file:
-        for gender in range(1 if migration.GenderDataType == VectorMigration.SAME_FOR_BOTH_GENDERS else 2):
-            for age in migration.AgesYears if migration.AgesYears else [0]:
-                layer = migration._layers[migration._index_for_gender_and_age(gender, age)]
-                for node, offset in offsets.items():
-                    file.seek(offset, SEEK_SET)
-                    destinations = np.fromfile(file, dtype=np.uint32, count=datavalue_count)
-                    rates = np.fromfile(file, dtype=np.float64, count=datavalue_count)
-                    for destination, rate in zip(destinations, rates):
-                        if rate > 0:
-                            layer[node][destination] = rate
+    node_ids, offsets = decode_node_offsets(node_offsets, node_count)
 
-    return migration
+    # node offsets are within a layer, layers are stored one after another (see VectorMigration.to_file())
+    dtype = _record_dtype(metadata[_DATAVALUECOUNT])
+    rows = offsets.astype(np.int64) // dtype.itemsize if dtype.itemsize else np.arange(node_count)
+    if dtype.itemsize and (np.any(offsets % dtype.itemsize) or np.any(rows >= node_count) or
+                           len(np.unique(rows)) != node_count):
+        raise RuntimeError(f"Node offsets in '{metafile}' don't match {node_count} nodes of {dtype.itemsize} bytes.")
+    file_node_ids = np.zeros(node_count, dtype=np.uint32)
+    file_node_ids[rows] = node_ids
+
+    gender_count = 2 if _value_with_default(metadata, _GENDERDATATYPE, "") == "ONE_FOR_EACH_GENDER" else 1
+    shape = (gender_count * max(1, len(_value_with_default(metadata, _AGESYEARS, []))), node_count)
+    size = shape[0] * shape[1] * dtype.itemsize
+    if binaryfile.stat().st_size < size:
+        raise RuntimeError(f"Migration binary file '{binaryfile}' is smaller than {size} bytes expected.")
+
+    if size == 0:
+        records = np.zeros(shape, dtype=dtype)
+    elif mmap:
+        records = np.memmap(binaryfile, dtype=dtype, mode="r", shape=shape)
+    else:
+        records = np.fromfile(binaryfile, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
+
+    return MigrationArrays(metadata=metadata, node_ids=file_node_ids, records=records)
+
+
+def from_file(binaryfile: Path, metafile: Path = None):
+    """Reads migration data file from given binary (and associated JSON metadata file)
+
+    Args:
+        binaryfile (Path): path to binary file (metadata file is assumed to be at same location with ".json" suffix)
+        metafile (Path): use given metafile rather than inferring metafile name from the binary file name
+
+    Returns:
+        Migration object representing binary data in the given file.
+    """
+    return read_arrays(binaryfile, metafile, mmap=False).to_migration()
 
 
 def examine_file(filename):
@@ -545,20 +845,58 @@ def examine_file(filename):
     def name_for_migration_type(e: int) -> str:
         return VectorMigration._MIGRATION_TYPE_ENUMS[e] if e in VectorMigration._MIGRATION_TYPE_ENUMS else "unknown"
 
-    migration = from_file(filename)
+    arrays = read_arrays(filename)
+    migration = _migration_from_metadata(arrays.metadata)
+    nodes = arrays.Nodes
+    node_offsets = {node: 12 * index * min(arrays.DatavalueCount, 100) for index, node in enumerate(nodes)}
     print(f"Author:            {migration.Author}")
-    print(f"DatavalueCount:    {migration.DatavalueCount}")
+    print(f"DatavalueCount:    {arrays.DatavalueCount}")
     print(f"DateCreated:       {migration.DateCreated:%a %B %d %Y %H:%M}")
     print(f"IdReference:       {migration.IdReference}")
     print(f"MigrationType:     {migration.MigrationType} ({name_for_migration_type(migration.MigrationType)})")
-    print(f"NodeCount:         {migration.NodeCount}")
-    print(f"NodeOffsets:       {migration.NodeOffsets}")
+    print(f"NodeCount:         {arrays.NodeCount}")
+    print(f"NodeOffsets:       {node_offsets}")
     print(f"Tool:              {migration.Tool}")
-    print(f"Nodes:             {migration.Nodes}")
+    print(f"Nodes:             {nodes}")
 
     return
 
 
+def _migration_from_metadata(metadata: dict) -> VectorMigration:
+    """Create an empty VectorMigration object with properties from migration file metadata."""
+    migration = VectorMigration()
+    migration.Author = _value_with_default(metadata, _AUTHOR, _author())
+    migration.DateCreated = _try_parse_date(metadata[_DATECREATED]) if _DATECREATED in metadata else datetime.now()
+    migration.Tool = _value_with_default(metadata, _TOOLNAME, _EMODPYMALARIA)
+    migration.IdReference = _value_with_default(metadata, _IDREFERENCE, VectorMigration.IDREF_LEGACY)
+    migration.MigrationType = VectorMigration._MIGRATION_TYPE_LOOKUP[_value_with_default(metadata,
+                                                                                         _MIGRATIONTYPE,
+                                                                                         "LOCAL_MIGRATION")]
+    migration.GenderDataType = VectorMigration._GENDER_DATATYPE_LOOKUP[_value_with_default(metadata,
+                                                                                           _GENDERDATATYPE,
+                                                                                           "SAME_FOR_BOTH_GENDERS")]
+    migration.AgesYears = _value_with_default(metadata, _AGESYEARS, [])
+    migration.InterpolationType = VectorMigration._INTERPOLATION_TYPE_LOOKUP[_value_with_default(metadata,
+                                                                                                 _INTERPOLATIONTYPE,
+                                                                                                 "PIECEWISE_CONSTANT")]
+    return migration
+
+
+def _record_dtype(datavalue_count: int) -> np.dtype:
+    """Binary file record of a source node: destinations (uint32) followed by rates (float64)."""
+    return np.dtype([("destinations", np.uint32, (datavalue_count,)), ("rates", np.float64, (datavalue_count,))])
+
+
+def _drop_duplicate_edges(sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray) -> tuple:
+    """Keep the last rate of each source and destination pair, as setting rates one by one does."""
+    order = np.lexsort((destinations, sources))
+    sorted_sources, sorted_destinations = sources[order], destinations[order]
+    is_last = np.r_[(sorted_sources[1:] != sorted_sources[:-1]) | (sorted_destinations[1:] != sorted_destinations[:-1]),
+                    True]
+    keep = np.sort(order[is_last])
+    return sources[keep], destinations[keep], rates[keep]
+
+
 def _author() -> str:
     username = ""
     if system() == "Windows":
@@ -568,18 +906,6 @@ def _author() -> str:
     return username
 
 
-def _parse_node_offsets(string: str, count: int) -> dict:
-    assert len(string) == 16 * count, f"Length of node offsets string {len(string)} != 16 * node count {count}."
-
-    offsets = {}
-    for index in range(count):
-        base = 16 * index
-        offset = base + 8
-        offsets[int(string[base:base + 8], 16)] = int(string[offset:offset + 8], 16)
-
-    return offsets
-
-
 def _try_parse_date(string: str) -> datetime:
     patterns = [
         "%a %b %d %Y %H:%M:%S",
@@ -714,7 +1040,8 @@ def from_demog_and_param_gravity_webservice(demographics_file_path: str, params:
 
 def from_demographics_and_gravity_params(task, demographics_object, gravity_params: list,
                                          migration_type=VectorMigration.REGIONAL_MIGRATION,
-                                         filename: str = None):
+                                         filename: str = None, exclude_nodes: list = None,
+                                         max_destinations: int = 100):
     """
         This function takes a demographics object, creates a vector migration file based on the populations and
         distances of nodes, sets up the parameters for it to be used with the simulations, creates a vector migration
@@ -734,40 +1061,18 @@ def from_demographics_and_gravity_params(task, demographics_object, gravity_para
             options are VectorMigration.REGIONAL_MIGRATION or VectorMigration.LOCAL_MIGRATION
         filename: name of migration file to be created and added to the experiment,
             Default: vector_migration_(migration_type).bin
+        exclude_nodes: a list of node ids for nodes you don't want any migration happening to or from.
+        max_destinations: the number of destinations with the highest rates kept for each node, default is 100,
+            the same as the limit on destinations written by VectorMigration.to_file(). None keeps all destinations.
 
     Returns:
         VectorMigration object
     """
 
-    def _compute_migration_rate(gravity_params, from_node_population, to_node_population, distance):
-        """
-        Utility function for computing migration rates using gravity model
-
-        Args:
-            gravity_params: a list of four parameters that will affect the gravity model
-                gravity_params[0] denoted as g[0], etc, and they are used in the following way:
-                migration_rate = g[0] * (from_node_population^(g[1]-1)) * (to_node_population^g[2]) * (distance^g[3])
-                if migration_rate >= 1, 1 is used.
-            from_node_population: Initial_Population in the from_node
-            to_node_population: Initial_Population in the to_node
-            distance: distance, in kilomenteres, between two nodes
-
-        Returns:
-            Rate of vector migration from from_node to to_node
-
-        """
-        # If home/dest node has 0 pop, assume this node is the regional work node-- no local migration allowed
-        if from_node_population == 0 or to_node_population == 0:
-            return 0
-        else:
-            migration_rate = gravity_params[0] * (from_node_population ** (gravity_params[1] - 1)) \
-                             * (to_node_population ** gravity_params[2]) * (distance ** gravity_params[3])
-            final_rate = np.min([1., migration_rate])
-            return final_rate
-
     def _compute_migration_dict(node_list: list, gravity_params: list, exclude_nodes: list = None):
         """
-        Utility function for computing migration value map.
+        Utility function for computing migration value map. Distances and rates for all node pairs are computed
+        as arrays (see gravity.gravity_migration) and the layer is built from arrays.
 
         Args:
             node_list: list of nodes as dictionaries created from the demographics object
@@ -780,36 +1085,24 @@ def from_demographics_and_gravity_params(task, demographics_object, gravity_para
         Returns:
             VectorMigration object based on demographics object that was passed in
         """
-        excluded_nodes = set(exclude_nodes) if exclude_nodes else set()
         v_migration = VectorMigration()
-        geodesic = Geodesic.WGS84
-
-        for source_node in node_list:
-            source_id = source_node["NodeID"]
-            src_lat = source_node["NodeAttributes"]["Latitude"]
-            src_long = source_node["NodeAttributes"]["Longitude"]
-            src_pop = source_node["NodeAttributes"]["InitialPopulation"]
-
-            if source_id in excluded_nodes:
-                continue
-            for destination_node in node_list:
-                if destination_node == source_node:
-                    continue
-                dest_id = destination_node["NodeID"]
-                if dest_id in excluded_nodes:
-                    continue
-                dst_lat = destination_node["NodeAttributes"]["Latitude"]
-                dst_long = destination_node["NodeAttributes"]["Longitude"]
-                dst_pop = destination_node["NodeAttributes"]["InitialPopulation"]
-
-                distance = geodesic.Inverse(src_lat, src_long, dst_lat, dst_long, Geodesic.DISTANCE)['s12'] / 1000  # km
-                rate = _compute_migration_rate(gravity_params, src_pop, dst_pop, distance)
-                v_migration[source_id][dest_id] = rate
+        rates = gravity_migration(node_ids=[node["NodeID"] for node in node_list],
+                                  lat=[node["NodeAttributes"]["Latitude"] for node in node_list],
+                                  lon=[node["NodeAttributes"]["Longitude"] for node in node_list],
+                                  populations=[node["NodeAttributes"]["InitialPopulation"] for node in node_list],
+                                  gravity_params=gravity_params,
+                                  exclude_nodes=exclude_nodes,
+                                  max_destinations=max_destinations)
+        if rates:
+            sources = np.repeat([source_id for source_id, _, _ in rates], [len(d) for _, d, _ in rates])
+            destinations = np.concatenate([d for _, d, _ in rates])
+            v_migration.set_layer(ArrayLayer.from_arrays(sources, destinations,
+                                                         np.concatenate([r for _, _, r in rates])))
 
         return v_migration
 
     nodes = [node.to_dict() for node in demographics_object.nodes]
-    v_migration = _compute_migration_dict(nodes, gravity_params)
+    v_migration = _compute_migration_dict(nodes, gravity_params, exclude_nodes)
     v_migration.IdReference = demographics_object.idref
     v_migration.MigrationType = migration_type
     # save migration object to file
@@ -828,6 +1121,8 @@ def from_demographics_and_gravity_params(task, demographics_object, gravity_para
     task.common_assets.add_asset(filename)
     task.common_assets.add_asset(f"{filename}.json")
 
+    return v_migration
+
 
 # by gender, by age
 _mapping_fns = {
@@ -858,6 +1153,52 @@ def to_csv():
                     print(display(node, gender, age, destination, rate))
 
 
+def from_arrays(sources, destinations, rates, id_reference: str = "",
+                migration_type=VectorMigration.LOCAL_MIGRATION) -> VectorMigration:
+    """
+    Create migration from arrays of source node ids, destination node ids and rates, one entry for each pair of nodes.
+    Rates are kept in arrays, which is much faster and uses much less memory than setting rates one by one.
+
+    Args:
+        sources: source node ids
+        destinations: destination node ids
+        rates: migration rates from source to destination nodes
+        id_reference: IdReference parameter to set for the migration file
+        migration_type: VectorMigration.LOCAL_MIGRATION or VectorMigration.REGIONAL_MIGRATION
+
+    Returns:
+        Migration object to be manipulated or written out as a file using to_file() function
+    """
+    migration = VectorMigration()
+    migration.IdReference = id_reference
+    migration.MigrationType = migration_type
+    migration.set_layer(ArrayLayer.from_arrays(sources, destinations, rates))
+
+    return migration
+
+
+def from_sparse(matrix, node_ids=None, id_reference: str = "",
+                migration_type=VectorMigration.LOCAL_MIGRATION) -> VectorMigration:
+    """
+    Create migration from a scipy.sparse matrix of rates, having source nodes as rows and destination nodes as columns.
+
+    Args:
+        matrix: scipy.sparse matrix (or array) of rates, entries which are not stored are not included
+        node_ids: node ids corresponding to matrix row/column indices, default: indices are node ids
+        id_reference: IdReference parameter to set for the migration file
+        migration_type: VectorMigration.LOCAL_MIGRATION or VectorMigration.REGIONAL_MIGRATION
+
+    Returns:
+        Migration object to be manipulated or written out as a file using to_file() function
+    """
+    migration = VectorMigration()
+    migration.IdReference = id_reference
+    migration.MigrationType = migration_type
+    migration.set_layer(ArrayLayer.from_sparse(matrix, node_ids=node_ids))
+
+    return migration
+
+
 def from_csv(filename_path: str, id_reference: str, migration_type: str = "LOCAL_MIGRATION",
              author: str = None):
     """
@@ -1,12 +1,15 @@
 import pandas as pd
-from typing import Tuple
+from typing import List, Tuple
 
 from emodpy_malaria.weather.weather_utils import *
 from emodpy_malaria.weather.weather_variable import WeatherVariable
-from emodpy_malaria.weather.weather_metadata import WeatherMetadata, WeatherAttributes
+from emodpy_malaria.weather.weather_metadata import WeatherMetadata, WeatherAttributes, WeatherValidationError
 from emodpy_malaria.weather.weather_data import WeatherData, DataFrameInfo
 from emodpy_malaria.weather.weather_set import WeatherSet
-from emodpy_malaria.weather.weather_request import WeatherRequest, WeatherArgs, RequestReport
+from emodpy_malaria.weather.weather_stream import stream_csv_to_weather
+from emodpy_malaria.weather.weather_request import WeatherRequest, WeatherArgs, RequestReport, generate_as_completed
+from emodpy_malaria.weather.weather_cache import WeatherCache
+from emodpy_malaria.weather.weather_batch import write_scenarios
 
 from idmtools_platform_comps.comps_platform import COMPSPlatform
 
@@ -27,13 +30,19 @@ Here are main features:
 
 # Use __all__ to let type checkers know what is part of the public API.
 _all_ = ['csv_to_weather',
+         'stream_csv_to_weather',
+         'extract_nodes',
          'generate_weather'
          'weather_to_csv',
          'WeatherRequest',
          'WeatherArgs',
          'RequestReport',
+         'generate_as_completed',
+         'WeatherCache',
+         'write_scenarios',
          'WeatherMetadata',
          'WeatherAttributes',
+         'WeatherValidationError',
          'WeatherData',
          'DataFrameInfo',
          'WeatherSet',
@@ -51,7 +60,8 @@ def generate_weather(platform: Union[str, COMPSPlatform],
                      request_name: str = "",
                      local_dir: Union[str, Path] = None,
                      data_source: str = None,
-                     force: bool = False) -> WeatherRequest:
+                     force: bool = False,
+                     cache: WeatherCache = None) -> WeatherRequest:
     """
     Generate weather files by submitting a request and downloading generated weather files to a specified dir.
 
@@ -70,6 +80,7 @@ def generate_weather(platform: Union[str, COMPSPlatform],
         local_dir: (Optional) Local dir where files will be downloaded.
         data_source: (Optional) SSMT data source to be used.
         force: (Optional) Flag ensuring a new weather request is submitted, even if weather files exist in "local_dir".
+        cache: (Optional) Local weather cache, used to skip the request if the same weather files were generated before.
 
             **Example**::
 
@@ -92,7 +103,7 @@ def generate_weather(platform: Union[str, COMPSPlatform],
                      lon_column=lon_column,
                      id_reference=id_reference)
 
-    wr = WeatherRequest(platform=platform, local_dir=local_dir, data_source=data_source)
+    wr = WeatherRequest(platform=platform, local_dir=local_dir, data_source=data_source, cache=cache)
     wr.generate(weather_args=wa, request_name=request_name, force=force)
     wr.download(force=force)
 
@@ -105,11 +116,16 @@ def csv_to_weather(csv_data: Union[str, Path, pd.DataFrame],
                    weather_columns: Dict[WeatherVariable, str] = None,
                    attributes: WeatherAttributes = None,
                    weather_dir: Union[str, Path] = None,
-                   weather_file_names: Dict[WeatherVariable, str] = None) -> WeatherSet:
+                   weather_file_names: Dict[WeatherVariable, str] = None,
+                   chunk_size: int = None) -> WeatherSet:
     """
     Convert a dataframe or csv file, containing node, step and weather columns, into a weather set
     and corresponding weather files, if weather dir is specified.
 
+    If chunk size is specified, the csv file is converted in chunks of rows, without loading it into memory
+    (see stream_csv_to_weather), and the returned weather set is memory-mapped from created weather files.
+    In that case csv file rows must be sorted by node and weather dir is required.
+
     Args:
         csv_data: Dataframe or a csv file path, containing weather data.
         node_column: (Optional) Column containing node ids. The default is "nodes". The default is "nodes".
@@ -119,6 +135,8 @@ def csv_to_weather(csv_data: Union[str, Path, pd.DataFrame],
         attributes: (Optional) Weather attribute object containing metadata for WeatherMetadata object.
         weather_dir: (Optional) Directory where weather files are stored. If not specified files are not created.
         weather_file_names: (Optional) Dictionary of weather variables (keys) and weather .bin file names (values).
+        chunk_size: (Optional) The number of csv rows read at once. If not specified, the whole file is read at once.
+                    Only supported for csv files.
 
             **Example**::
 
@@ -128,6 +146,23 @@ def csv_to_weather(csv_data: Union[str, Path, pd.DataFrame],
         WeatherSet object.
     """
 
+    if chunk_size is not None:
+        if isinstance(csv_data, pd.DataFrame):
+            raise ValueError("Chunk size is only supported when converting a csv file, not a dataframe.")
+        if not weather_dir:
+            raise ValueError("Weather dir is required when converting a csv file in chunks.")
+
+        file_names = stream_csv_to_weather(csv_file=csv_data,
+                                           weather_dir=weather_dir,
+                                           node_column=node_column,
+                                           step_column=step_column,
+                                           weather_columns=weather_columns,
+                                           attributes=attributes,
+                                           weather_file_names=weather_file_names,
+                                           chunk_size=chunk_size)
+        ws = WeatherSet.from_files(dir_path=weather_dir, file_names=file_names, mmap=True)
+        return ws
+
     if isinstance(csv_data, pd.DataFrame):
         ws = WeatherSet.from_dataframe(df=csv_data,
                                        node_column=node_column,
@@ -156,7 +191,8 @@ def weather_to_csv(weather_dir: Union[str, Path],
                    csv_file: Union[str, Path] = None,
                    node_column: str = "nodes",
                    step_column: str = "steps",
-                   weather_columns: Dict[WeatherVariable, str] = None) -> Tuple[pd.DataFrame, WeatherAttributes]:
+                   weather_columns: Dict[WeatherVariable, str] = None,
+                   chunk_size: int = None) -> Tuple[Union[pd.DataFrame, None], WeatherAttributes]:
     """
     Convert weather files into a dataframe and a .csv file, if csv file path is specified.
 
@@ -169,20 +205,28 @@ def weather_to_csv(weather_dir: Union[str, Path],
         step_column: (Optional) Column containing node index for weather time series values. The default is "steps".
         weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
                          Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
+        chunk_size: (Optional) The approximate number of csv rows written at once. If specified, weather files are
+                    memory-mapped and the csv file is written in blocks, so memory use stays flat regardless of the
+                    number of nodes, and no dataframe is returned. Requires 'csv_file'.
 
             **Example**::
 
                 df, attributes = weather_to_csv(weather_dir="path/to/weather_dir")
 
     Returns:
-        Dataframe and weather attributes objects.
+        Dataframe (or None if 'chunk_size' is set) and weather attributes objects.
     """
-    ws = WeatherSet.from_files(dir_path=weather_dir, prefix=weather_file_prefix, file_names=weather_file_names)
+    if chunk_size is not None and not csv_file:
+        raise ValueError("The csv file is required when 'chunk_size' is set.")
+
+    ws = WeatherSet.from_files(dir_path=weather_dir, prefix=weather_file_prefix, file_names=weather_file_names,
+                               mmap=chunk_size is not None)
     if csv_file:
         df = ws.to_csv(file_path=csv_file,
                        node_column=node_column,
                        step_column=step_column,
-                       weather_columns=weather_columns)
+                       weather_columns=weather_columns,
+                       chunk_size=chunk_size)
     else:
         df = ws.to_dataframe(node_column=node_column,
                              step_column=step_column,
@@ -190,3 +234,29 @@ def weather_to_csv(weather_dir: Union[str, Path],
     wa = ws.attributes
 
     return df, wa
+
+
+def extract_nodes(src_file: Union[str, Path],
+                  dst_file: Union[str, Path],
+                  node_ids: List[int]) -> WeatherData:
+    """
+    Create a weather file containing only the specified nodes of an existing weather file. The source file is
+    memory-mapped, so only series of the specified nodes are read, making the cost proportional to the output size.
+
+    Args:
+        src_file: The source weather binary (.bin) file path. The metadata file path is constructed by appending ".json".
+        dst_file: The new weather binary (.bin) file path. The metadata file is created by appending ".json".
+        node_ids: Node ids to be extracted. All must exist in the source weather file.
+
+            **Example**::
+
+                wd = extract_nodes(src_file="path/to/national_air_temperature_daily.bin",
+                                   dst_file="path/to/regional_air_temperature_daily.bin",
+                                   node_ids=[101, 102, 103])
+
+    Returns:
+        WeatherData object containing extracted nodes.
+    """
+    wd = WeatherData.from_file(src_file, mmap=True).subset(node_ids)
+    wd.to_file(dst_file)
+    return wd
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Weather batch module, implementing functionality for writing many weather scenarios derived from one base weather set,
+for example climate change variants used in sensitivity sweeps.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, NoReturn, Union
+
+from emodpy_malaria.integrity import index_path
+from emodpy_malaria.weather.weather_data import WeatherData
+from emodpy_malaria.weather.weather_set import WeatherSet
+from emodpy_malaria.weather.weather_utils import link_or_copy, make_path, map_parallel, save_json
+from emodpy_malaria.weather.weather_variable import WeatherVariable
+
+_MANIFEST_FILE = "manifest.json"
+_SHARE_MODES = ["copy", "hardlink", "reference"]
+
+Transform = Callable[[WeatherData], Union[WeatherData, Any]]
+
+
+def write_scenarios(base: WeatherSet,
+                    scenarios: Dict[str, Dict[WeatherVariable, Transform]],
+                    dir_path: Union[str, Path],
+                    file_names: Dict[WeatherVariable, str] = None,
+                    share: str = "copy",
+                    base_name: str = "base",
+                    max_workers: int = None) -> Dict[str, Dict[WeatherVariable, str]]:
+    """
+    Writes the base weather set and weather scenarios derived from it, each into its own subdirectory.
+    Each scenario defines transforms only for weather variables it changes. Changed variables are written one
+    scenario at a time, by transforming a copy of base weather data, so only one variant is held in memory per worker.
+    Unchanged variables are not written again, they are shared with the base weather set, based on 'share' argument.
+    The manifest, mapping scenario names to weather file paths, is also saved as "manifest.json" in 'dir_path'.
+
+        **Example**::
+
+            scenarios = {
+                f"temp_plus_{t}": {WeatherVariable.AIR_TEMPERATURE: lambda wd, t=t: wd.add(t)} for t in [1, 2, 3]}
+            manifest = write_scenarios(base=ws, scenarios=scenarios, dir_path="weather_sweep")
+
+    Args:
+        base: The base weather set.
+        scenarios: Dictionary of scenario names (keys) and dictionaries of weather variables and transforms (values).
+                   A transform is a function which receives a copy of base WeatherData and either modifies it in place
+                   (e.g. by calling add, scale or clip) or returns a new WeatherData object. Transformed weather data
+                   must keep the series length, node count, id reference and spatial resolution of the base, so each
+                   scenario is a valid weather set.
+        dir_path: The directory into which scenario subdirectories and the manifest are written.
+        file_names: (Optional) Dictionary of weather variables and file names. The default are base file names, if set,
+                    otherwise default weather file names.
+        share: (Optional) The way unchanged weather files are shared with the base weather set:
+               - "copy": files are copied into the scenario dir (the default).
+               - "hardlink": files are hardlinked into the scenario dir or, if not supported, copied. Hardlinked files
+                 share content; WeatherData.to_file replaces files, so it doesn't affect the other links, but files
+                 modified in place by other tools change in every scenario.
+               - "reference": files are not placed into the scenario dir, the manifest references base files instead,
+                 so they can be uploaded once, as shared assets.
+        base_name: (Optional) The name of the base weather set subdirectory and manifest entry. The default is "base".
+        max_workers: (Optional) The number of threads used to write weather files in parallel.
+
+    Returns:
+        The manifest, a dictionary of scenario names (including the base) and dictionaries of weather variables and
+        weather file (.bin) paths.
+    """
+    if share not in _SHARE_MODES:
+        raise ValueError(f"Unsupported share mode '{share}', expected one of {_SHARE_MODES}.")
+
+    if base_name in scenarios:
+        raise ValueError(f"Scenario name '{base_name}' is reserved for the base weather set.")
+
+    invalid = [n for n in scenarios if not n or Path(n).name != n]
+    if invalid:
+        raise ValueError(f"Scenario names must be valid directory names: {invalid}")
+
+    for name, transforms in scenarios.items():
+        not_available = [v for v in transforms if v not in base.weather_variables]
+        if not_available:
+            raise ValueError(f"Scenario '{name}' transforms weather variables not in the base: {not_available}")
+
+    file_names = file_names or base.file_names or WeatherSet.make_file_paths(weather_variables=base.weather_variables)
+    base_dir = Path(dir_path).joinpath(base_name)
+    base_files = {v: str(base_dir.joinpath(file_names[v])) for v in base.weather_variables}
+    make_path(base_dir)
+    map_parallel(lambda v: base[v].to_file(base_files[v]), base.weather_variables, max_workers=max_workers)
+
+    def write(name: str) -> Dict[WeatherVariable, str]:
+        scenario_dir = Path(dir_path).joinpath(name)
+        make_path(scenario_dir)
+        files = {}
+        for v in base.weather_variables:
+            file_path = scenario_dir.joinpath(file_names[v])
+            if v in scenarios[name]:
+                wd = base[v].copy()
+                result = scenarios[name][v](wd)
+                wd = result if isinstance(result, WeatherData) else wd
+                _validate_scenario_data(wd, base[v], name=name, weather_variable=v)
+                wd.to_file(file_path)
+            elif share == "reference":
+                file_path = base_files[v]
+            else:
+                _share_files(base_files[v], file_path, hardlink=share == "hardlink")
+
+            files[v] = str(file_path)
+
+        return files
+
+    results = map_parallel(write, list(scenarios), max_workers=max_workers)
+    manifest = {base_name: base_files, **dict(zip(scenarios, results))}
+
+    content = {name: {v.value: f for v, f in files.items()} for name, files in manifest.items()}
+    save_json(content=content, file_path=Path(dir_path).joinpath(_MANIFEST_FILE))
+
+    return manifest
+
+
+def _validate_scenario_data(wd: WeatherData,
+                            base_wd: WeatherData,
+                            name: str,
+                            weather_variable: WeatherVariable) -> NoReturn:
+    """Validate transformed weather data matches the base, so it is consistent with the rest of the scenario."""
+    wm, base_wm = wd.metadata, base_wd.metadata
+    for attr in ["series_len", "node_count", "id_reference", "spatial_resolution"]:
+        if getattr(wm, attr) != getattr(base_wm, attr):
+            raise ValueError(f"Scenario '{name}' {weather_variable} {attr} mismatch, the base has "
+                             f"{getattr(base_wm, attr)}, the transformed data has {getattr(wm, attr)}.")
+
+
+def _share_files(src: Union[str, Path], dst: Union[str, Path], hardlink: bool) -> NoReturn:
+    """Hardlink or copy weather binary file, its metadata and its integrity index file (if exists)."""
+    for src_file, dst_file in [(Path(src), Path(dst)),
+                               (Path(f"{src}.json"), Path(f"{dst}.json")),
+                               (index_path(src), index_path(dst))]:
+        if src_file.is_file():
+            link_or_copy(src_file, dst_file, hardlink=hardlink)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+"""
+Weather cache module, implementing a local, content-addressed cache of weather files generated by weather requests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from pathlib import Path
+from typing import Dict, List, NoReturn, Union
+
+from emodpy_malaria.integrity import verify, write_index
+from emodpy_malaria.weather.weather_utils import link_or_copy, make_path, save_json, ymd
+
+_ENTRY_FILE = "entry.json"      # Cache entry manifest, listing entry files. Its mtime marks the last entry access.
+_DEFAULT_CACHE_DIR = Path.home().joinpath(".cache", "emodpy_malaria", "weather")
+
+
+class WeatherCache:
+    """
+    Local on-disk cache of weather files, keyed by a hash of weather request arguments (see WeatherCache.key).
+    Each cache entry is a directory containing a set of weather files (.bin and .bin.json) and an integrity index of
+    each weather file, used to detect entries modified after they were cached. When cache size exceeds the size limit,
+    the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path] = None, max_size: int = None, hardlink: bool = False):
+        """
+        Initializes a WeatherCache object.
+
+        Args:
+            cache_dir: (Optional) The cache directory. The default is "~/.cache/emodpy_malaria/weather".
+            max_size: (Optional) Max cache size in bytes. If not specified, the cache size is not limited.
+            hardlink: (Optional) Flag indicating whether cached files are hardlinked into the target dir, if supported
+                      by the file system, instead of copied. Hardlinked files share content with the cache, so they
+                      must be replaced (e.g. by writing a new file) rather than modified in place. The default is False.
+        """
+        self._cache_dir: Path = Path(cache_dir or _DEFAULT_CACHE_DIR)
+        self._max_size: Union[int, None] = max_size
+        self._hardlink: bool = hardlink
+
+    @property
+    def cache_dir(self) -> Path:
+        """The cache directory."""
+        return self._cache_dir
+
+    @property
+    def max_size(self) -> Union[int, None]:
+        """Max cache size in bytes, or None if cache size is not limited."""
+        return self._max_size
+
+    @classmethod
+    def key(cls, weather_args: "WeatherArgs", data_source: str) -> str:
+        """
+        Calculate cache key based on weather arguments: site file content, dates, columns, id reference and
+        the data source name. The site file name and location don't affect the key.
+
+        Args:
+            weather_args: Arguments defining weather request space and time scope.
+            data_source: Data source name.
+
+        Returns:
+            Cache key, as a hex string.
+        """
+        content = {
+            "site_file": hashlib.blake2b(Path(weather_args.site_file).read_bytes()).hexdigest(),
+            "site_file_type": Path(weather_args.site_file).suffix.lower(),
+            "start_date": ymd(weather_args.start_date),
+            "end_date": ymd(weather_args.end_date),
+            "node_column": weather_args.node_column,
+            "lat_column": weather_args.lat_column,
+            "lon_column": weather_args.lon_column,
+            "id_reference": weather_args.id_reference,
+            "data_source": data_source}
+
+        content_str = json.dumps(content, sort_keys=True)
+        return hashlib.blake2b(content_str.encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str, local_dir: Union[str, Path]) -> Union[List[str], None]:
+        """
+        Materialize cached weather files into the local dir, by copying or hardlinking them (see 'hardlink').
+        Cached weather files are verified against their integrity index first. If any of them was modified after
+        it was cached, the entry is removed and treated as missing.
+
+        Args:
+            key: Cache key (see WeatherCache.key).
+            local_dir: The directory into which cached files are placed.
+
+        Returns:
+            List of materialized file paths, or None if there is no cache entry for the key.
+        """
+        entry_dir = self._entry_dir(key)
+        entry_file = entry_dir.joinpath(_ENTRY_FILE)
+        if not entry_file.is_file():
+            return None
+
+        file_names = json.loads(entry_file.read_text())["files"]
+        if not all(entry_dir.joinpath(n).is_file() for n in file_names):
+            return None
+
+        if any(verify(entry_dir.joinpath(n), deep=True) is False for n in file_names):
+            print(f"Removing modified weather cache entry: {key}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        make_path(local_dir)
+        files = []
+        for n in file_names:
+            file_path = Path(local_dir).joinpath(n)
+            link_or_copy(entry_dir.joinpath(n), file_path, hardlink=self._hardlink)
+            files.append(str(file_path))
+
+        # Mark the entry as recently used.
+        os.utime(entry_file)
+        return files
+
+    def put(self, key: str, files: List[Union[str, Path]]) -> NoReturn:
+        """
+        Add weather files to the cache, under the given key, and evict least recently used entries if needed.
+        Files are copied into a temp dir which is then renamed, so incomplete entries are never visible.
+        An integrity index is created for each cached weather file which has a metadata file.
+
+        Args:
+            key: Cache key (see WeatherCache.key).
+            files: Weather files to be cached.
+        """
+        entry_dir = self._entry_dir(key)
+        make_path(self._cache_dir)
+        temp_dir = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=self._cache_dir))
+        try:
+            for f in files:
+                shutil.copy2(f, temp_dir.joinpath(Path(f).name))
+
+            names = [Path(f).name for f in files]
+            for n in names:
+                if f"{n}.json" in names:
+                    write_index(temp_dir.joinpath(n))
+
+            save_json({"files": [Path(f).name for f in files]}, temp_dir.joinpath(_ENTRY_FILE))
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir)
+
+            os.replace(temp_dir, entry_dir)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self) -> List[str]:
+        """
+        Remove least recently used entries until the cache size is within the size limit.
+
+        Returns:
+            List of keys of removed entries.
+        """
+        if self._max_size is None:
+            return []
+
+        entries = self._entries()
+        total_size = sum(e["size"] for e in entries.values())
+        removed = []
+        for key, e in sorted(entries.items(), key=lambda ke: ke[1]["last_used"]):
+            if total_size <= self._max_size:
+                break
+
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total_size -= e["size"]
+            removed.append(key)
+
+        return removed
+
+    def clear(self) -> NoReturn:
+        """Remove all cache entries."""
+        for key in self._entries():
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    @property
+    def size(self) -> int:
+        """The total size of cached weather files, in bytes."""
+        return sum(e["size"] for e in self._entries().values())
+
+    def _entries(self) -> Dict[str, Dict[str, float]]:
+        """Returns the dictionary of cache keys and corresponding entry size and last use time."""
+        entries = {}
+        if not self._cache_dir.is_dir():
+            return entries
+
+        for entry_file in self._cache_dir.glob(f"*/{_ENTRY_FILE}"):
+            entry_dir = entry_file.parent
+            if entry_dir.name.startswith("."):
+                continue    # Skip entries which are being added.
+
+            size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file() and f.name != _ENTRY_FILE)
+            entries[entry_dir.name] = {"size": size, "last_used": entry_file.stat().st_mtime}
+
+        return entries
+
+    def _entry_dir(self, key: str) -> Path:
+        """Construct cache entry directory path."""
+        return self._cache_dir.joinpath(key)
+
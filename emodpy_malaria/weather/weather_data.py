@@ -13,16 +13,19 @@ from pathlib import Path
 from typing import Dict, Iterable, List, NoReturn, Tuple, Union
 
 
-from emodpy_malaria.weather.weather_utils import hash_series, invert_dict, make_path
+from emodpy_malaria.integrity import atomic_write, write_index
+from emodpy_malaria.weather.weather_utils import expand_monthly, invert_dict, make_path, parse_day_of_year, read_parquet
+from emodpy_malaria.weather.weather_utils import unique_series, write_csv_blocks
 from emodpy_malaria.weather.weather_variable import WeatherVariable
 from emodpy_malaria.weather.weather_metadata import WeatherMetadata, WeatherAttributes, SERIES_BYTE_VALUE_SIZE
+from emodpy_malaria.weather.weather_metadata import WeatherValidationError, find_weather_errors
 
 
 class WeatherData:
     """
     Functionality for working with binary weather files (.bin.json).
     """
-    def __init__(self, data: np.ndarray, metadata: WeatherMetadata = None):
+    def __init__(self, data: np.ndarray, metadata: WeatherMetadata = None, validate: bool = True):
         """
         Instantiate a weather object from data numpy array and a weather metadata object.
 
@@ -32,6 +35,7 @@ class WeatherData:
                   This means that the number of rows corresponds to the number of unique series and number of
                   columns corresponds to a series length (e.g. 365).
             metadata: (Optional) WeatherMetadata object containing metadata from .bin.json.
+            validate: (Optional) Flag indicating whether to validate data and metadata relationship (see validate).
         """
         data = self._ensure_data_type(data)
         self._data: np.ndarray = data
@@ -46,7 +50,8 @@ class WeatherData:
             # If metadata object is not provided data must be in the correct shape.
             self._metadata = WeatherMetadata(node_ids=list(range(1, data.shape[0] + 1)), series_len=data.shape[1])
 
-        self.validate()
+        if validate:
+            self.validate()
 
     def __eq__(self, other: WeatherData):
         """Equality operator for WeatherData objects."""
@@ -58,11 +63,29 @@ class WeatherData:
         """Returns the expected shape of data numpy array based on series count and len. """
         return self.metadata.series_unique_count, self.metadata.series_len
 
-    def validate(self):
-        """Validate data and metadata relationship."""
+    def validate(self, values: bool = None):
+        """
+        Validate data and metadata relationship: data shape, offsets alignment and bounds and, optionally,
+        that data doesn't contain NaN or inf values. All failures are reported at once, as WeatherValidationError.
+
+        Args:
+            values: (Optional) Flag indicating whether to check data values. By default, values are checked unless
+                    data is memory-mapped, in which case checking would read the whole file.
+        """
         expected_shape = self._expected_shape()
         assert self._data.shape == expected_shape, "Data numpy array shape is not matching metadata counts."
 
+        if values is None:
+            values = not isinstance(self._data, np.memmap)
+
+        offsets = np.fromiter(self.metadata.node_offsets.values(), dtype=np.int64, count=self.metadata.node_count)
+        errors = find_weather_errors(offsets=offsets,
+                                     series_len=self.metadata.series_len,
+                                     series_count=self._data.shape[0],
+                                     data=self._data if values else None)
+        if len(errors) > 0:
+            raise WeatherValidationError(errors)
+
     @property
     def metadata(self) -> WeatherMetadata:
         """Metadata property, exposing weather metadata object."""
@@ -73,6 +96,260 @@ class WeatherData:
         """Raw data, reshaped in one row per node weather time series."""
         return self._data
 
+    def get_series(self, node_id: int) -> np.ndarray[np.float32]:
+        """
+        Returns weather time series for the given node, without copying data. If data is memory-mapped,
+        only the pages containing the node series are read.
+
+        Args:
+            node_id: Node id, as it appears in the node-offset dictionary.
+
+        Returns:
+            Node weather time series as a NumPy float32 array.
+        """
+        if node_id not in self.metadata.node_offsets:
+            raise KeyError(f"Node {node_id} not found in weather metadata.")
+
+        row = self.metadata.node_offsets[node_id] // (self.metadata.series_len * SERIES_BYTE_VALUE_SIZE)
+        return self._data[row]
+
+    def subset(self, node_ids: Iterable[int]) -> WeatherData:
+        """
+        Creates a new WeatherData object containing only the specified nodes. Only series referenced by those nodes
+        are copied, each only once, so if data is memory-mapped only the corresponding parts of the file are read.
+
+        Args:
+            node_ids: Node ids to be included in the new object. All must exist in the node-offset dictionary.
+
+        Returns:
+            WeatherData object with the subset of nodes and their series, and the same metadata attributes.
+        """
+        node_ids = sorted(set(int(n) for n in node_ids))
+        if len(node_ids) == 0:
+            raise ValueError("At least one node id is required.")
+
+        missing = [n for n in node_ids if n not in self.metadata.node_offsets]
+        if missing:
+            raise KeyError(f"Nodes {missing[:10]} not found in weather metadata.")
+
+        # Rows referenced by selected nodes, in the order they appear in the source, so they are read sequentially.
+        offset_increment = self.metadata.series_len * SERIES_BYTE_VALUE_SIZE
+        offsets = np.array([self.metadata.node_offsets[n] for n in node_ids], dtype=np.int64)
+        rows, inverse = np.unique(offsets // offset_increment, return_inverse=True)
+
+        data = np.array(self._data[rows], dtype=np.float32)
+        node_offsets = dict(zip(node_ids, (inverse.reshape(-1) * offset_increment).tolist()))
+        wm = WeatherMetadata(node_ids=node_offsets, series_len=self.metadata.series_len,
+                             attributes=self.metadata.attributes)
+        return WeatherData(data=data, metadata=wm)
+
+    def slice_steps(self, start: int = None, stop: int = None) -> WeatherData:
+        """
+        Creates a new WeatherData object containing a time window of each weather time series.
+        Start and stop are 0-based step indices with Python slice semantics, for example (0, 730) selects
+        the first two years of daily series. Only unique series are sliced, nodes and offsets are preserved
+        except that series which become identical are stored once.
+
+        Args:
+            start: (Optional) The first step index. The default is 0.
+            stop: (Optional) The step index after the last selected step. The default is the series length.
+
+        Returns:
+            WeatherData object with sliced series and the same metadata attributes.
+        """
+        data = self._data[:, start:stop]
+        if data.shape[1] == 0:
+            raise ValueError(f"Step window [{start}:{stop}] is empty for series length {self.metadata.series_len}.")
+
+        return self._with_series(data)
+
+    def resample(self, factor: int, how: str = "mean") -> WeatherData:
+        """
+        Creates a new WeatherData object by aggregating each 'factor' consecutive steps into one step, for example
+        to convert daily into weekly series. If series length is not a multiple of 'factor', the last step aggregates
+        the remaining values. Only unique series are aggregated, so the cost doesn't depend on the number of nodes.
+
+        Args:
+            factor: The number of consecutive steps aggregated into one step.
+            how: (Optional) The aggregation, "mean" or "sum". The default is "mean".
+
+        Returns:
+            WeatherData object with resampled series and the same metadata attributes.
+        """
+        if not isinstance(factor, (int, np.integer)) or factor < 1:
+            raise ValueError("Resampling factor must be a positive integer.")
+
+        if how not in ["mean", "sum"]:
+            raise ValueError(f"Unsupported aggregation '{how}', expected 'mean' or 'sum'.")
+
+        starts = np.arange(0, self.metadata.series_len, factor)
+        data = np.add.reduceat(np.asarray(self._data, dtype=np.float64), starts, axis=1)
+        if how == "mean":
+            data /= np.diff(np.append(starts, self.metadata.series_len))
+
+        return self._with_series(data.astype(np.float32))
+
+    def add(self, value: Union[float, Iterable[float], Dict[int, Union[float, Iterable[float]]]]) -> WeatherData:
+        """
+        Adds a value to weather time series in place, for example to shift air temperature by +2 degrees.
+        The value is applied to unique series only, so the cost doesn't depend on the number of nodes sharing series.
+
+        Args:
+            value: A scalar, a per-step array of series length (see expand_monthly), or a dictionary mapping node ids
+                   to scalars or per-step arrays. Nodes not in the dictionary are not changed.
+
+        Returns:
+            This WeatherData object (to support method chaining).
+        """
+        return self._transform(np.add, value, identity=0)
+
+    def scale(self, value: Union[float, Iterable[float], Dict[int, Union[float, Iterable[float]]]]) -> WeatherData:
+        """
+        Multiplies weather time series by a factor in place, for example to scale rainfall by 1.2.
+        The factor is applied to unique series only, so the cost doesn't depend on the number of nodes sharing series.
+
+        Args:
+            value: A scalar, a per-step array of series length (see expand_monthly), or a dictionary mapping node ids
+                   to scalars or per-step arrays. Nodes not in the dictionary are not changed.
+
+        Returns:
+            This WeatherData object (to support method chaining).
+        """
+        return self._transform(np.multiply, value, identity=1)
+
+    def clip(self,
+             lower: Union[float, Iterable[float]] = None,
+             upper: Union[float, Iterable[float]] = None) -> WeatherData:
+        """
+        Limits weather time series values to the given interval in place, for example humidity to [0, 1].
+
+        Args:
+            lower: (Optional) A scalar or a per-step array of series length. If not specified, there is no lower bound.
+            upper: (Optional) A scalar or a per-step array of series length. If not specified, there is no upper bound.
+
+        Returns:
+            This WeatherData object (to support method chaining).
+        """
+        if lower is None and upper is None:
+            raise ValueError("At least one of lower and upper bounds is required.")
+
+        lower = -np.inf if lower is None else self._step_values(lower)
+        upper = np.inf if upper is None else self._step_values(upper)
+        return self._set_series(np.clip(self._data, lower, upper), self._node_rows()[1])
+
+    def expand_monthly(self, values: Iterable[float]) -> np.ndarray[np.float32]:
+        """
+        Expands 12 monthly values into a per-step array, which can be passed to add or scale methods.
+        Series are assumed to be daily, starting on the day of year set in metadata (see expand_monthly in utils).
+
+        Args:
+            values: Monthly values, from January to December.
+
+        Returns:
+            Float32 array of series length.
+        """
+        start_day = parse_day_of_year(self.metadata.attributes_dict.get("StartDayOfYear") or 1)
+        return expand_monthly(values, series_len=self.metadata.series_len, start_day=start_day)
+
+    def copy(self) -> WeatherData:
+        """Creates a copy of this WeatherData object, with data read into memory. Used to create scenario variants."""
+        wm = WeatherMetadata(node_ids=dict(self.metadata.node_offsets), series_len=self.metadata.series_len,
+                             attributes=self.metadata.attributes, validate=False)
+        return WeatherData(data=np.array(self._data, dtype=np.float32), metadata=wm, validate=False)
+
+    def _transform(self, op: np.ufunc, value: Union[float, Iterable[float], Dict], identity: float) -> WeatherData:
+        """
+        Applies a binary operation to unique series in place, either uniformly or per node.
+
+        Args:
+            op: Binary NumPy function, applied to series and values.
+            value: A scalar, a per-step array or a dictionary mapping node ids to scalars or per-step arrays.
+            identity: The value for which the operation doesn't change series, used for nodes not in the dictionary.
+
+        Returns:
+            This WeatherData object.
+        """
+        node_ids, rows = self._node_rows()
+        if not isinstance(value, Dict):
+            return self._set_series(op(self._data, self._step_values(value)), rows)
+
+        missing = [n for n in value if n not in self.metadata.node_offsets]
+        if missing:
+            raise KeyError(f"Nodes {missing[:10]} not found in weather metadata.")
+
+        # Unique value arrays, index 0 is the identity (for nodes not in the dictionary).
+        values = np.stack([np.full(self.metadata.series_len, identity, dtype=np.float32)] +
+                          [self._step_values(v, broadcast=True) for v in value.values()])
+        value_idx, value_inverse = unique_series(values)
+        node_value = np.zeros(len(node_ids), dtype=np.int64)
+        positions = {n: i for i, n in enumerate(node_ids)}
+        node_value[[positions[n] for n in value]] = value_inverse[1:]
+
+        # Nodes sharing a series but getting different values need separate series, so unique pairs
+        # of (series, value) become new series, before deduplication.
+        pairs, pair_inverse = np.unique(rows * len(value_idx) + node_value, return_inverse=True)
+        series_rows, value_rows = np.divmod(pairs, len(value_idx))
+        data = op(self._data[series_rows], values[value_idx[value_rows]])
+        return self._set_series(data, pair_inverse.reshape(-1))
+
+    def _step_values(self, value: Union[float, Iterable[float]], broadcast: bool = False) -> np.ndarray[np.float32]:
+        """Converts a scalar or per-step value into a float32 array, broadcastable to series (one row)."""
+        value = np.asarray(value, dtype=np.float32)
+        if value.ndim == 0 and broadcast:
+            value = np.full(self.metadata.series_len, value, dtype=np.float32)
+        elif value.ndim > 0 and value.shape != (self.metadata.series_len,):
+            raise ValueError(f"Value must be a scalar or an array of series length {self.metadata.series_len}, "
+                             f"found shape {value.shape}.")
+
+        return value
+
+    def _set_series(self, data: np.ndarray[np.float32], node_rows: np.ndarray) -> WeatherData:
+        """Replaces data and metadata of this object in place, with transformed series (see _dedup_series)."""
+        self._data, self._metadata = self._dedup_series(data, node_rows)
+        return self
+
+    def _node_rows(self) -> Tuple[List[int], np.ndarray]:
+        """Returns node ids and the corresponding data row indices."""
+        node_ids = list(self.metadata.node_offsets)
+        rows = np.fromiter(self.metadata.node_offsets.values(), dtype=np.int64, count=len(node_ids))
+        rows //= self.metadata.series_len * SERIES_BYTE_VALUE_SIZE
+        return node_ids, rows
+
+    def _with_series(self, data: np.ndarray[np.float32]) -> WeatherData:
+        """
+        Creates a new WeatherData object from transformed unique series (same rows, different series length).
+        Series which became identical are deduplicated and node offsets are remapped accordingly.
+
+        Args:
+            data: Float32 2d array of transformed series, one row per current unique series.
+
+        Returns:
+            WeatherData object with the same nodes and metadata attributes.
+        """
+        data, wm = self._dedup_series(data, self._node_rows()[1])
+        return WeatherData(data=data, metadata=wm)
+
+    def _dedup_series(self,
+                      data: np.ndarray[np.float32],
+                      node_rows: np.ndarray) -> Tuple[np.ndarray[np.float32], WeatherMetadata]:
+        """
+        Deduplicates transformed series and remaps node offsets accordingly.
+
+        Args:
+            data: Float32 2d array of transformed series.
+            node_rows: Array mapping each node (in node-offset dictionary order) to a row of 'data'.
+
+        Returns:
+            Tuple of unique series data array and the weather metadata with the same nodes and attributes.
+        """
+        unique_idx, inverse = unique_series(data)
+        increment = data.shape[1] * SERIES_BYTE_VALUE_SIZE
+        node_offsets = dict(zip(self.metadata.node_offsets, (inverse[node_rows] * increment).tolist()))
+
+        data = np.ascontiguousarray(data[unique_idx], dtype=np.float32)
+        wm = WeatherMetadata(node_ids=node_offsets, series_len=data.shape[1], attributes=self.metadata.attributes)
+        return data, wm
+
     # Import/Export members
 
     @classmethod
@@ -107,41 +384,63 @@ class WeatherData:
         if np.any(np.isinf(np.abs(series_values))):
             raise ValueError("Time series contains 'inf' values which indicates failed conversion into np.float32.")
 
-        if len(series_values.shape) != 2:
+        if len(series_values.shape) != 2 or series_values.shape[1] == 0:
             raise ValueError("Time series must be a non-empty lists or array of float or integer values. "
                              "All time series must be of the same length.")
 
         # Check there are no NaN values in node ids
-        if any(np.isnan(list(node_series))):
+        node_ids = np.array(list(node_series))
+        if np.any(np.isnan(node_ids)):
             raise ValueError(f"Node id list contains 'NaN' values.")
 
         # Check there are no NaN values in weather time series
-        if any(np.isnan(series_values.reshape(-1))):    #
+        if np.any(np.isnan(series_values)):
             raise ValueError("Time series contains 'NaN' values.")
 
-        same_nodes = same_nodes or {}
+        wd = cls._from_array(node_ids=node_ids, series_values=series_values, same_nodes=same_nodes,
+                             attributes=attributes)
+        return wd
+
+    @classmethod
+    def _from_array(cls,
+                    node_ids: np.ndarray,
+                    series_values: np.ndarray[np.float32],
+                    same_nodes: Dict[int, List[int]] = None,
+                    attributes: WeatherAttributes = None) -> WeatherData:
+        """
+        Creates a WeatherData object from an array of node ids and a matrix of corresponding weather time series.
+        Identical series are stored only once, and nodes sharing a series are assigned the same offset.
+
+        Args:
+            node_ids: Array of node ids, one per row of 'series_values'.
+            series_values: Validated float32 2d array of weather time series, one row per node.
+            same_nodes: (Optional) Dictionary, mapping nodes from 'node_ids' array to additional nodes
+                                   which series are the same. Keys are node ids, values are lists of node ids.
+            attributes: (Optional) Attributes used to initiate weather metadata. If not provided, defaults are used.
 
+        Returns:
+            WeatherData object.
+        """
         # Identify unique node weather time series, make sure node ids are int.
-        node_series_hashes = {int(n): hash_series(s) for n, s in node_series.items()}       # Create node->hash dict
-        unique_nodes = {h: nn[0] for h, nn in invert_dict(node_series_hashes).items()}      # Invert into hash->nodes
-        unique_series = [node_series[n] for n in unique_nodes.values()]                     # List unique time series
+        unique_idx, inverse = unique_series(series_values)
 
         # Calculate offset increment per node as time series length x number of bytes per value
         offset_increment = series_values.shape[1] * SERIES_BYTE_VALUE_SIZE
-        # Create node->offset dict, for nodes with unique weather time series
-        node_offsets = {n: (i * offset_increment) for i, n in enumerate(unique_nodes.values())}
-        # Update node->offset dict, add nodes sharing same offsets
-        node_offsets.update({n: node_offsets[unique_nodes[h]] for n, h in node_series_hashes.items()})
+        # Create node->offset dict sorted by node, nodes with the same weather time series share the same offset
+        node_ids = np.asarray(node_ids).astype(np.int64)
+        order = np.argsort(node_ids, kind="stable")
+        node_offsets = dict(zip(node_ids[order].tolist(), (inverse[order] * offset_increment).tolist()))
 
         # Add other nodes, if specified
-        # Invert dict from "unique node"->"list of nodes with that same offset" to "...same..."->"unique node"
-        same_nodes = invert_dict(same_nodes, single_value=True)
-        node_offsets.update({same: node_offsets[unique] for same, unique in same_nodes.items()})
-        # Sort by node, offset
-        node_offsets = dict(sorted(node_offsets.items()))
-
-        # Convert the list of weather timeseries into a NumPy array and init WeatherMetadata and WeatherData objects
-        data = np.array(unique_series, dtype=np.float32)
+        if same_nodes:
+            # Invert dict from "unique node"->"list of nodes with that same offset" to "...same..."->"unique node"
+            same_nodes = invert_dict(same_nodes, single_value=True)
+            node_offsets.update({same: node_offsets[unique] for same, unique in same_nodes.items()})
+            # Sort by node, offset
+            node_offsets = dict(sorted(node_offsets.items()))
+
+        # Select unique weather time series and init WeatherMetadata and WeatherData objects
+        data = np.ascontiguousarray(series_values[unique_idx], dtype=np.float32)
         wm = WeatherMetadata(node_ids=node_offsets, series_len=data.shape[1], attributes=attributes)
         wd = WeatherData(data=data, metadata=wm)
 
@@ -188,20 +487,85 @@ class WeatherData:
         wd = cls.from_dataframe(df, info=info, attributes=attributes)
         return wd
 
-    def to_csv(self, file_path: Union[str, Path], info: DataFrameInfo = None) -> pd.DataFrame:
+    def to_csv(self,
+               file_path: Union[str, Path],
+               info: DataFrameInfo = None,
+               chunk_size: int = None) -> Union[pd.DataFrame, None]:
         """
         Creates a csv file and stores node ids, time steps and weather node weather time series as separate columns.
 
         Args:
             file_path: The csv file path into which weather data will be stored.
             info: (Optional) Dataframe info object describing dataframe columns and content.
+            chunk_size: (Optional) The approximate number of csv rows written at once. If specified, the csv file
+                        is written in blocks of whole node series, so memory use doesn't depend on the number of nodes,
+                        and no dataframe is returned.
 
         Returns:
-            Dataframe created as an intermediate object used to save data to a csv file.
+            Dataframe created as an intermediate object used to save data to a csv file, or None if 'chunk_size' is set.
+        """
+        make_path(Path(file_path).parent)
+        if chunk_size is None:
+            df = self.to_dataframe(info=info)
+            df.to_csv(file_path, index=False)
+            return df
+
+        info = info or DataFrameInfo()
+        node_ids, rows = self._export_rows(only_unique_series=info.only_unique_series)
+        write_csv_blocks(file_path,
+                         node_count=len(node_ids),
+                         nodes_per_block=max(1, chunk_size // self.metadata.series_len),
+                         make_block=lambda b: self._rows_to_dataframe(node_ids[b], rows[b], info))
+        return None
+
+    @classmethod
+    def from_parquet(cls,
+                     file_path: Union[str, Path],
+                     info: DataFrameInfo = None,
+                     attributes: WeatherAttributes = None,
+                     node_ids: List[int] = None) -> WeatherData:
+        """
+        Creates a WeatherData object from a parquet file, with the same layout as a csv file (node, step, value).
+        Requires a parquet engine (pyarrow or fastparquet).
+
+        Args:
+            file_path: The parquet file path from which weather data is loaded (expected columns: node, step, value).
+            info: (Optional) Dataframe info object describing dataframe columns and content. If specified, only
+                  node, step and value columns are read, otherwise all columns are read to detect column names.
+            attributes: (Optional) Attributes used to initiate weather metadata. If not provided, defaults are used.
+            node_ids: (Optional) Node ids to be read. If not specified, all nodes are read.
+
+        Returns:
+            WeatherData object.
+        """
+        assert Path(file_path).is_file(), f"Weather file not found: {file_path}."
+        if info:
+            columns = [info.node_column, info.step_column, info.value_column]
+            df = read_parquet(file_path, columns=columns, node_column=info.node_column, node_ids=node_ids)
+        else:
+            df = read_parquet(file_path)
+            info = DataFrameInfo.detect_columns(df=df)
+            if node_ids is not None:
+                df = df[df[info.node_column].isin(node_ids)]
+
+        wd = cls.from_dataframe(df, info=info, attributes=attributes)
+        return wd
+
+    def to_parquet(self, file_path: Union[str, Path], info: DataFrameInfo = None) -> pd.DataFrame:
+        """
+        Creates a parquet file and stores node ids, time steps and weather time series as separate columns.
+        Weather values are stored as float32. Requires a parquet engine (pyarrow or fastparquet).
+
+        Args:
+            file_path: The parquet file path into which weather data will be stored.
+            info: (Optional) Dataframe info object describing dataframe columns and content.
+
+        Returns:
+            Dataframe created as an intermediate object used to save data to a parquet file.
         """
         make_path(Path(file_path).parent)
         df = self.to_dataframe(info=info)
-        df.to_csv(file_path, index=False)
+        df.to_parquet(file_path, index=False)
         return df
 
     @classmethod
@@ -233,72 +597,139 @@ class WeatherData:
             if df[c].hasnans:
                 raise ValueError(f"Column {c} contains 'NaN' values.")
 
-        df = df[[nc, sc, vc]].sort_values(by=[nc, sc])
-        df = df[[nc, vc]].set_index(nc)
-        node_series = df.groupby(nc).apply(lambda r: r.to_dict('records')).to_dict()
-        node_series = {node: [list(d.values())[0] for d in rw] for node, rw in node_series.items()}
+        node_ids, series_values = cls._pivot_series(nodes=df[nc].to_numpy(),
+                                                    steps=df[sc].to_numpy(),
+                                                    values=df[vc].to_numpy())
 
-        wd = cls.from_dict(node_series=node_series, attributes=attributes)
+        wd = cls._from_array(node_ids=node_ids, series_values=series_values, attributes=attributes)
         return wd
 
+    @staticmethod
+    def _pivot_series(nodes: np.ndarray,
+                      steps: np.ndarray,
+                      values: np.ndarray) -> Tuple[np.ndarray, np.ndarray[np.float32]]:
+        """
+        Pivot node, step and value columns (long format) into a matrix of weather time series, one row per node.
+        Rows are sorted by node and columns by step. All nodes are expected to have the same set of evenly spaced steps.
+
+        Args:
+            nodes: Array of node ids.
+            steps: Array of time steps.
+            values: Array of weather values.
+
+        Returns:
+            Tuple of sorted unique node ids array and float32 2d array of weather time series (nodes x steps).
+        """
+        # Sort once, by node and then by step.
+        order = np.lexsort((steps, nodes))
+        nodes, steps = nodes[order], steps[order]
+        try:
+            values = np.asarray(values[order], dtype=np.float32)
+        except ValueError:
+            raise ValueError("Time series contains values which are not numbers.")
+
+        if np.any(np.isinf(values)):
+            raise ValueError("Time series contains 'inf' values which indicates failed conversion into np.float32.")
+
+        # Validate each node has the same number of steps.
+        node_ids, counts = np.unique(nodes, return_counts=True)
+        series_len = int(counts[0])
+        if np.any(counts != series_len):
+            raise ValueError("All time series must be of the same length.")
+
+        # Validate all nodes have the same distinct steps.
+        steps = steps.reshape(len(node_ids), series_len)
+        if np.any(steps != steps[0]) or len(np.unique(steps[0])) != series_len:
+            raise ValueError("All time series must have the same distinct steps.")
+
+        # Validate the step grid is regular, there are no gaps between steps.
+        if np.any(np.diff(steps[0]) != steps[0][1:2] - steps[0][:1]):
+            raise ValueError("Time series steps must be evenly spaced, without gaps.")
+
+        series_values = values.reshape(len(node_ids), series_len)
+        return node_ids, series_values
+
     def to_dataframe(self, info: DataFrameInfo = None) -> pd.DataFrame:
         """
         Creates a dataframe containing node ids, time steps and weather time series as separate columns.
+        Columns are built directly from unique series and node offsets, without creating a node-series dictionary.
 
         Args:
             info: (Optional) Dataframe info object describing dataframe columns and content.
 
         Returns:
-            Dataframe containing node ids and weather time series.
+            Dataframe containing node ids and weather time series, sorted by node and step.
         """
         info = info or DataFrameInfo()
-        data_dict = self.to_dict(only_unique_series=info.only_unique_series)
+        node_ids, rows = self._export_rows(only_unique_series=info.only_unique_series)
+        return self._rows_to_dataframe(node_ids, rows, info)
+
+    def _export_rows(self, only_unique_series: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns sorted node ids and corresponding data row indices, used to export data.
 
-        actual_nodes = list(data_dict.keys())
+        Args:
+            only_unique_series: (Optional) Flag indicating whether to only return one node (the smallest id) per series.
+
+        Returns:
+            Tuple of node ids array and data row indices array.
+        """
+        node_ids, rows = self._node_rows()
+        node_ids = np.array(node_ids, dtype=np.int64)
+        if only_unique_series:
+            order = np.lexsort((node_ids, rows))
+            node_ids, rows = node_ids[order], rows[order]
+            is_first = np.ones(len(rows), dtype=bool)
+            is_first[1:] = rows[1:] != rows[:-1]
+            node_ids, rows = node_ids[is_first], rows[is_first]
+
+        order = np.argsort(node_ids, kind="stable")
+        return node_ids[order], rows[order]
+
+    def _rows_to_dataframe(self, node_ids: np.ndarray, rows: np.ndarray, info: DataFrameInfo) -> pd.DataFrame:
+        """Creates a dataframe for the given nodes and data rows, using repeated node ids and tiled steps."""
         series_len = self.metadata.series_len
-        nodes = np.repeat(actual_nodes, series_len)
-        steps = list(range(1, series_len + 1)) * len(actual_nodes)
-        values = np.array(list(data_dict.values())).reshape(len(data_dict) * self.metadata.series_len)
-
-        assert len(nodes) == len(steps) == len(values), "Dataframe series lengths don't match"
-        # assert all([n == nodes[0] for n in nodes[:series_len] and  == steps[series_len:series_len + 1],
-        if len(data_dict) > 1:  # Skip validation in case of a single node.
-            assert steps[:series_len] == steps[series_len:series_len * 2], "Steps series is not valid."
-
-        column_series_dict = {info.node_column: nodes, info.step_column: steps, info.value_column: values}
-        df = pd.DataFrame(column_series_dict)
-        # Set data types
-        df[info.node_column] = df[info.node_column].astype(int)
-        df[info.step_column] = df[info.step_column].astype(int)
-        df[info.value_column] = df[info.value_column].astype(np.float32)
-        df.sort_values(by=[info.node_column, info.step_column])
-        return df
+        return pd.DataFrame({
+            info.node_column: np.repeat(node_ids, series_len),
+            info.step_column: np.tile(np.arange(1, series_len + 1, dtype=np.int64), len(node_ids)),
+            info.value_column: np.asarray(self._data[rows], dtype=np.float32).reshape(-1)})
 
     @classmethod
-    def from_file(cls, file_path: Union[str, Path]) -> WeatherData:
+    def from_file(cls, file_path: Union[str, Path], mmap: bool = False, validate: bool = True) -> WeatherData:
         """
         Create WeatherData object by reading weather data from binary (.bin) and metadata (.bin.json) files.
 
         Args:
             file_path: The weather binary (.bin) file path. The metadata file path is constructed by appending ".json".
+            mmap: (Optional) Flag indicating whether to memory-map the binary file instead of reading it into memory.
+                  Data is then read lazily, only for the series being accessed. The mapping is copy-on-write:
+                  editing data changes it in memory only, the binary file is changed only by calling 'to_file'.
+            validate: (Optional) Flag indicating whether to validate metadata and data (see validate). Skipping
+                      validation is only recommended for trusted files, for example those verified by the
+                      integrity index (see emodpy_malaria.integrity).
 
         Returns:
             WeatherData object.
         """
         file_path = str(file_path)
-        wm: WeatherMetadata = WeatherMetadata.from_file(f"{file_path}.json")
+        wm: WeatherMetadata = WeatherMetadata.from_file(f"{file_path}.json", validate=validate)
         assert Path(file_path).is_file(), f"Data file not found: {file_path}."
-        data = np.fromfile(file_path, dtype=np.float32)
-        data_len = len(data)
+        data_len = Path(file_path).stat().st_size // SERIES_BYTE_VALUE_SIZE
         msg = f"Data length {data_len} doesn't match metadata"
         msg += f" ({wm.series_count} * {wm.series_len} = {wm.total_value_count})"
         assert wm.total_value_count == data_len, msg
-        wd = WeatherData(data=data, metadata=wm)
+        if mmap:
+            data = np.memmap(file_path, dtype=np.float32, mode="c", shape=(wm.series_count, wm.series_len))
+        else:
+            data = np.fromfile(file_path, dtype=np.float32)
+        wd = WeatherData(data=data, metadata=wm, validate=validate)
         return wd
 
     def to_file(self, file_path: Union[str, Path]) -> NoReturn:
         """
-        Create weather binary (.bin) and metadata (.json) files, containing weather data and metadata.
+        Create weather binary (.bin) and metadata (.json) files, containing weather data and metadata,
+        and the integrity index file (see emodpy_malaria.integrity). Existing files are replaced rather than modified
+        in place, so other hardlinks to them (e.g. shared scenario or cached weather files) are not affected.
 
         Args:
             file_path: The weather binary (.bin) file path. The metadata file path is constructed by adding ".json".
@@ -309,11 +740,17 @@ class WeatherData:
         file_path = str(file_path)
         self.validate()
         make_path(Path(file_path).parent)
-        self._ensure_data_type(self._data)
-        with open(file_path, "wb") as bf:
-            self._data.reshape(self.metadata.total_value_count).tofile(bf)
+        data = self._ensure_data_type(self._data)
+        if isinstance(data, np.memmap) and Path(data.filename).resolve() == Path(file_path).resolve():
+            # Replacing the memory-mapped file, so data is read into memory and the replaced file is no longer mapped.
+            data = np.array(data)
+            self._data = data
+
+        with atomic_write(file_path) as bf:
+            data.reshape(self.metadata.total_value_count).tofile(bf)
 
         self._metadata.to_file(f"{file_path}.json")
+        write_index(file_path)
 
     @classmethod
     def _ensure_data_type(cls, data: Iterable) -> np.ndarray[np.float32]:
@@ -327,6 +764,11 @@ class WeatherData:
         Returns:
             Node weather time series as a NumPy float32 array.
         """
+        if isinstance(data, np.ndarray) and data.dtype == np.float32:
+            # Avoid copying (and reading, in case of memory-mapped data) arrays which are already of the right type.
+            assert data.size > 0, "Data must have at least one item"
+            return data
+
         is_iter_ok = isinstance(data, Iterable) and len(list(data)) > 0
         assert data is not None and is_iter_ok, "Data must have at least one item"
         data = np.array(data, dtype=np.float32)
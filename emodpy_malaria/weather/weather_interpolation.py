@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+"""
+Weather interpolation module, implementing spatial interpolation of weather time series from grid cells (weather nodes
+with known coordinates) to arbitrary nodes, for example demographics nodes.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from scipy.spatial import cKDTree
+from typing import Dict, Tuple, Union
+
+from emodpy_malaria.weather.weather_data import WeatherData
+from emodpy_malaria.weather.weather_metadata import WeatherAttributes, WeatherMetadata, SERIES_BYTE_VALUE_SIZE
+from emodpy_malaria.weather.weather_utils import unique_series
+
+INTERPOLATION_METHODS = ["nearest", "idw", "bilinear"]
+_COORDINATE_DECIMALS = 6        # Grid coordinates are rounded when detecting grid axes, to ignore float noise.
+_CHUNK_SIZE = 4096              # The number of interpolated series computed at once.
+
+
+def read_grid(grid: Union[str, Path, pd.DataFrame, Dict[int, Tuple[float, float]]],
+              node_column: str = "nodes",
+              lat_column: str = "lat",
+              lon_column: str = "lon") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read grid cell node ids and coordinates.
+
+    Args:
+        grid: A csv file path or a dataframe with node id, latitude and longitude columns (like a weather request
+              site file), or a dictionary of node ids (keys) and (lat, lon) tuples (values).
+        node_column: (Optional) Node id column name. The default is "nodes".
+        lat_column: (Optional) Latitude column name. The default is "lat".
+        lon_column: (Optional) Longitude column name. The default is "lon".
+
+    Returns:
+        Tuple of node ids, latitudes and longitudes arrays.
+    """
+    if isinstance(grid, Dict):
+        node_ids = np.fromiter(grid.keys(), dtype=np.int64, count=len(grid))
+        coordinates = np.array(list(grid.values()), dtype=np.float64).reshape(-1, 2)
+        return node_ids, coordinates[:, 0], coordinates[:, 1]
+
+    df = grid if isinstance(grid, pd.DataFrame) else pd.read_csv(grid)
+    return (np.asarray(df[node_column], dtype=np.int64),
+            np.asarray(df[lat_column], dtype=np.float64),
+            np.asarray(df[lon_column], dtype=np.float64))
+
+
+def to_xyz(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Convert latitudes and longitudes (in degrees) into 3d coordinates of points on the unit sphere."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def interpolation_weights(grid_lat: np.ndarray,
+                          grid_lon: np.ndarray,
+                          lat: np.ndarray,
+                          lon: np.ndarray,
+                          method: str = "nearest",
+                          k: int = 4,
+                          power: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate interpolation weights of grid cells for each target point. Nearest cells are found using a KD-tree
+    built over grid cell positions on the unit sphere, so distances are correct across the antimeridian and near poles.
+
+    Args:
+        grid_lat: Grid cell latitudes.
+        grid_lon: Grid cell longitudes.
+        lat: Target point latitudes.
+        lon: Target point longitudes.
+        method: (Optional) Interpolation method:
+                - "nearest": the value of the nearest grid cell (the default).
+                - "idw": inverse distance weighting of 'k' nearest grid cells.
+                - "bilinear": bilinear interpolation between 4 surrounding cells of a regular lat/lon grid. Cells
+                  missing from the grid are skipped, points outside the grid take the values of the grid edge.
+        k: (Optional) The number of grid cells used by "idw" method. The default is 4.
+        power: (Optional) Distance power used by "idw" method. The default is 2.
+
+    Returns:
+        Tuple of two arrays of the same shape (points x cells): grid cell indices and weights. Weights sum to 1.
+    """
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f"Unsupported interpolation method '{method}', expected one of {INTERPOLATION_METHODS}.")
+
+    if len(grid_lat) == 0:
+        raise ValueError("At least one grid cell is required.")
+
+    tree = cKDTree(to_xyz(grid_lat, grid_lon))
+    xyz = to_xyz(lat, lon)
+    if method == "nearest" or len(grid_lat) == 1:
+        _, indices = tree.query(xyz, k=1)
+        indices = indices.reshape(-1, 1)
+        return indices, np.ones(indices.shape, dtype=np.float64)
+
+    if method == "idw":
+        distances, indices = tree.query(xyz, k=min(k, len(grid_lat)))
+        distances, indices = distances.reshape(len(xyz), -1), indices.reshape(len(xyz), -1)
+        with np.errstate(divide="ignore"):
+            weights = 1.0 / distances ** power
+        # Points matching a grid cell take its value.
+        is_exact = distances[:, 0] == 0
+        weights[is_exact] = 0
+        weights[is_exact, 0] = 1
+        return indices, weights / weights.sum(axis=1, keepdims=True)
+
+    indices, weights = _bilinear_weights(grid_lat, grid_lon, lat, lon)
+    # Points surrounded only by missing grid cells fall back to the nearest cell.
+    is_missing = weights.sum(axis=1) == 0
+    if np.any(is_missing):
+        _, nearest = tree.query(xyz[is_missing], k=1)
+        indices[is_missing, 0] = nearest
+        weights[is_missing, 0] = 1
+
+    return indices, weights / weights.sum(axis=1, keepdims=True)
+
+
+def _bilinear_weights(grid_lat: np.ndarray,
+                      grid_lon: np.ndarray,
+                      lat: np.ndarray,
+                      lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Calculate bilinear weights of 4 surrounding grid cells. Weights of cells missing from the grid are 0."""
+    grid_lat, grid_lon = np.round(grid_lat, _COORDINATE_DECIMALS), np.round(grid_lon, _COORDINATE_DECIMALS)
+    lat_axis, lat_idx = np.unique(grid_lat, return_inverse=True)
+    lon_axis, lon_idx = np.unique(grid_lon, return_inverse=True)
+
+    # Grid lattice, mapping lat and lon axis positions to grid cell indices (-1 for missing cells).
+    lattice = np.full((len(lat_axis), len(lon_axis)), -1, dtype=np.int64)
+    lattice[lat_idx.reshape(-1), lon_idx.reshape(-1)] = np.arange(len(grid_lat))
+
+    i0, i1, t = _axis_position(lat_axis, lat)
+    j0, j1, u = _axis_position(lon_axis, lon)
+    indices = np.column_stack([lattice[i0, j0], lattice[i0, j1], lattice[i1, j0], lattice[i1, j1]])
+    weights = np.column_stack([(1 - t) * (1 - u), (1 - t) * u, t * (1 - u), t * u])
+
+    is_missing = indices < 0
+    weights[is_missing] = 0
+    indices[is_missing] = 0
+    return indices, weights
+
+
+def _axis_position(axis: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Find the lower and upper axis positions surrounding each value and the relative value position between them."""
+    if len(axis) == 1:
+        zeros = np.zeros(len(values), dtype=np.int64)
+        return zeros, zeros, np.zeros(len(values), dtype=np.float64)
+
+    lower = np.clip(np.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+    upper = lower + 1
+    fraction = np.clip((values - axis[lower]) / (axis[upper] - axis[lower]), 0, 1)
+    return lower, upper, fraction
+
+
+def interpolate_weather(weather_data: WeatherData,
+                        grid_node_ids: np.ndarray,
+                        node_ids: np.ndarray,
+                        indices: np.ndarray,
+                        weights: np.ndarray,
+                        attributes: WeatherAttributes = None) -> WeatherData:
+    """
+    Create WeatherData for target nodes as weighted sums of grid cell series (see interpolation_weights).
+    Target nodes with the same cells and weights are computed once, and the resulting series are deduplicated.
+
+    Args:
+        weather_data: Weather data containing series of grid cell nodes.
+        grid_node_ids: Grid cell node ids, corresponding to grid cell indices.
+        node_ids: Target node ids.
+        indices: Grid cell indices for each target node (nodes x cells).
+        weights: Grid cell weights for each target node (nodes x cells).
+        attributes: (Optional) Attributes of the new weather data. The default are attributes of 'weather_data'.
+
+    Returns:
+        WeatherData object for target nodes.
+    """
+    metadata = weather_data.metadata
+    missing = [int(n) for n in grid_node_ids if int(n) not in metadata.node_offsets]
+    if missing:
+        raise KeyError(f"Grid nodes {missing[:10]} not found in weather metadata.")
+
+    series_size = metadata.series_len * SERIES_BYTE_VALUE_SIZE
+    grid_rows = np.array([metadata.node_offsets[int(n)] for n in grid_node_ids], dtype=np.int64) // series_size
+
+    # Nodes sharing the same weighted combination of grid series get the same series.
+    weights = np.where(weights > 0, weights, 0)
+    rows = np.where(weights > 0, grid_rows[indices], -1)
+    combinations, node_combination = np.unique(np.hstack([rows, weights]), axis=0, return_inverse=True)
+    cell_count = rows.shape[1]
+    combination_rows = combinations[:, :cell_count].astype(np.int64)
+    combination_weights = combinations[:, cell_count:].astype(np.float32)
+
+    data = np.zeros((len(combinations), metadata.series_len), dtype=np.float32)
+    for start in range(0, len(combinations), _CHUNK_SIZE):
+        chunk = slice(start, start + _CHUNK_SIZE)
+        for c in range(cell_count):
+            cell_rows, cell_weights = combination_rows[chunk, c], combination_weights[chunk, c]
+            data[chunk] += cell_weights[:, None] * weather_data.data[np.maximum(cell_rows, 0)]
+
+    unique_idx, inverse = unique_series(data)
+    offsets = inverse[node_combination.reshape(-1)] * series_size
+    node_offsets = dict(zip(np.asarray(node_ids, dtype=np.int64).tolist(), offsets.tolist()))
+    wm = WeatherMetadata(node_ids=node_offsets,
+                         series_len=metadata.series_len,
+                         attributes=attributes or metadata.attributes)
+    return WeatherData(data=np.ascontiguousarray(data[unique_idx]), metadata=wm)
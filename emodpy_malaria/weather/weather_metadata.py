@@ -11,8 +11,9 @@ import json
 
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, NoReturn, Union
+from typing import Dict, Iterable, List, NoReturn, Tuple, Union
 
+from emodpy_malaria.node_offsets import node_offsets_to_str, str_to_node_offsets
 from emodpy_malaria.weather.weather_utils import invert_dict, make_path, save_json,  validate_str_value
 
 SERIES_BYTE_VALUE_SIZE = 4  # Single series value is stored as 4 bytes = 32b
@@ -55,6 +56,89 @@ _META_DATA_CELL_VALUE_COUNT = "DatavaluePerCell"
 _META_REQUIRED_ARGS = [_META_ID_REFERENCE]
 _META_REQUIRED_CALC = [_META_DATA_VALUE_COUNT]
 
+# https://github.com/InstituteforDiseaseModeling/DtkTrunk/blob/master/Eradication/Climate.h#L151-L154
+_MAX_UINT32 = int("FFFFFFFF", 16)   # max unsigned 32 bit value, the max node id and offset value.
+
+
+class WeatherValidationError(ValueError):
+    """Weather validation error, listing all validation failures found in one validation pass."""
+    def __init__(self, errors: List[str]):
+        self.errors: List[str] = errors
+        super().__init__("\n".join(errors))
+
+
+def find_weather_errors(offsets: np.ndarray,
+                        series_len: int,
+                        node_ids: np.ndarray = None,
+                        series_count: int = None,
+                        data: np.ndarray = None,
+                        declared_counts: Dict[str, int] = None) -> List[str]:
+    """
+    Validates weather node ids, offsets and data using array operations and returns the list of all failures found.
+
+    Args:
+        offsets: Array of node offsets, in bytes.
+        series_len: The length of a weather time series.
+        node_ids: (Optional) Array of node ids, checked for range and uniqueness.
+        series_count: (Optional) The number of series stored, used to check offsets alignment and bounds.
+        data: (Optional) Array of weather time series, checked for NaN and inf values.
+        declared_counts: (Optional) Metadata count attributes (e.g. read from a file), checked against node ids,
+                         offsets and series length.
+
+    Returns:
+        List of validation failure messages, empty if validation passed.
+    """
+    errors = []
+    if node_ids is not None:
+        invalid = node_ids[(node_ids <= 0) | (node_ids > _MAX_UINT32)]
+        if len(invalid) > 0:
+            errors.append(f"Node values must be integers in (0, {str(_MAX_UINT32)}] interval. "
+                          f"Found {len(invalid)} invalid node ids: {invalid[:5].tolist()}")
+
+        if len(np.unique(node_ids)) != len(node_ids):
+            errors.append("node_ids must be unique")
+
+    invalid = offsets[(offsets < 0) | (offsets > _MAX_UINT32)]
+    if len(invalid) > 0:
+        errors.append(f"Node offset values must be integers in [0, {str(_MAX_UINT32)}] interval. "
+                      f"Found {len(invalid)} invalid offsets: {invalid[:5].tolist()}")
+        return errors   # Other offset checks are not meaningful.
+
+    distinct = np.unique(offsets)
+    if len(distinct) > 1 and int(float(distinct[1] - distinct[0]) / SERIES_BYTE_VALUE_SIZE) != series_len:
+        errors.append("Weather time series length doesn't match provided offsets distance.")
+
+    if series_count is not None or data is not None:
+        series_count = len(data) if data is not None else series_count
+        row_size = series_len * SERIES_BYTE_VALUE_SIZE
+        misaligned = offsets[offsets % row_size != 0]
+        if len(misaligned) > 0:
+            errors.append(f"Found {len(misaligned)} offsets not aligned to series boundaries ({row_size} bytes): "
+                          f"{misaligned[:5].tolist()}")
+
+        outside = offsets[offsets // row_size >= series_count]
+        if len(outside) > 0:
+            errors.append(f"Found {len(outside)} offsets outside of data ({series_count} series): "
+                          f"{outside[:5].tolist()}")
+
+    if data is not None and not np.all(np.isfinite(data)):
+        nan_count, inf_count = int(np.count_nonzero(np.isnan(data))), int(np.count_nonzero(np.isinf(data)))
+        errors.append(f"Time series contains {nan_count} 'NaN' and {inf_count} 'inf' values.")
+
+    if declared_counts:
+        node_count = len(offsets)
+        expected = {
+            _META_OFFSET_COUNT: node_count,
+            _META_DTK_NODES_COUNT: node_count,
+            _META_NODE_COUNT: node_count,
+            _META_DATA_VALUE_COUNT: series_len,
+            _META_DATA_CELL_VALUE_COUNT: series_len}
+        for k, v in expected.items():
+            if k in declared_counts and declared_counts[k] != v:
+                errors.append(f"Metadata attribute {k} value {declared_counts[k]} doesn't match the actual value {v}.")
+
+    return errors
+
 
 class WeatherAttributes:
     """
@@ -292,7 +376,8 @@ class WeatherMetadata(WeatherAttributes):
     def __init__(self,
                  node_ids: Union[List[int], Dict[int, int]],
                  series_len: int = None,
-                 attributes: Union[WeatherMetadata, WeatherAttributes, Dict[str, Union[str, int, float]]] = None):
+                 attributes: Union[WeatherMetadata, WeatherAttributes, Dict[str, Union[str, int, float]]] = None,
+                 validate: bool = True):
         """
         Initiate WeatherMetadata object.
 
@@ -302,6 +387,8 @@ class WeatherMetadata(WeatherAttributes):
                       If a list of nodes ids is provided, offsets are calculated based on weather time series length.
             series_len: The length of a weather time series (aka "data value count").
             attributes: Weather attributes, either as an objects or a dictionary.
+            validate: (Optional) Flag indicating whether to validate nodes and offsets. Skipping validation
+                      is only recommended for trusted inputs, like files created by this package.
 
         """
         if isinstance(attributes, WeatherMetadata) or isinstance(attributes, WeatherAttributes):
@@ -319,9 +406,11 @@ class WeatherMetadata(WeatherAttributes):
         else:
             # If node id list is provided, offsets are calculated based on weather time series length.
             self._validate_series_len(series_len)   # if node_ids is a list a valid series_len must be provided.
+            # Map each node to the position of its first appearance in the list.
+            positions = {node_id: i for i, node_id in reversed(list(enumerate(node_ids)))}
             self._node_offsets = {
-                node_id: series_len * node_ids.index(node_id) * SERIES_BYTE_VALUE_SIZE
-                for node_id in sorted(node_ids)
+                node_id: series_len * positions[node_id] * SERIES_BYTE_VALUE_SIZE
+                for node_id in sorted(positions)
             }
 
         self._series_len = series_len
@@ -330,7 +419,8 @@ class WeatherMetadata(WeatherAttributes):
         metadata_count_dict = self._metadata_count_dict
 
         self.update(metadata_count_dict)
-        self.validate()
+        if validate:
+            self.validate()
 
     def __eq__(self, other: WeatherMetadata):
         """Equality operator for WeatherMetadata objects"""
@@ -364,42 +454,43 @@ class WeatherMetadata(WeatherAttributes):
             expected = -1
         return expected
 
-    def validate(self):
-        """Validate metadata object node-related counts. Relies on inherited validation of metadata attributes."""
+    def validate(self, declared_counts: Dict[str, int] = None):
+        """
+        Validate metadata object node-related counts. Relies on inherited validation of metadata attributes.
+        Node ids and offsets are validated together, raising WeatherValidationError listing all failures found.
+
+        Args:
+            declared_counts: (Optional) Metadata count attributes, for example read from a metadata file,
+                             which must match node offsets and series length.
+        """
         super().validate()
 
         # Validate nodes and offsets
         assert isinstance(self.nodes, Iterable), "node_ids must be iterable"
         assert len(self.nodes) > 0, "node_ids must not be empty"
-        assert all(map(lambda i: isinstance(i, int), self.nodes)), "node_ids must be integers"
-
-        # Validate node id and offset range
-        # https://github.com/InstituteforDiseaseModeling/DtkTrunk/blob/master/Eradication/Climate.h#L151-L154
-        max_uint32 = int("FFFFFFFF", 16)   # max unsigned 32 bit value
-        invalid_nodes, invalid_offsets = [], []
-        for node_id, offset in self.node_offsets.items():
-            if not 0 < node_id <= max_uint32:
-                invalid_nodes.append(node_id)
-
-            if not 0 <= offset <= max_uint32:
-                invalid_offsets.append(offset)
-
-        if len(invalid_nodes) > 0:
-            print(f"Found {len(invalid_nodes)} invalid node ids: {invalid_nodes[:5]}")
-            raise ValueError(f"Node values must be integers in (0, {str(max_uint32)}] interval.")
+        node_ids, offsets = self._node_offset_arrays()
+        assert self._is_int_array(node_ids), "node_ids must be integers"
+        if not self._is_int_array(offsets):
+            raise ValueError("Node offset values must be integers.")
 
-        if len(invalid_offsets) > 0:
-            print(f"Found {len(invalid_offsets)} invalid offsets: {invalid_offsets[:5]}")
-            raise ValueError(f"Node offset values must be integers in [0, {str(max_uint32)}] interval.")
-
-        assert len(set(self.nodes)) == len(self.nodes), "node_ids must be unique"
+        self._validate_series_len(self._series_len)
+        errors = find_weather_errors(offsets=offsets,
+                                     series_len=self._series_len,
+                                     node_ids=node_ids,
+                                     declared_counts=declared_counts)
+        if len(errors) > 0:
+            raise WeatherValidationError(errors)
 
-        assert len(self.node_offset_str) == self.node_count * 16, "node_offset_str length doesn't match node count. "
+    def _node_offset_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns node ids and offsets as arrays (of object type, if values don't fit into 64 bit integers)."""
+        return np.array(list(self._node_offsets)), np.array(list(self._node_offsets.values()))
 
-        # Validate series_len
-        self._validate_series_len(self._series_len)
-        if 0 < self._expected_series_len() != self._series_len:
-            raise ValueError("Weather time series length doesn't match provided offsets distance.")
+    @staticmethod
+    def _is_int_array(values: np.ndarray) -> bool:
+        """Returns True if array values are integers."""
+        if values.dtype.kind == "O":
+            return all(isinstance(v, int) for v in values.tolist())
+        return values.dtype.kind in "iu"
 
     # Operational properties (read-only)
     @property
@@ -486,9 +577,17 @@ class WeatherMetadata(WeatherAttributes):
         assert Path(file_path).is_file(), f"Failed to create weather metadata file {file_path}"
 
     @classmethod
-    def from_file(cls, file_path: Union[str, Path]) -> WeatherMetadata:
+    def from_file(cls, file_path: Union[str, Path], validate: bool = True) -> WeatherMetadata:
         """
         Read weather metadata file into a weather metadata object.
+
+        Args:
+            file_path: The weather metadata file path.
+            validate: (Optional) Flag indicating whether to validate node offsets and check that metadata counts
+                      match them. Skipping validation is only recommended for trusted files.
+
+        Returns:
+            WeatherMetadata object.
         """
         # Load metadata json file into a json object.
         with open(str(file_path), "rb") as file:
@@ -501,7 +600,11 @@ class WeatherMetadata(WeatherAttributes):
         else:
             series_len = None
         # Instantiate the weather metadata object based on node-offset dictionary and metadata attribute dictionary.
-        metadata = WeatherMetadata(node_ids=node_offsets, attributes=content["Metadata"], series_len=series_len)
+        declared_counts = dict(content.get("Metadata", {}))
+        metadata = WeatherMetadata(node_ids=node_offsets, attributes=content["Metadata"], series_len=series_len,
+                                   validate=False)
+        if validate:
+            metadata.validate(declared_counts=declared_counts)
 
         return metadata
 
@@ -518,16 +621,7 @@ class WeatherMetadata(WeatherAttributes):
         Returns:
             The node-offset dictionary, having node ids as keys and offsets as values.
         """
-        entry_count = len(offset_str) // 16
-        node_offsets = {}
-        for i in range(entry_count):
-            idx = i * 16
-            entry_str = offset_str[idx: idx + 16]
-            node_id = int(entry_str[:8], 16)
-            offset = int(entry_str[8:16], 16)
-            node_offsets[node_id] = offset
-
-        return node_offsets
+        return str_to_node_offsets(offset_str)
 
     @staticmethod
     def _convert_offset_dict_to_str(node_offsets: Dict[int, int]) -> str:
@@ -540,8 +634,4 @@ class WeatherMetadata(WeatherAttributes):
         Returns:
             The node offset string, as it appears in the weather metadata file.
         """
-        offset_str = ""
-        for node_id, offset in node_offsets.items():
-            offset_str += f"{node_id:08x}{offset:08x}"
-
-        return offset_str
+        return node_offsets_to_str(node_offsets)
@@ -7,12 +7,15 @@ Weather service methods for submitting and working with weather data requests.
 from __future__ import annotations
 
 import json
+import os
 import pandas as pd
 import tempfile
+import time
 
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, NoReturn, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, NoReturn, Tuple, Union
 
 from idmtools.core import ItemType
 from idmtools.core.platform_factory import Platform
@@ -21,14 +24,19 @@ from idmtools_platform_comps.comps_platform import COMPSPlatform
 from idmtools_platform_comps.comps_platform import AssetCollection
 from idmtools_platform_comps.ssmt_work_items.comps_workitems import SSMTWorkItem
 
+from emodpy_malaria.integrity import verify, write_index
 from emodpy_malaria.weather.data_sources import _get_data_source_metadata
-from emodpy_malaria.weather.weather_utils import make_path, parse_date, ymd
+from emodpy_malaria.weather.weather_cache import WeatherCache
+from emodpy_malaria.weather.weather_utils import make_path, map_parallel, parse_date, ymd
 from emodpy_malaria.weather.weather_variable import WeatherVariable
 from emodpy_malaria.weather.weather_metadata import _META_DEFAULT_ID_REFERENCE
 from emodpy_malaria.weather.weather_set import WeatherSet
 
 _DATE_MIN = datetime(year=2000, month=1, day=1)
 _DATE_MAX = datetime(year=2030, month=12, day=31)
+# Errors retried when downloading asset files: network and file errors (requests errors are OSError subclasses)
+# and COMPS client errors, which are raised as RuntimeError for failed HTTP responses.
+_DOWNLOAD_ERRORS = (OSError, RuntimeError)
 
 
 class WeatherArgs:
@@ -102,6 +110,9 @@ class WeatherArgs:
 class RequestReport:
     """Specifies an object containing weather request operational reports."""
     download: Dict[str, List[str]] = None   # Status of downloaded files: ok, fail, skip.
+    errors: Dict[str, str] = None           # The last error of each failed download, by file path.
+    cache: str = None                       # Status of the cache lookup: hit, miss (None if cache is not used).
+    generate: str = None                    # Status of weather generation: submitted, ok, fail, skip.
 
 
 class DataSource:
@@ -145,7 +156,12 @@ class WeatherRequest:
     _create_asset: bool = True         # flag to indicate creation of a weather asset.
     _platform: COMPSPlatform = None    # The name of COMPS platfrom on which to run the SSMT work item.
 
-    def __init__(self, platform: Union[str, COMPSPlatform], local_dir: str = None, data_source: str = None, is_staging: bool = None):
+    def __init__(self,
+                 platform: Union[str, COMPSPlatform],
+                 local_dir: str = None,
+                 data_source: str = None,
+                 is_staging: bool = None,
+                 cache: WeatherCache = None):
         """
         Initializes a weather request per specified time-space, weather files and SSMT arguments.
 
@@ -154,6 +170,8 @@ class WeatherRequest:
             local_dir: (Optional) Local dir where files will be downloaded. If not specified a temp dir is created.
             data_source: (Optional) Data source name to be used by SSMT platform.
             is_staging: (Optional) Flag determining weather image. By default, set based on the platform endpoint.
+            cache: (Optional) Local weather cache. If files for the same weather arguments are cached, 'generate'
+                   places them into the local dir without submitting a work item, and 'download' adds new files.
         """
 
         # Initialize the platform object
@@ -169,6 +187,9 @@ class WeatherRequest:
 
         # Operational
         self._asset_file_tuples: Union[List[Tuple[str, Path]], None] = None
+        self._cache: Union[WeatherCache, None] = cache
+        self._cache_key: Union[str, None] = None
+        self._work_item: Union[SSMTWorkItem, None] = None
 
     @property
     def data_id(self) -> str:
@@ -205,8 +226,17 @@ class WeatherRequest:
 
     @property
     def files_exist(self) -> bool:
-        """Returns True if all expected weather files exist in the local dir."""
-        return all([Path(f).exists() for f in self.files])
+        """
+        Returns True if all expected weather files exist in the local dir and none of them fails
+        the integrity check (files without an integrity index are not checked).
+        """
+        return all([Path(f).exists() for f in self.files]) and len(self._stale_files()) == 0
+
+    def _stale_files(self) -> List[str]:
+        """Returns weather files (.bin and .bin.json) which don't match their integrity index."""
+        bin_files = [f for f in self.files if not f.endswith(".json")]
+        stale = [f for f in bin_files if verify(f) is False]
+        return stale + [f"{f}.json" for f in stale]
 
     @property
     def report(self) -> RequestReport:
@@ -287,6 +317,28 @@ class WeatherRequest:
         """
         Submits the weather request and when data is ready sets the data_id property.
 
+        Args:
+            weather_args: Arguments defining space and time scope and weather files' id reference.
+            request_name: (Optional) Name to be used for the weather SSMT work item.
+            force: (Optional) Force the download, even if target weather files already exist in the local dir.
+
+        Returns:
+            Returns this WeatherRequest object (to support method chaining), or None if the request failed.
+        """
+        self.submit(weather_args=weather_args, request_name=request_name, force=force)
+        if self._work_item is not None:
+            self._work_item.wait()
+
+        return self._collect()
+
+    def submit(self,
+               weather_args: WeatherArgs,
+               request_name: str = None,
+               force: bool = False) -> WeatherRequest:
+        """
+        Submits the weather request without waiting for it to finish. Use 'done' property to check whether the request
+        has finished and 'generate_as_completed' to wait for many requests at once.
+
         Args:
             weather_args: Arguments defining space and time scope and weather files' id reference.
             request_name: (Optional) Name to be used for the weather SSMT work item.
@@ -295,43 +347,97 @@ class WeatherRequest:
         Returns:
             Returns this WeatherRequest object (to support method chaining).
         """
+        self._work_item = None
+
         # Skip if files already exist, unless the 'force' flag is set.
         if not force and self.files_exist:
             print("Skipping weather request, files already exist.")
+            self.report.generate = "skip"
             return self
 
         self._asset_collection_id: Union[str, None] = None
 
+        # Use cached files, if available, unless the 'force' flag is set.
+        if self._cache is not None:
+            self._cache_key = self._cache.key(weather_args=weather_args, data_source=self._data_source.name)
+            cached_files = None if force else self._cache.get(key=self._cache_key, local_dir=self.local_dir)
+            self.report.cache = "miss" if cached_files is None else "hit"
+            if cached_files is not None:
+                print(f"Using cached weather files: {self._cache_key}")
+                self.report.generate = "skip"
+                return self
+
         # TODO: add date range validation (when supported by the service)
 
         command = self._construct_command(weather_args=weather_args)
         work_item: SSMTWorkItem = self._init_work_item(weather_args=weather_args,
                                                        command=command,
                                                        name=request_name)
+        work_item.run()
+        self._work_item = work_item
+        self.report.generate = "submitted"
+        return self
+
+    @property
+    def done(self) -> bool:
+        """Returns True if the submitted request has finished (succeeded or failed), or if it was not submitted."""
+        if self._work_item is None or self._work_item.done:
+            return True
+
+        self._platform.refresh_status(self._work_item)
+        return self._work_item.done
+
+    def _collect(self) -> Union[WeatherRequest, None]:
+        """
+        Sets the data_id property from the asset collection created by the finished work item.
+
+        Returns:
+            Returns this WeatherRequest object, or None if the request failed.
+        """
+        work_item = self._work_item
+        if work_item is None:
+            return self
+
         try:
-            # Run work item
-            # Note: For simplicity reasons only synchronous scenario is supported (covers the majority of use cases).
-            work_item.run(wait_on_done=True)
+            if not work_item.succeeded:
+                raise ValueError(f"Weather work item {work_item.id} failed.")
+
             comps_wi = work_item.get_platform_object(force=True)
 
             # Get asset collection and set data id
             acs = comps_wi.get_related_asset_collections(RelationType.Created)
-            assert acs and len(acs) > 0, f"Failed to get asset collection for work item {work_item.id}"
+            if not acs:
+                raise ValueError(f"Failed to get asset collection for work item {work_item.id}.")
+
             self._asset_collection_id = str(acs[0].id)
+            self.report.generate = "ok"
             print(f"Generated asset collection ID: {self._asset_collection_id}")
-        except ValueError:
+        except ValueError as ex:
+            print(str(ex))
+            self.report.generate = "fail"
             return None
 
         return self
 
-    def download(self, data_id: str = None, local_dir: Union[str, Path] = None, force: bool = False) -> WeatherRequest:
+    def download(self,
+                 data_id: str = None,
+                 local_dir: Union[str, Path] = None,
+                 force: bool = False,
+                 max_workers: int = 4,
+                 retries: int = 3,
+                 backoff: float = 1.0) -> WeatherRequest:
         """
-        Downloads weather files.
+        Downloads weather files, in parallel. Each file is downloaded into a temp file which is renamed when complete,
+        so a failed download never leaves a partial weather file. Downloaded files are recorded in integrity index
+        files, and existing files which don't match their index are downloaded again (see emodpy_malaria.integrity).
 
         Args:
             data_id: (Optional) Asset collection ID to be downloaded, even if not generated by this request.
             local_dir: (Optional) Local dir where files will be downloaded. If not specified a temp dir is created.
             force: (Optional) Force the download, even if target weather files already exist in the local dir.
+            max_workers: (Optional) The max number of files downloaded at the same time. The default is 4.
+            retries: (Optional) The number of times a failed file download is retried. The default is 3.
+            backoff: (Optional) The wait before the first retry, in seconds, doubled for each next retry.
 
         Returns:
             Returns this WeatherRequest object (to support method chaining).
@@ -346,33 +452,133 @@ class WeatherRequest:
         # Skip if files already exist, unless the 'force' flag is set.
         if self.files_exist and not force:
             self.report.download = {"ok": [], "fail": [], "skip": self.files}
+            self.report.errors = {}
             print("Skipping download, files already exist.")
             return self
 
         assert len(self._asset_collection_id) == 36, "Invalid 'asset collection id' length."
         make_path(self._local_dir)
 
-        result = {"ok": [], "fail": [], "skip": []}
-        for asset, file_path in self._asset_files:
+        asset_files = self._asset_files
+        for asset, file_path in asset_files:
             assert asset.filename == file_path.name, "Asset and file name do not match."
-            try:
-                mtime_before = file_path.stat().st_mtime if file_path.is_file() else 0
-                if not file_path.is_file() or force:
-                    asset.download_to_path(str(file_path), force=force)
-
-                if not file_path.is_file():
-                    key = "fail"
-                elif file_path.stat().st_mtime > mtime_before:
-                    key = "ok"
-                else:
-                    key = "skip"
-
-            # TODO: More specific exception handling
-            except Exception as ex:
-                print(str(ex))
-                key = "fail"
 
+        stale = set(self._stale_files())
+        statuses = map_parallel(lambda af: self._download_file(*af,
+                                                           force=force or str(af[1]) in stale,
+                                                           retries=retries,
+                                                           backoff=backoff),
+                            asset_files,
+                            max_workers=max_workers)
+
+        result = {"ok": [], "fail": [], "skip": []}
+        errors = {}
+        for (_, file_path), (key, error) in zip(asset_files, statuses):
             result[key].append(str(file_path))
+            if error:
+                errors[str(file_path)] = error
+
+        # Index weather files which have been (re)downloaded.
+        for f in result["ok"]:
+            if not f.endswith(".json") and Path(f"{f}.json").is_file():
+                write_index(f)
 
         self.report.download = result
+        self.report.errors = errors
+        if errors:
+            print(f"Failed to download {len(errors)} weather files, see report.errors for details.")
+
+        if self._cache is not None and self._cache_key and len(result["fail"]) == 0 and self.files_exist:
+            self._cache.put(key=self._cache_key, files=self.files)
+
         return self
+
+    @staticmethod
+    def _download_file(asset: Any, file_path: Path, force: bool, retries: int, backoff: float) -> Tuple[str, str]:
+        """
+        Downloads a single asset file, retrying network and file errors with exponential backoff.
+        Other errors are not retried, the download fails right away. Errors are not raised, so a failed file
+        doesn't abort downloading other files.
+
+        Args:
+            asset: Asset object, providing 'download_to_path' method.
+            file_path: The target file path.
+            force: Force the download, even if the target file already exists.
+            retries: The number of times a failed download is retried.
+            backoff: The wait before the first retry, in seconds, doubled for each next retry.
+
+        Returns:
+            Download status ("ok", "fail" or "skip") and the last error message (None, if the download didn't fail).
+        """
+        if file_path.is_file() and not force:
+            return "skip", None
+
+        for attempt in range(retries + 1):
+            fd, temp_path = tempfile.mkstemp(prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent)
+            os.close(fd)
+            try:
+                asset.download_to_path(temp_path, force=True)
+                os.replace(temp_path, file_path)
+                return "ok", None
+
+            except _DOWNLOAD_ERRORS as ex:
+                error = f"{type(ex).__name__}: {ex} (attempt {attempt + 1} of {retries + 1})"
+            except Exception as ex:
+                return "fail", f"{type(ex).__name__}: {ex} (not retried)"
+            finally:
+                if Path(temp_path).exists():
+                    Path(temp_path).unlink()
+
+            if attempt < retries:
+                time.sleep(backoff * 2 ** attempt)
+
+        return "fail", error
+
+
+def generate_as_completed(requests: Iterable[Tuple[WeatherRequest, WeatherArgs]],
+                          max_concurrent: int = 10,
+                          poll_interval: float = 10.0,
+                          force: bool = False) -> Iterator[WeatherRequest]:
+    """
+    Submits many weather requests, keeping at most 'max_concurrent' of them running at the same time,
+    and yields each request as soon as it finishes. Requests are polled together, every 'poll_interval' seconds.
+    Requests which don't need to run (files already exist or are cached) are yielded right away.
+
+    Args:
+        requests: Pairs of weather request objects and corresponding weather arguments.
+        max_concurrent: (Optional) The max number of requests running at the same time. The default is 10.
+        poll_interval: (Optional) Time, in seconds, between checks of running requests. The default is 10.
+        force: (Optional) Force new weather requests, even if weather files already exist in local dirs.
+
+            **Example**::
+
+                requests = [(WeatherRequest(platform=platform, local_dir=d), wa) for d, wa in zip(dirs, weather_args)]
+                for wr in generate_as_completed(requests, max_concurrent=5):
+                    if wr.data_id:
+                        wr.download()
+
+    Returns:
+        Iterator of finished WeatherRequest objects, in the order they finish. Failed requests have data_id None.
+    """
+    assert max_concurrent >= 1, "At least one concurrent request is required."
+    pending = deque(requests)
+    running: List[WeatherRequest] = []
+    while pending or running:
+        # Submit new requests, up to the concurrency limit.
+        while pending and len(running) < max_concurrent:
+            wr, wa = pending.popleft()
+            wr.submit(weather_args=wa, force=force)
+            if wr.done:
+                wr._collect()
+                yield wr
+            else:
+                running.append(wr)
+
+        finished = [wr for wr in running if wr.done]
+        for wr in finished:
+            running.remove(wr)
+            wr._collect()
+            yield wr
+
+        if running and not finished:
+            time.sleep(poll_interval)
@@ -6,15 +6,17 @@ Weather set module is implementing functionality for working with sets of weathe
 
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
 from pathlib import Path
-from typing import Dict, List, NoReturn, Tuple, Union
+from typing import Any, Dict, List, NoReturn, Tuple, Union
 
-from emodpy_malaria.weather.weather_utils import make_path
+from emodpy_malaria.weather.weather_utils import make_path, map_parallel, read_parquet, write_csv_blocks
 from emodpy_malaria.weather.weather_variable import WeatherVariable
 from emodpy_malaria.weather.weather_metadata import WeatherAttributes
 from emodpy_malaria.weather.weather_data import WeatherData, DataFrameInfo
+from emodpy_malaria.weather.weather_interpolation import interpolate_weather, interpolation_weights, read_grid
 
 
 class WeatherSet:
@@ -114,6 +116,138 @@ class WeatherSet:
         """The list of weather columns."""
         return self._weather_columns
 
+    # Transforms
+
+    def add(self, values: Dict[WeatherVariable, Union[float, List[float], Dict[int, float]]]) -> WeatherSet:
+        """
+        Adds values to weather time series of the given weather variables in place (see WeatherData.add).
+
+            **Example**::
+
+                ws.add({WeatherVariable.AIR_TEMPERATURE: 2.0, WeatherVariable.LAND_TEMPERATURE: 2.0})
+
+        Args:
+            values: Dictionary of weather variables (keys) and values to be added (scalars, per-step arrays or
+                    dictionaries of per-node values).
+
+        Returns:
+            This WeatherSet object (to support method chaining).
+        """
+        for v, value in values.items():
+            self[v].add(value)
+
+        return self
+
+    def scale(self, values: Dict[WeatherVariable, Union[float, List[float], Dict[int, float]]]) -> WeatherSet:
+        """
+        Multiplies weather time series of the given weather variables by factors in place (see WeatherData.scale).
+
+            **Example**::
+
+                ws.scale({WeatherVariable.RAINFALL: ws[WeatherVariable.RAINFALL].expand_monthly(monthly_factors)})
+
+        Args:
+            values: Dictionary of weather variables (keys) and factors (scalars, per-step arrays or dictionaries of
+                    per-node factors).
+
+        Returns:
+            This WeatherSet object (to support method chaining).
+        """
+        for v, value in values.items():
+            self[v].scale(value)
+
+        return self
+
+    def clip(self, bounds: Dict[WeatherVariable, Tuple[Union[float, None], Union[float, None]]]) -> WeatherSet:
+        """
+        Limits weather time series values of the given weather variables in place (see WeatherData.clip).
+
+        Args:
+            bounds: Dictionary of weather variables (keys) and (lower, upper) bounds tuples, None meaning no bound.
+
+        Returns:
+            This WeatherSet object (to support method chaining).
+        """
+        for v, (lower, upper) in bounds.items():
+            self[v].clip(lower=lower, upper=upper)
+
+        return self
+
+    def interpolate_to_nodes(self,
+                             demographics: Any,
+                             grid: Union[str, Path, pd.DataFrame, Dict[int, Tuple[float, float]]],
+                             method: str = "nearest",
+                             k: int = 4,
+                             power: float = 2.0,
+                             node_column: str = "nodes",
+                             lat_column: str = "lat",
+                             lon_column: str = "lon",
+                             max_workers: int = None) -> WeatherSet:
+        """
+        Creates a new WeatherSet with series for demographics nodes, interpolated from this weather set's nodes, which
+        represent grid cells with known coordinates (see weather_interpolation.interpolation_weights).
+        Interpolation weights are calculated once, for all weather variables, and resulting series are deduplicated.
+        IdReference is set to demographics IdReference and lat/lon bounds are set to demographics nodes bounds.
+
+            **Example**::
+
+                demog = MalariaDemographics.from_csv("nodes.csv", id_ref="my_sites")
+                ws2 = ws.interpolate_to_nodes(demog, grid="weather_grid.csv", method="idw")
+
+        Args:
+            demographics: Demographics object (e.g. MalariaDemographics), containing 'nodes' with 'id', 'lat' and
+                          'lon' attributes, and 'idref' attribute.
+            grid: Grid cells (nodes of this weather set) coordinates, a csv file path or a dataframe with node id,
+                  latitude and longitude columns (like a weather request site file), or a dictionary of node ids and
+                  (lat, lon) tuples.
+            method: (Optional) Interpolation method: "nearest" (the default), "idw" or "bilinear".
+            k: (Optional) The number of grid cells used by "idw" method. The default is 4.
+            power: (Optional) Distance power used by "idw" method. The default is 2.
+            node_column: (Optional) Grid node id column name. The default is "nodes".
+            lat_column: (Optional) Grid latitude column name. The default is "lat".
+            lon_column: (Optional) Grid longitude column name. The default is "lon".
+            max_workers: (Optional) The number of threads used to interpolate weather variables in parallel.
+
+        Returns:
+            WeatherSet object containing series for demographics nodes.
+        """
+        grid_node_ids, grid_lat, grid_lon = read_grid(grid, node_column, lat_column, lon_column)
+        nodes = demographics.nodes
+        node_ids = np.array([n.id for n in nodes], dtype=np.int64)
+        lat = np.array([n.lat for n in nodes], dtype=np.float64)
+        lon = np.array([n.lon for n in nodes], dtype=np.float64)
+        if len(node_ids) == 0 or len(np.unique(node_ids)) != len(node_ids):
+            raise ValueError("Demographics node ids must be unique and there must be at least one node.")
+
+        indices, weights = interpolation_weights(grid_lat, grid_lon, lat, lon, method=method, k=k, power=power)
+
+        def interpolate(v: WeatherVariable) -> WeatherData:
+            attributes = WeatherAttributes(attributes_dict=dict(self[v].metadata.attributes.attributes_dict),
+                                           reference=getattr(demographics, "idref", None),
+                                           lat_min=float(lat.min()),
+                                           lat_max=float(lat.max()),
+                                           lon_min=float(lon.min()),
+                                           lon_max=float(lon.max()))
+            return interpolate_weather(self[v], grid_node_ids, node_ids, indices, weights, attributes=attributes)
+
+        ws = WeatherSet(weather_columns=dict(self._weather_columns))
+        results = map_parallel(interpolate, self.weather_variables, max_workers=max_workers)
+        for v, wd in zip(self.weather_variables, results):
+            ws[v] = wd
+
+        ws.validate(objects=False)
+        return ws
+
+    def copy(self) -> WeatherSet:
+        """Creates a copy of this WeatherSet, with copies of all WeatherData objects (see WeatherData.copy)."""
+        ws = WeatherSet(dir_path=self._dir_path,
+                        file_names=dict(self._file_names),
+                        weather_columns=dict(self._weather_columns))
+        for v, wd in self.items():
+            ws[v] = wd.copy()
+
+        return ws
+
     # Export/import
 
     @classmethod
@@ -122,7 +256,8 @@ class WeatherSet:
                        node_column: str = None,
                        step_column: str = None,
                        weather_columns: Dict[WeatherVariable, str] = None,
-                       attributes: WeatherAttributes = None) -> WeatherSet:
+                       attributes: WeatherAttributes = None,
+                       max_workers: int = None) -> WeatherSet:
         """
         Initializes WeatherSet object from a dataframe containing weather time series.
         The dataframe must have node ids, step and weather columns.
@@ -134,6 +269,7 @@ class WeatherSet:
             weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
                              Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
             attributes: (Optional) Weather attribute object containing metadata for WeatherMetadata object.
+            max_workers: (Optional) The number of threads used to convert weather variables in parallel.
 
         Returns:
             WeatherSet object.
@@ -149,7 +285,8 @@ class WeatherSet:
                  node_column: str = None,
                  step_column: str = None,
                  weather_columns: Dict[WeatherVariable, str] = None,
-                 attributes: WeatherAttributes = None) -> WeatherSet:
+                 attributes: WeatherAttributes = None,
+                 max_workers: int = None) -> WeatherSet:
         """
         Initializes WeatherSet object from a dataframe containing weather time series.
         The csv file must have node ids, step and weather columns.
@@ -161,6 +298,7 @@ class WeatherSet:
             weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
                              Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
             attributes: (Optional) The weather attribute object containing metadata for WeatherMetadata object.
+            max_workers: (Optional) The number of threads used to convert weather variables in parallel.
 
         Returns:
             WeatherSet object.
@@ -176,7 +314,8 @@ class WeatherSet:
                        node_column: str = None,
                        step_column: str = None,
                        weather_columns: Dict[WeatherVariable, str] = None,
-                       attributes: WeatherAttributes = None) -> WeatherSet:
+                       attributes: WeatherAttributes = None,
+                       max_workers: int = None) -> WeatherSet:
         """
          Creates WeatherSet from a csv file or dataframe by instantiating WeatherData object for each weather variable.
          Column arguments are used to interpret input file/dataframe. Weather attribute argument is used for
@@ -189,6 +328,7 @@ class WeatherSet:
             weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
                              Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
             attributes: (Optional) The weather attribute object containing metadata for WeatherMetadata object.
+            max_workers: (Optional) The number of threads used to convert weather variables in parallel.
 
         Returns:
             WeatherSet object.
@@ -197,14 +337,18 @@ class WeatherSet:
         infos, weather_columns = cls._init_dataframe_info_dict(node_column, step_column, weather_columns)
         # Construct the final weather column dictionary (relevant if weather_columns was None or None column names)
         attributes = attributes or WeatherAttributes()
+        if isinstance(data_csv, str):
+            # Read the csv file once, for all weather variables.
+            data_csv = pd.read_csv(data_csv)
+        elif not isinstance(data_csv, pd.DataFrame):
+            raise TypeError(f"Unsupported argument type {type(data_csv)}. Only string or dataframe are expected.")
+
         ws = WeatherSet(weather_columns=weather_columns)
-        for v, info in infos.items():
-            if isinstance(data_csv, str):
-                ws[v] = WeatherData.from_csv(file_path=data_csv, info=info, attributes=attributes)
-            elif isinstance(data_csv, pd.DataFrame):
-                ws[v] = WeatherData.from_dataframe(df=data_csv, info=info, attributes=attributes)
-            else:
-                raise TypeError(f"Unsupported argument type {type(data_csv)}. Only string or dataframe are expected.")
+        results = map_parallel(lambda info: WeatherData.from_dataframe(df=data_csv, info=info, attributes=attributes),
+                               infos.values(),
+                               max_workers=max_workers)
+        for v, wd in zip(infos, results):
+            ws[v] = wd
 
         ws.validate()
         return ws
@@ -212,7 +356,8 @@ class WeatherSet:
     def to_dataframe(self,
                      node_column: str = None,
                      step_column: str = None,
-                     weather_columns: Dict[WeatherVariable, str] = None) -> pd.DataFrame:
+                     weather_columns: Dict[WeatherVariable, str] = None,
+                     max_workers: int = None) -> pd.DataFrame:
         """
         Creates a dataframe containing node ids, time steps and weather columns.
 
@@ -221,9 +366,19 @@ class WeatherSet:
             step_column: (Optional) Column containing node index for weather time series values. The default is "steps".
             weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
                              Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
+            max_workers: (Optional) The number of threads used to convert weather variables in parallel.
         Returns:
             Dataframe containing node ids and weather time series.
         """
+        infos = self._export_infos(node_column, step_column, weather_columns)
+        dfs = map_parallel(lambda v: self[v].to_dataframe(infos[v]), infos, max_workers=max_workers)
+        return self._join_dataframes(infos, dfs)
+
+    def _export_infos(self,
+                      node_column: str = None,
+                      step_column: str = None,
+                      weather_columns: Dict[WeatherVariable, str] = None) -> Dict[WeatherVariable, DataFrameInfo]:
+        """Validates weather columns and creates dataframe info objects used to export weather variables."""
         # If no columns, init keys to filter variables
         weather_columns = weather_columns or {v: None for v in self.weather_variables}
         not_available = [v for v in weather_columns if v.value not in [w.value for w in self.weather_variables]]
@@ -234,9 +389,13 @@ class WeatherSet:
         # Obtain dataframe info objects, to name dataframe columns
         infos, weather_columns = self._init_dataframe_info_dict(node_column, step_column, weather_columns)
         self._weather_columns = weather_columns
+        return infos
+
+    @classmethod
+    def _join_dataframes(cls, infos: Dict[WeatherVariable, DataFrameInfo], dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        """Joins per weather variable dataframes, having the same nodes and steps, into a single dataframe."""
         df = None                                   # used to collect all weather columns in a single df
-        for v in infos:                             # for each dataframe info (weather variable)
-            df2 = self[v].to_dataframe(infos[v])    # get dataframe for current weather variable
+        for v, df2 in zip(infos, dfs):              # for each dataframe (weather variable)
             if df is None:                          # if first iteration
                 df = df2                            # init outer dataframe
             else:                                   # if 2nd or higher iteration
@@ -249,7 +408,9 @@ class WeatherSet:
                file_path: Union[str, Path],
                node_column: str = None,
                step_column: str = None,
-               weather_columns: Dict[WeatherVariable, str] = None) -> pd.DataFrame:
+               weather_columns: Dict[WeatherVariable, str] = None,
+               max_workers: int = None,
+               chunk_size: int = None) -> Union[pd.DataFrame, None]:
         """
         Creates a csv file containing node ids, time steps and weather columns.
 
@@ -259,44 +420,141 @@ class WeatherSet:
             step_column: (Optional) Column containing node index for weather time series values. The default is "steps".
             weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
                              Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
+            max_workers: (Optional) The number of threads used to convert weather variables in parallel.
+            chunk_size: (Optional) The approximate number of csv rows written at once. If specified, the csv file
+                        is written in blocks of whole node series, so memory use doesn't depend on the number of nodes,
+                        and no dataframe is returned. All weather variables must have the same nodes.
 
         Returns:
-            Dataframe containing node ids and weather time series, used to create the csv file.
+            Dataframe containing node ids and weather time series, used to create the csv file,
+            or None if 'chunk_size' is set.
+        """
+        if chunk_size is None:
+            df = self.to_dataframe(node_column, step_column, weather_columns, max_workers=max_workers)
+            df.to_csv(file_path, index=False)
+            return df
+
+        infos = self._export_infos(node_column, step_column, weather_columns)
+        exports = {v: self[v]._export_rows() for v in infos}
+        node_ids = list(exports.values())[0][0]
+        if not all(np.array_equal(node_ids, n) for n, _ in exports.values()):
+            raise ValueError("All weather variables must have the same nodes to be written in blocks.")
+
+        def make_block(block: slice) -> pd.DataFrame:
+            dfs = [self[v]._rows_to_dataframe(n[block], r[block], infos[v]) for v, (n, r) in exports.items()]
+            return self._join_dataframes(infos, dfs)
+
+        make_path(Path(file_path).parent)
+        series_len = self.values()[0].metadata.series_len
+        write_csv_blocks(file_path,
+                         node_count=len(node_ids),
+                         nodes_per_block=max(1, chunk_size // series_len),
+                         make_block=make_block)
+        return None
+
+    @classmethod
+    def from_parquet(cls,
+                     file_path: Union[str, Path],
+                     node_column: str = None,
+                     step_column: str = None,
+                     weather_columns: Dict[WeatherVariable, str] = None,
+                     attributes: WeatherAttributes = None,
+                     node_ids: List[int] = None,
+                     max_workers: int = None) -> WeatherSet:
         """
-        df = self.to_dataframe(node_column, step_column, weather_columns)
-        df.to_csv(file_path, index=False)
+        Initializes WeatherSet object from a parquet file containing weather time series, with the same layout as
+        a csv file (node, step and weather columns). Only node, step and selected weather columns are read.
+        Requires a parquet engine (pyarrow or fastparquet).
+
+        Args:
+            file_path: The parquet file path.
+            node_column: (Optional) Column containing node ids. The default is "nodes".
+            step_column: (Optional) Column containing node index for weather time series values. The default is "steps".
+            weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
+                             Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
+            attributes: (Optional) The weather attribute object containing metadata for WeatherMetadata object.
+            node_ids: (Optional) Node ids to be read. If not specified, all nodes are read.
+            max_workers: (Optional) The number of threads used to convert weather variables in parallel.
+
+        Returns:
+            WeatherSet object.
+        """
+        assert Path(file_path).is_file(), f"The parquet file not found: {str(file_path)}."
+        infos, weather_columns = cls._init_dataframe_info_dict(node_column, step_column, weather_columns)
+        info = next(iter(infos.values()))
+        columns = [info.node_column, info.step_column, *weather_columns.values()]
+        df = read_parquet(file_path, columns=columns, node_column=info.node_column, node_ids=node_ids)
+        return cls._from_csv_data(data_csv=df,
+                                  node_column=info.node_column,
+                                  step_column=info.step_column,
+                                  weather_columns=weather_columns,
+                                  attributes=attributes,
+                                  max_workers=max_workers)
+
+    def to_parquet(self,
+                   file_path: Union[str, Path],
+                   node_column: str = None,
+                   step_column: str = None,
+                   weather_columns: Dict[WeatherVariable, str] = None,
+                   max_workers: int = None) -> pd.DataFrame:
+        """
+        Creates a parquet file containing node ids, time steps and weather columns. Weather values are stored as
+        float32. Requires a parquet engine (pyarrow or fastparquet).
+
+        Args:
+            file_path: The path of a parquet file to be generated.
+            node_column: (Optional) Column containing node ids. The default is "nodes".
+            step_column: (Optional) Column containing node index for weather time series values. The default is "steps".
+            weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
+                             Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
+            max_workers: (Optional) The number of threads used to convert weather variables in parallel.
+
+        Returns:
+            Dataframe containing node ids and weather time series, used to create the parquet file.
+        """
+        df = self.to_dataframe(node_column, step_column, weather_columns, max_workers=max_workers)
+        make_path(Path(file_path).parent)
+        df.to_parquet(file_path, index=False)
         return df
 
     # Save/load DTK files
 
-    def _load(self) -> WeatherSet:
-        """Loads weather files based on weather set attributes."""
+    def _load(self, mmap: bool = False, max_workers: int = None, validate: bool = True) -> WeatherSet:
+        """Loads weather files based on weather set attributes, optionally loading weather variables in parallel."""
         assert self.dir_path and Path(self.dir_path).is_dir(), "A valid dir is a required argument."
         assert isinstance(self.file_names, Dict) and len(self.file_names) > 0, "File names dictionary is required."
-        for v, n in self.file_names.items():
-            bin_path = self._weather_file_path(n)
-            self[v] = WeatherData.from_file(bin_path)
+        results = map_parallel(lambda n: WeatherData.from_file(self._weather_file_path(n), mmap=mmap, validate=validate),
+                               self.file_names.values(),
+                               max_workers=max_workers)
+        for v, wd in zip(self.file_names, results):
+            self[v] = wd
 
-        self.validate()
+        if validate:
+            self.validate(objects=False)
 
         return self
 
-    def _save(self) -> NoReturn:
-        """Saves weather data and metadata into weather files based on weather set attributes."""
+    def _save(self, max_workers: int = None) -> NoReturn:
+        """Saves weather data and metadata into weather files, optionally saving weather variables in parallel."""
         assert self._dir_path, "Directory is a required argument."
         assert self._file_names and len(self._file_names) > 0, "File names are required."
 
         make_path(self._dir_path)
-        for v, wd in self._weather_dict.items():
+
+        def save(v: WeatherVariable):
             bin_path = self._weather_file_path(self._file_names[v])
-            wd.to_file(bin_path)
-            wd.metadata.to_file(f"{bin_path}.json")
+            self._weather_dict[v].to_file(bin_path)
+
+        map_parallel(save, self._weather_dict, max_workers=max_workers)
 
     @classmethod
     def from_files(cls,
                    dir_path: Union[str, Path],
                    prefix: str = "",
-                   file_names: Dict[WeatherVariable, str] = None) -> WeatherSet:
+                   file_names: Dict[WeatherVariable, str] = None,
+                   mmap: bool = False,
+                   max_workers: int = None,
+                   validate: bool = True) -> WeatherSet:
         """
         Instantiates WeatherSet from to weather files which paths are determined based on given arguments.
 
@@ -304,6 +562,9 @@ class WeatherSet:
             dir_path: Directory path containing weather files.
             prefix: Weather files prefix, e.g. "dtk_15arcmin\_"
             file_names: Dictionary of weather variables (keys) and weather .bin file names (values).
+            mmap: (Optional) Flag indicating whether to memory-map weather binary files (see WeatherData.from_file).
+            max_workers: (Optional) The number of threads used to load weather files in parallel.
+            validate: (Optional) Flag indicating whether to validate weather files (see WeatherData.from_file).
 
         Returns:
             WeatherSet object.
@@ -311,18 +572,19 @@ class WeatherSet:
         WeatherVariable.validate_types(file_names, [str, Path])
         file_names = file_names or cls.select_weather_files(dir_path=dir_path, prefix=prefix)
         ws = WeatherSet(dir_path=dir_path, file_names=file_names)
-        ws._load()
+        ws._load(mmap=mmap, max_workers=max_workers, validate=validate)
 
         return ws
 
     def to_files(self,
                  dir_path: Union[str, Path],
-                 file_names: Dict[WeatherVariable, str] = None) -> NoReturn:
+                 file_names: Dict[WeatherVariable, str] = None,
+                 max_workers: int = None) -> NoReturn:
         """Saves WeatherSet to weather files which paths are determined based on given arguments."""
         file_names = file_names or self.make_file_paths()
         self._dir_path = Path(dir_path)
         self._file_names = file_names
-        self._save()
+        self._save(max_workers=max_workers)
 
     # Helpers
 
@@ -519,8 +781,14 @@ class WeatherSet:
         """Construct a weather file path."""
         return Path(self.dir_path).joinpath(str(file_name))
 
-    def validate(self) -> NoReturn:
-        """Validate WeatherSet object."""
+    def validate(self, objects: bool = True) -> NoReturn:
+        """
+        Validate WeatherSet object.
+
+        Args:
+            objects: (Optional) Flag indicating whether to validate each weather data and metadata object, in addition
+                     to their consistency. Can be turned off if objects have just been validated on creation.
+        """
 
         series_len0: Union[int, None] = None
         node_count0: Union[int, None] = None
@@ -531,8 +799,9 @@ class WeatherSet:
         for v, wd in self._weather_dict.items():
             wm = wd.metadata
             # Validate each weather data and metadata object
-            wd.validate()
-            wd.metadata.validate()
+            if objects:
+                wd.validate()
+                wd.metadata.validate()
 
             # Validate weather objects consistency
             series_len = wm.series_len
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+"""
+Weather stream module, implementing conversion of large csv files into weather files, without loading the whole
+csv file into memory.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import BinaryIO, Dict, List, NoReturn, Union
+
+from emodpy_malaria.integrity import write_index
+from emodpy_malaria.weather.weather_utils import make_path, unique_series
+from emodpy_malaria.weather.weather_variable import WeatherVariable
+from emodpy_malaria.weather.weather_metadata import WeatherMetadata, WeatherAttributes, SERIES_BYTE_VALUE_SIZE
+from emodpy_malaria.weather.weather_data import WeatherData
+from emodpy_malaria.weather.weather_set import WeatherSet
+
+
+def stream_csv_to_weather(csv_file: Union[str, Path],
+                          weather_dir: Union[str, Path],
+                          node_column: str = None,
+                          step_column: str = None,
+                          weather_columns: Dict[WeatherVariable, str] = None,
+                          attributes: WeatherAttributes = None,
+                          weather_file_names: Dict[WeatherVariable, str] = None,
+                          chunk_size: int = 1000000) -> Dict[WeatherVariable, str]:
+    """
+    Convert a csv file, containing node, step and weather columns, into weather files, by reading the csv file in
+    chunks and appending unique weather time series to temporary binary files as chunks are read.
+    After the whole csv file is processed, temporary files are moved to weather binary (.bin) file paths and
+    metadata (.bin.json) and integrity index files are written. If conversion fails, no weather files are created.
+
+    Only an index of unique series and a node-offset dictionary are kept in memory, so the peak memory is determined
+    by the chunk size, not by the csv file size. The csv file rows must be sorted (grouped) by node, steps of each node
+    can be in any order. The produced weather files are the same as those produced from a dataframe.
+
+    Args:
+        csv_file: The csv file path, containing weather data.
+        weather_dir: Directory where weather files are created.
+        node_column: (Optional) Column containing node ids. The default is "nodes".
+        step_column: (Optional) Column containing node index for weather time series values. The default is "steps".
+        weather_columns: (Optional) Dictionary of weather variables (keys) and weather column names (values).
+                         Defaults are WeatherVariables values are used: "airtemp", "humidity", "rainfall", "landtemp".
+        attributes: (Optional) Weather attribute object containing metadata for WeatherMetadata object.
+        weather_file_names: (Optional) Dictionary of weather variables (keys) and weather .bin file names (values).
+        chunk_size: (Optional) The number of csv rows read at once.
+
+            **Example**::
+
+                file_names = stream_csv_to_weather(csv_file="path/to/data.csv", weather_dir="path/to/weather_dir")
+
+    Returns:
+        Dictionary of weather variables (keys) and weather .bin file names (values).
+    """
+    assert Path(csv_file).is_file(), f"The csv file not found: {str(csv_file)}."
+    if chunk_size is None or chunk_size < 1:
+        raise ValueError("Chunk size must be a positive integer.")
+
+    infos, weather_columns = WeatherSet._init_dataframe_info_dict(node_column, step_column, weather_columns)
+    info = next(iter(infos.values()))
+    nc, sc = info.node_column, info.step_column
+    file_names = weather_file_names or WeatherSet.make_file_paths(weather_variables=list(weather_columns))
+    attributes = attributes or WeatherAttributes()
+
+    make_path(weather_dir)
+    writers = {v: _SeriesFileWriter(Path(weather_dir).joinpath(str(file_names[v]))) for v in weather_columns}
+    try:
+        reader = _NodeChunkReader(csv_file, node_column=nc, columns=[nc, sc, *weather_columns.values()],
+                                  chunk_size=chunk_size)
+        steps0 = None
+        for df in reader:
+            nodes, steps = df[nc].to_numpy(), df[sc].to_numpy()
+            # Nodes in this chunk have the same steps, make sure those are the same as in the first chunk.
+            chunk_steps = np.unique(steps)
+            steps0 = chunk_steps if steps0 is None else steps0
+            if not np.array_equal(steps0, chunk_steps):
+                raise ValueError("All time series must have the same distinct steps.")
+
+            for v, c in weather_columns.items():
+                node_ids, series_values = WeatherData._pivot_series(nodes=nodes, steps=steps, values=df[c].to_numpy())
+                writers[v].append(node_ids, series_values)
+
+        for w in writers.values():
+            w.close()
+            if w.series_len == 0:
+                raise ValueError(f"The csv file contains no data: {str(csv_file)}.")
+
+        for w in writers.values():
+            w.commit()
+            wm = WeatherMetadata(node_ids=w.node_offsets, series_len=w.series_len, attributes=attributes)
+            wm.to_file(f"{w.file_path}.json")
+            write_index(w.file_path)
+    finally:
+        for w in writers.values():
+            w.discard()
+
+    return file_names
+
+
+class _NodeChunkReader:
+    """
+    Iterates over a csv file in chunks of rows, ensuring all rows of a node are in the same chunk.
+    Rows of the last node of a chunk are carried over to the next chunk, since that node may continue there.
+    """
+
+    def __init__(self, file_path: Union[str, Path], node_column: str, columns: List[str], chunk_size: int):
+        self.file_path = file_path
+        self.node_column = node_column
+        self.columns = columns
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        last_node = None
+        carry = None
+        for df in pd.read_csv(self.file_path, usecols=self.columns, chunksize=self.chunk_size):
+            for c in self.columns:
+                if df[c].hasnans:
+                    raise ValueError(f"Column {c} contains 'NaN' values.")
+
+            df = df if carry is None else pd.concat([carry, df], ignore_index=True)
+            nodes = df[self.node_column].to_numpy()
+            if np.any(nodes[1:] < nodes[:-1]) or (last_node is not None and nodes[0] <= last_node):
+                raise ValueError(f"The csv file rows must be sorted by {self.node_column} column.")
+
+            # Hold back rows of the last node, the rest of the chunk contains complete nodes.
+            split = int(np.searchsorted(nodes, nodes[-1], side="left"))
+            carry = df.iloc[split:]
+            if split > 0:
+                last_node = nodes[split - 1]
+                yield df.iloc[:split]
+
+        if carry is not None:
+            yield carry
+
+
+class _SeriesFileWriter:
+    """
+    Appends unique weather time series to a temporary file next to the weather binary (.bin) file path and keeps
+    track of node offsets. The temporary file is moved to the weather binary file path on commit.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path: Path = file_path
+        self.node_offsets: Dict[int, int] = {}
+        self.series_len: int = 0
+        self._series_index: Dict[bytes, int] = {}   # series digest -> series index in the binary file
+        fd, self._temp_path = tempfile.mkstemp(prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent)
+        self._file: BinaryIO = os.fdopen(fd, "wb")
+
+    def append(self, node_ids: np.ndarray, series_values: np.ndarray[np.float32]) -> NoReturn:
+        """Appends series which are not already in the file and adds offsets of given nodes."""
+        self.series_len = self.series_len or series_values.shape[1]
+        if series_values.shape[1] != self.series_len:
+            raise ValueError("All time series must be of the same length.")
+
+        # Deduplicate within the chunk first, so that only distinct series are hashed.
+        unique_idx, inverse = unique_series(series_values)
+        chunk_index = np.empty(len(unique_idx), dtype=np.int64)
+        new_idx = []
+        for i, row in enumerate(unique_idx):
+            digest = hashlib.blake2b(series_values[row].tobytes(), digest_size=16).digest()
+            index = self._series_index.get(digest)
+            if index is None:
+                index = self._series_index[digest] = len(self._series_index)
+                new_idx.append(row)
+            chunk_index[i] = index
+
+        if new_idx:
+            np.ascontiguousarray(series_values[new_idx], dtype=np.float32).tofile(self._file)
+
+        offsets = chunk_index[inverse] * self.series_len * SERIES_BYTE_VALUE_SIZE
+        self.node_offsets.update(zip(np.asarray(node_ids).astype(np.int64).tolist(), offsets.tolist()))
+
+    def close(self) -> NoReturn:
+        """Closes the temporary file."""
+        if not self._file.closed:
+            self._file.close()
+
+    def commit(self) -> NoReturn:
+        """Closes the temporary file and moves it to the weather binary file path."""
+        self.close()
+        os.replace(self._temp_path, self.file_path)
+
+    def discard(self) -> NoReturn:
+        """Closes and removes the temporary file, if it has not been committed."""
+        self.close()
+        if Path(self._temp_path).exists():
+            Path(self._temp_path).unlink()
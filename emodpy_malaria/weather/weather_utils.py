@@ -5,12 +5,18 @@ The module for weather utility functions.
 """
 
 import numpy as np
+import pandas as pd
 import json
+import os
+import shutil
 
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, NoReturn, Union
+from typing import Any, Callable, Dict, Iterable, List, NoReturn, Tuple, Union
+
+from emodpy_malaria.integrity import atomic_write
 
 
 def invert_dict(in_dict: Dict, sort=False, single_value=False) -> Dict:
@@ -73,9 +79,188 @@ def hash_series(series: Iterable[np.float32]) -> int:
     return h
 
 
+def unique_series(series: np.ndarray, chunk_size: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Identify unique rows of a 2d array of weather time series, by comparing raw bytes of each row (exact match).
+    Unique series are ordered by their first appearance, which is the order in which they are stored in .bin files.
+
+    Rows are grouped by a vectorized 64-bit row hash and each row is compared to the first row of its group.
+    Rows which differ from the first row of their group (hash collisions) are grouped by comparing their bytes.
+
+    For example,
+        [[1, 2], [3, 4], [1, 2], [5, 6]] -> ([0, 1, 3], [0, 1, 0, 2])
+
+    Args:
+        series: 2d float32 array having one weather time series per row.
+        chunk_size: (Optional) The number of rows processed at once, limiting the size of intermediate arrays.
+
+    Returns:
+        Tuple of two arrays:
+            - row indices of the first appearance of each unique series
+            - inverse index, mapping each row to its unique series index (a position in the first array)
+    """
+    words = np.ascontiguousarray(series, dtype=np.float32).view(np.uint32)
+    row_count = words.shape[0]
+
+    _, first_idx, inverse = np.unique(_row_hashes(words, chunk_size), return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    # Verify exact equality within hash groups, rows differing from the first row of their group are collisions.
+    is_collision = np.zeros(row_count, dtype=bool)
+    for start in range(0, row_count, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        is_collision[chunk] = np.any(words[chunk] != words[first_idx[inverse[chunk]]], axis=1)
+
+    if np.any(is_collision):
+        # Equal rows have equal hashes, so colliding rows only need to be grouped among themselves.
+        # View each row as a single opaque (void) item, so rows can be compared as a whole, based on their bytes.
+        rows = np.flatnonzero(is_collision)
+        row_view = np.ascontiguousarray(words[rows]).view(np.dtype((np.void, 4 * words.shape[1]))).reshape(-1)
+        _, collision_first, collision_inverse = np.unique(row_view, return_index=True, return_inverse=True)
+        inverse[rows] = len(first_idx) + collision_inverse.reshape(-1)
+        first_idx = np.append(first_idx, rows[collision_first])
+
+    # np.unique sorts unique values, reorder unique series by first appearance.
+    order = np.argsort(first_idx, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first_idx[order], rank[inverse]
+
+
+def _row_hashes(words: np.ndarray, chunk_size: int) -> np.ndarray:
+    """
+    Hash rows of a 2d uint32 array, as a sum of 64-bit words (pairs of values) multiplied by random odd coefficients,
+    wrapping around 2^64.
+    """
+    row_count, column_count = words.shape
+    even_count = column_count // 2 * 2
+    coefficients = np.random.default_rng(seed=0).integers(1, 2 ** 63, size=column_count // 2 + 1, dtype=np.uint64)
+    coefficients |= np.uint64(1)
+    hashes = np.empty(row_count, dtype=np.uint64)
+    for start in range(0, row_count, chunk_size):
+        chunk = words[start:start + chunk_size]
+        chunk_hashes = (np.ascontiguousarray(chunk[:, :even_count]).view(np.uint64) * coefficients[:-1]).sum(axis=1)
+        if column_count > even_count:
+            chunk_hashes += chunk[:, -1].astype(np.uint64) * coefficients[-1]
+        hashes[start:start + chunk_size] = chunk_hashes
+
+    return hashes
+
+
+_MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def expand_monthly(values: Iterable[float], series_len: int, start_day: int = 1) -> np.ndarray:
+    """
+    Expand 12 monthly values into a daily series, using 365-day years (as EMOD weather does), for example to apply
+    monthly climate change factors to daily weather series.
+
+    For example,
+        values = [1, 2, ..., 12], series_len = 365 -> [1] * 31 + [2] * 28 + ... + [12] * 31
+
+    Args:
+        values: Monthly values, from January to December.
+        series_len: The length of the daily series, which may cover multiple years.
+        start_day: (Optional) The day of year (1-365) of the first series value. The default is 1.
+
+    Returns:
+        Float32 array of the given length.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if values.shape != (12,):
+        raise ValueError(f"Expected 12 monthly values, found shape {values.shape}.")
+
+    day_month = np.repeat(np.arange(12), _MONTH_DAYS)
+    days = (np.arange(series_len) + start_day - 1) % len(day_month)
+    return values[day_month[days]]
+
+
+def parse_day_of_year(value: Union[int, str]) -> int:
+    """
+    Parse day of year, which weather metadata stores either as a number or as a month and a day, like "January 1".
+
+    Args:
+        value: Day of year as an integer (1-365), a numeric string or a "<month name> <day>" string.
+
+    Returns:
+        Day of year, as an integer, using a non-leap year.
+    """
+    if str(value).strip().isdigit():
+        return int(value)
+
+    return datetime.strptime(f"{str(value).strip()} 2001", "%B %d %Y").timetuple().tm_yday
+
+
+def map_parallel(func: Callable, items: Iterable, max_workers: int = None) -> List[Any]:
+    """
+    Apply a function to each item, optionally on a thread pool. Results are in the same order as items.
+    Used for independent per-weather-variable work, which is mostly NumPy and file I/O and releases the GIL.
+
+    Args:
+        func: The function to be called with each item as the only argument.
+        items: Items to be processed.
+        max_workers: (Optional) The maximum number of threads. If not specified or 1, items are processed sequentially.
+
+    Returns:
+        List of function results, in the order of items.
+    """
+    items = list(items)
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+def read_parquet(file_path: Union[str, Path],
+                 columns: List[str] = None,
+                 node_column: str = None,
+                 node_ids: Iterable[int] = None) -> pd.DataFrame:
+    """
+    Read selected columns and nodes from a parquet file. Node selection is passed to the parquet engine as a filter,
+    so that row groups not containing selected nodes are skipped, and then applied exactly to the loaded rows.
+
+    Args:
+        file_path: The parquet file path.
+        columns: (Optional) Columns to be read. If not specified, all columns are read.
+        node_column: (Optional) Column containing node ids. Required if node ids are specified.
+        node_ids: (Optional) Node ids to be read. If not specified, all nodes are read.
+
+    Returns:
+        Dataframe containing selected columns and nodes.
+    """
+    if node_ids is None:
+        return pd.read_parquet(file_path, columns=columns)
+
+    assert node_column, "Node column is required for selecting nodes."
+    node_ids = [int(n) for n in node_ids]
+    df = pd.read_parquet(file_path, columns=columns, filters=[(node_column, "in", node_ids)])
+    df = df[df[node_column].isin(node_ids)].reset_index(drop=True)
+    return df
+
+
+def write_csv_blocks(file_path: Union[str, Path],
+                     node_count: int,
+                     nodes_per_block: int,
+                     make_block: Callable[[slice], pd.DataFrame]) -> NoReturn:
+    """
+    Write a csv file in blocks of nodes, so only one block dataframe is held in memory at a time.
+
+    Args:
+        file_path: The csv file path.
+        node_count: The total number of nodes.
+        nodes_per_block: The number of nodes written at once.
+        make_block: Function creating the dataframe for a slice of node indices.
+    """
+    with open(file_path, "w", newline="") as file:
+        for start in range(0, max(node_count, 1), nodes_per_block):
+            df = make_block(slice(start, start + nodes_per_block))
+            df.to_csv(file, index=False, header=start == 0)
+
+
 def save_json(content: Dict[str, str], file_path: Union[str, Path]) -> NoReturn:
     """
-    Save dictionary to a json file.
+    Save dictionary to a json file. The file is replaced rather than modified in place (see atomic_write).
 
     Args:
         content: Content in the form of a dictionary.
@@ -85,7 +270,7 @@ def save_json(content: Dict[str, str], file_path: Union[str, Path]) -> NoReturn:
             None
 
     """
-    with open(str(file_path), "wt") as file:
+    with atomic_write(file_path, "wt") as file:
         json.dump(content, file, indent=2, separators=(",", ": "))
 
 
@@ -95,6 +280,24 @@ def make_path(dir_path: Union[str, Path]) -> NoReturn:
         Path(dir_path).mkdir(exist_ok=True, parents=True)
 
 
+def link_or_copy(src: Union[str, Path], dst: Union[str, Path], hardlink: bool = True) -> NoReturn:
+    """Hardlink the source file to the destination path, or copy it if hardlinks are not used or not supported."""
+    src, dst = Path(src), Path(dst)
+    if dst.exists():
+        if dst.samefile(src):
+            return
+        dst.unlink()
+
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+
+
 def ymd(date_arg: datetime) -> str:
     """Convert datetime into a string of format yyyymmdd."""
     return date_arg.strftime("%Y%m%d")
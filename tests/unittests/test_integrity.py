@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import numpy as np
+
+from emodpy_malaria.integrity import atomic_write, index_path, read_index, verify, write_index
+from emodpy_malaria.weather import WeatherData
+
+
+class IntegrityTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir: Path = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        self.bin_file: Path = self.test_dir.joinpath("weather.bin")
+        data = np.arange(12, dtype=np.float32).reshape(3, 4)
+        WeatherData(data=data).to_file(self.bin_file)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def test_to_file_writes_index(self):
+        self.assertEqual(index_path(self.bin_file), self.test_dir.joinpath("weather.integrity.json"))
+        self.assertTrue(index_path(self.bin_file).is_file())
+        self.assertEqual(read_index(self.bin_file)["Size"], 48)
+        self.assertTrue(verify(self.bin_file))
+        self.assertTrue(verify(self.bin_file, deep=True))
+
+    def test_truncated(self):
+        with open(self.bin_file, "r+b") as file:
+            file.truncate(40)
+        self.assertFalse(verify(self.bin_file))
+
+    def test_modified_same_size(self):
+        stat = self.bin_file.stat()
+        content = bytearray(self.bin_file.read_bytes())
+        content[0] ^= 0xFF
+        self.bin_file.write_bytes(bytes(content))
+
+        # Modification time changed, content is hashed.
+        self.assertFalse(verify(self.bin_file))
+
+        # Modification time restored, content is hashed only in the deep mode.
+        os.utime(self.bin_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertTrue(verify(self.bin_file))
+        self.assertFalse(verify(self.bin_file, deep=True))
+
+    def test_metadata_modified(self):
+        metadata_file = Path(f"{self.bin_file}.json")
+        metadata_file.write_text(metadata_file.read_text().replace("4", "5"))
+        self.assertFalse(verify(self.bin_file))
+
+    def test_missing_files(self):
+        Path(f"{self.bin_file}.json").unlink()
+        self.assertFalse(verify(self.bin_file))
+        self.bin_file.unlink()
+        self.assertFalse(verify(self.bin_file))
+
+    def test_no_index(self):
+        index_path(self.bin_file).unlink()
+        self.assertIsNone(read_index(self.bin_file))
+        self.assertIsNone(verify(self.bin_file))
+
+        index_path(self.bin_file).write_text("not json")
+        self.assertIsNone(verify(self.bin_file))
+
+    def test_custom_metadata_file(self):
+        metadata_file = self.test_dir.joinpath("custom.json")
+        metadata_file.write_text("{}")
+        write_index(self.bin_file, metadata_file)
+        self.assertTrue(verify(self.bin_file, metadata_file))
+        self.assertFalse(verify(self.bin_file))
+
+    def test_atomic_write(self):
+        link_file = self.test_dir.joinpath("link.bin")
+        os.link(self.bin_file, link_file)
+        with atomic_write(link_file) as file:
+            file.write(b"new")
+        self.assertEqual(link_file.read_bytes(), b"new")
+        self.assertEqual(self.bin_file.stat().st_size, 48)
+
+        # A failed write leaves the previous file and no temp files.
+        with self.assertRaises(ValueError):
+            with atomic_write(link_file) as file:
+                file.write(b"partial")
+                raise ValueError()
+        self.assertEqual(link_file.read_bytes(), b"new")
+        self.assertEqual(sorted(f.name for f in self.test_dir.iterdir()),
+                         ["link.bin", "weather.bin", "weather.bin.json", "weather.integrity.json"])
+
+
+if __name__ == '__main__':
+    unittest.main()
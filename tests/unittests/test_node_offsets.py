@@ -0,0 +1,60 @@
+import time
+import unittest
+
+import numpy as np
+
+from emodpy_malaria.node_offsets import decode_node_offsets, encode_node_offsets, node_offsets_to_str, \
+    str_to_node_offsets
+
+
+class NodeOffsetsTests(unittest.TestCase):
+
+    def test_encode(self):
+        offset_str = encode_node_offsets([1, 2, 3], [0, 12, 24])
+        self.assertEqual(offset_str, "0000000100000000000000020000000c0000000300000018")
+
+    def test_decode(self):
+        node_ids, offsets = decode_node_offsets("0000000100000000000000020000000c0000000300000018")
+        self.assertSequenceEqual(node_ids.tolist(), [1, 2, 3])
+        self.assertSequenceEqual(offsets.tolist(), [0, 12, 24])
+
+    def test_decode_upper_case(self):
+        node_ids, offsets = decode_node_offsets("FFFFFFFF0000000C")
+        self.assertSequenceEqual(node_ids.tolist(), [int("FFFFFFFF", 16)])
+        self.assertSequenceEqual(offsets.tolist(), [12])
+
+    def test_decode_count(self):
+        with self.assertRaises(ValueError):
+            decode_node_offsets("0000000100000000", count=2)
+
+    def test_dict_round_trip(self):
+        node_offsets = {10: 0, 20: 1460, 30: 0, int("FFFFFFFF", 16): int("FFFFFFFF", 16)}
+        offset_str = node_offsets_to_str(node_offsets)
+        self.assertEqual(len(offset_str), 16 * len(node_offsets))
+        self.assertEqual(str_to_node_offsets(offset_str, count=len(node_offsets)), node_offsets)
+
+    def test_empty(self):
+        self.assertEqual(node_offsets_to_str({}), "")
+        self.assertEqual(str_to_node_offsets(""), {})
+
+    def test_encode_mismatched_lengths(self):
+        with self.assertRaises(ValueError):
+            encode_node_offsets([1, 2], [0])
+
+    def test_encode_decode_1m_entries(self):
+        count = 1000000
+        node_ids = np.arange(1, count + 1, dtype=np.uint32)
+        offsets = np.arange(count, dtype=np.uint32) * 12
+
+        start = time.perf_counter()
+        offset_str = encode_node_offsets(node_ids, offsets)
+        actual_node_ids, actual_offsets = decode_node_offsets(offset_str, count=count)
+        duration = time.perf_counter() - start
+
+        self.assertTrue(np.array_equal(actual_node_ids, node_ids))
+        self.assertTrue(np.array_equal(actual_offsets, offsets))
+        self.assertLess(duration, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
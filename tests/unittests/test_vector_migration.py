@@ -0,0 +1,320 @@
+import contextlib
+import io
+import json
+import pickle
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from collections.abc import ItemsView, KeysView, ValuesView
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse
+
+from emodpy_malaria.vector_migration.vector_migration import ArrayLayer, Layer, VectorMigration, examine_file, \
+    from_arrays, from_file, from_sparse, read_arrays
+
+
+def legacy_binary(migration, value_limit):
+    """Binary content written by VectorMigration.to_file before it was vectorized, one node at a time."""
+    count = min(migration.DatavalueCount, value_limit)
+    content = b""
+    for layer in migration:
+        for node in migration.Nodes:
+            destinations = np.zeros(count, dtype=np.uint32)
+            rates = np.zeros(count, dtype=np.float64)
+            if node in layer:
+                keys = sorted(layer[node].keys())
+                keys = sorted(keys, key=lambda k: layer[node][k], reverse=True)[0:count]
+                keys = list(reversed(keys))
+                destinations[0:len(keys)] = keys
+                rates[0:len(keys)] = [layer[node][key] for key in keys]
+            content += destinations.tobytes() + rates.tobytes()
+    return content
+
+
+class VectorMigrationArrayTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        rng = np.random.default_rng(0)
+        node_ids = np.arange(1, 41) * 2
+        pairs = [(s, d) for s in node_ids for d in node_ids if s != d and rng.random() < 0.5]
+        self.sources = np.array([s for s, _ in pairs])
+        self.destinations = np.array([d for _, d in pairs])
+        self.rates = rng.random(len(pairs)).round(3)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def make_dict_migration(self):
+        migration = VectorMigration()
+        for s, d, r in zip(self.sources.tolist(), self.destinations.tolist(), self.rates.tolist()):
+            migration[s][d] = r
+        return migration
+
+    def test_from_arrays(self):
+        migration = from_arrays(self.sources, self.destinations, self.rates, id_reference="test")
+        expected = self.make_dict_migration()
+        self.assertEqual(migration.Nodes, expected.Nodes)
+        self.assertEqual(migration.NodeCount, expected.NodeCount)
+        self.assertEqual(migration.DatavalueCount, expected.DatavalueCount)
+        self.assertEqual(migration.NodeOffsets, expected.NodeOffsets)
+        for node in expected.Nodes:
+            self.assertEqual(dict(migration[node]), dict(expected[node]))
+
+    def test_item_access(self):
+        layer = ArrayLayer.from_arrays(self.sources, self.destinations, self.rates)
+        source, destination, rate = int(self.sources[0]), int(self.destinations[0]), self.rates[0]
+        self.assertIn(source, layer)
+        self.assertNotIn(1000, layer)
+        self.assertNotIn("a", layer)
+        self.assertEqual(layer[source][destination], rate)
+        with self.assertRaises(KeyError):
+            layer[1000]
+
+        # Indexing through the migration object replaces the array layer with a Layer, so changes are kept.
+        migration = from_arrays(self.sources, self.destinations, self.rates)
+        self.assertIsInstance(next(iter(migration)), ArrayLayer)
+        migration[source][destination] = 5.0
+        migration[1000][2] = 0.5
+        layer = next(iter(migration))
+        self.assertIsInstance(layer, Layer)
+        self.assertEqual(len(layer), len(np.unique(self.sources)) + 1)
+
+        sources, destinations, rates = layer.to_arrays()
+        self.assertEqual(len(sources), len(self.sources) + 1)
+        self.assertTrue(np.all(np.diff(sources) >= 0))
+        actual = {(s, d): r for s, d, r in zip(sources.tolist(), destinations.tolist(), rates.tolist())}
+        self.assertEqual(actual[(source, destination)], 5.0)
+        self.assertEqual(actual[(1000, 2)], 0.5)
+        self.assertEqual(actual[(int(self.sources[-1]), int(self.destinations[-1]))], self.rates[-1])
+        with self.assertRaises(RuntimeError):
+            layer["a"]
+
+    def test_mapping_methods(self):
+        expected = {1: {2: 0.1, 3: 0.2}, 2: {1: 0.3}}
+        layer = ArrayLayer.from_arrays([1, 1, 2], [2, 3, 1], [0.1, 0.2, 0.3])
+        self.assertEqual(layer, expected)
+        self.assertEqual(expected, layer)
+        self.assertNotEqual(layer, {1: {2: 0.1, 3: 0.2}})
+        self.assertIsInstance(layer.keys(), KeysView)
+        self.assertIsInstance(layer.items(), ItemsView)
+        self.assertIsInstance(layer.values(), ValuesView)
+        self.assertEqual(list(layer.items()), list(expected.items()))
+        self.assertEqual(dict(layer), expected)
+        self.assertEqual(layer.get(5, {}), {})
+
+        dict_layer = layer.to_layer()
+        self.assertIsInstance(dict_layer, Layer)
+        self.assertEqual(dict(dict_layer), expected)
+        self.assertEqual(json.loads(json.dumps(dict_layer)), {"1": {"2": 0.1, "3": 0.2}, "2": {"1": 0.3}})
+        self.assertEqual(json.dumps(dict(layer)), json.dumps(dict_layer))
+
+        # Changing returned dictionaries or arrays doesn't change the layer.
+        layer[1][2] = 0.5
+        self.assertEqual(layer[1][2], 0.1)
+        with self.assertRaises(ValueError):
+            layer.to_arrays()[2][0] = 0.5
+
+    def test_to_arrays(self):
+        layer = ArrayLayer.from_arrays(self.sources[::-1], self.destinations[::-1], self.rates[::-1])
+        for actual in [layer.to_arrays(), layer.to_layer().to_arrays()]:
+            sources, destinations, rates = actual
+            self.assertTrue(np.array_equal(sources, self.sources))
+            self.assertTrue(np.array_equal(destinations, self.destinations))
+            self.assertTrue(np.array_equal(rates, self.rates))
+
+        empty = Layer().to_arrays()
+        self.assertEqual([len(a) for a in empty], [0, 0, 0])
+
+    def test_from_sparse(self):
+        node_ids = np.array([10, 20, 30])
+        matrix = scipy.sparse.csr_matrix(np.array([[0, 0.1, 0.2], [0.3, 0, 0], [0, 0, 0]]))
+        migration = from_sparse(matrix, node_ids=node_ids)
+        self.assertEqual(migration.Nodes, [10, 20])
+        self.assertEqual(dict(migration[10]), {20: 0.1, 30: 0.2})
+        self.assertEqual(dict(migration[20]), {10: 0.3})
+
+        layer = ArrayLayer.from_sparse(matrix)
+        self.assertEqual(sorted(layer.keys()), [0, 1])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            ArrayLayer.from_arrays([1, 1], [2, 2], [0.1, 0.2])
+        with self.assertRaises(ValueError):
+            ArrayLayer.from_arrays([1, 2], [2], [0.1])
+        with self.assertRaises(RuntimeError):
+            VectorMigration().set_layer({1: {2: 0.1}})
+
+    def test_set_layer_by_gender(self):
+        migration = VectorMigration()
+        migration.GenderDataType = VectorMigration.ONE_FOR_EACH_GENDER
+        migration.set_layer(ArrayLayer.from_arrays([1], [2], [0.5]), gender=1)
+        self.assertEqual(dict(migration[1:1]), {2: 0.5})
+        self.assertEqual(dict(migration[1:0]), {})
+
+    def test_to_file(self):
+        expected = self.make_dict_migration()
+        migration = from_arrays(self.sources, self.destinations, self.rates)
+        migration.DateCreated = expected.DateCreated
+        expected_file = expected.to_file(self.test_dir.joinpath("expected.bin"), value_limit=10)
+        actual_file = migration.to_file(self.test_dir.joinpath("actual.bin"), value_limit=10)
+        self.assertEqual(actual_file.read_bytes(), expected_file.read_bytes())
+        self.assertEqual(Path(f"{actual_file}.json").read_text(), Path(f"{expected_file}.json").read_text())
+
+    def test_to_file_matches_legacy(self):
+        migration = VectorMigration()
+        migration.GenderDataType = VectorMigration.ONE_FOR_EACH_GENDER
+        migration.set_layer(ArrayLayer.from_arrays(self.sources, self.destinations, self.rates), gender=0)
+        # Many equal rates, so ties are broken on node id, and a node missing from this layer.
+        female = (self.sources != self.sources[0])
+        migration.set_layer(ArrayLayer.from_arrays(self.sources[female], self.destinations[female],
+                                                   self.rates[female].round(1)), gender=1)
+        migration[3:1][5] = 0.25
+
+        for value_limit in [1, 7, 100]:
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter("always")
+                file_path = migration.to_file(self.test_dir.joinpath(f"migration_{value_limit}.bin"),
+                                              value_limit=value_limit)
+            self.assertEqual(file_path.read_bytes(), legacy_binary(migration, value_limit))
+            self.assertEqual(len(w), 2)  # node 3 is not in the first layer, the first source is not in the second
+
+    def test_to_file_empty_destinations(self):
+        migration = VectorMigration()
+        migration[1][2] = 0.5
+        self.assertEqual(migration[2], {})  # indexing adds node 2, without destinations
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            file_path = migration.to_file(self.test_dir.joinpath("empty_destinations.bin"))
+        self.assertEqual(file_path.read_bytes(), legacy_binary(migration, 100))
+        self.assertEqual(len(w), 0)  # node 2 is in the layer, without destinations
+
+    def test_to_file_empty(self):
+        file_path = VectorMigration().to_file(self.test_dir.joinpath("empty.bin"))
+        self.assertEqual(file_path.read_bytes(), b"")
+
+    def test_from_file(self):
+        expected = self.make_dict_migration()
+        expected.IdReference = "test"
+        file_path = expected.to_file(self.test_dir.joinpath("migration.bin"), value_limit=100)
+        migration = from_file(file_path)
+        self.assertEqual(migration.IdReference, "test")
+        self.assertEqual(migration.Nodes, expected.Nodes)
+        for node in expected.Nodes:
+            self.assertEqual(dict(migration[node]), dict(expected[node]))
+
+    def test_read_arrays(self):
+        migration = from_arrays(self.sources, self.destinations, self.rates)
+        file_path = migration.to_file(self.test_dir.joinpath("migration.bin"), value_limit=100)
+        arrays = read_arrays(file_path)
+        self.assertIsInstance(arrays.records, np.memmap)
+        self.assertEqual(arrays.destinations.shape, (1, migration.NodeCount, migration.DatavalueCount))
+        self.assertEqual(arrays.rates.shape, arrays.destinations.shape)
+        self.assertEqual(arrays.Nodes, migration.Nodes)
+        self.assertEqual(arrays.NodeCount, migration.NodeCount)
+        self.assertEqual(arrays.DatavalueCount, migration.DatavalueCount)
+
+        sources, destinations, rates = arrays.edges(0)
+        order = np.lexsort((destinations, sources))
+        self.assertTrue(np.array_equal(sources[order], self.sources))
+        self.assertTrue(np.array_equal(destinations[order], self.destinations))
+        self.assertTrue(np.array_equal(rates[order], self.rates))
+
+        view = arrays.layer(0)
+        self.assertEqual(sorted(view), migration.Nodes)
+        node = migration.Nodes[3]
+        self.assertEqual(view[node], dict(migration[node]))
+        with self.assertRaises(KeyError):
+            view[-1]
+
+        in_memory = read_arrays(file_path, mmap=False)
+        self.assertNotIsInstance(in_memory.records, np.memmap)
+        self.assertTrue(np.array_equal(in_memory.records, arrays.records))
+
+    def test_read_layers(self):
+        migration = VectorMigration()
+        migration.GenderDataType = VectorMigration.ONE_FOR_EACH_GENDER
+        migration.AgesYears = [5, 50]
+        for index, (gender, age) in enumerate([(0, 5), (0, 50), (1, 5), (1, 50)]):
+            migration[1:gender:age][2] = index + 1.0
+            migration[2:gender:age][1] = index + 0.5
+        file_path = migration.to_file(self.test_dir.joinpath("layers.bin"))
+
+        arrays = read_arrays(file_path)
+        self.assertEqual(arrays.layer_count, 4)
+        self.assertEqual(arrays.rates[:, :, 0].tolist(), [[1, 0.5], [2, 1.5], [3, 2.5], [4, 3.5]])
+
+        actual = from_file(file_path)
+        self.assertEqual(actual.GenderDataType, VectorMigration.ONE_FOR_EACH_GENDER)
+        self.assertEqual(actual.AgesYears, [5, 50])
+        for gender, age in [(0, 5), (0, 50), (1, 5), (1, 50)]:
+            self.assertEqual(dict(actual[1:gender:age]), dict(migration[1:gender:age]))
+            self.assertEqual(dict(actual[2:gender:age]), dict(migration[2:gender:age]))
+
+    def test_gender_data_type_metadata(self):
+        migration = from_arrays([1, 2], [2, 1], [0.5, 0.25])
+        file_path = migration.to_file(self.test_dir.joinpath("same.bin"))
+        metadata = json.loads(Path(f"{file_path}.json").read_text())["Metadata"]
+        self.assertNotIn("GenderDataType", metadata)
+        self.assertEqual(from_file(file_path).GenderDataType, VectorMigration.SAME_FOR_BOTH_GENDERS)
+
+        migration = VectorMigration()
+        migration.GenderDataType = VectorMigration.ONE_FOR_EACH_GENDER
+        migration[1:0][2] = 0.5
+        migration[1:1][2] = 0.75
+        file_path = migration.to_file(self.test_dir.joinpath("by_gender.bin"))
+        metadata = json.loads(Path(f"{file_path}.json").read_text())["Metadata"]
+        self.assertEqual(metadata["GenderDataType"], "ONE_FOR_EACH_GENDER")
+
+        actual = from_file(file_path)
+        self.assertEqual(actual.GenderDataType, VectorMigration.ONE_FOR_EACH_GENDER)
+        self.assertEqual(read_arrays(file_path).layer_count, 2)
+        self.assertEqual(dict(actual[1:0]), {2: 0.5})
+        self.assertEqual(dict(actual[1:1]), {2: 0.75})
+
+        # Rewriting the file read back produces the same metadata.
+        actual.DateCreated = migration.DateCreated
+        copy_path = actual.to_file(self.test_dir.joinpath("by_gender_copy.bin"))
+        self.assertEqual(Path(f"{copy_path}.json").read_text(), Path(f"{file_path}.json").read_text())
+
+    def test_read_invalid(self):
+        file_path = from_arrays([1], [2], [0.5]).to_file(self.test_dir.joinpath("invalid.bin"))
+        with open(file_path, "r+b") as file:
+            file.truncate(6)
+        with self.assertRaises(RuntimeError):
+            read_arrays(file_path)
+
+        metafile = Path(f"{file_path}.json")
+        content = json.loads(metafile.read_text())
+        content["NodeOffsets"] = "0000000100000005"
+        metafile.write_text(json.dumps(content))
+        with self.assertRaises(RuntimeError):
+            read_arrays(file_path)
+
+    def test_examine_file(self):
+        migration = from_arrays(self.sources, self.destinations, self.rates, id_reference="test")
+        file_path = migration.to_file(self.test_dir.joinpath("migration.bin"))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            examine_file(file_path)
+        self.assertIn("IdReference:       test", output.getvalue())
+        self.assertIn(f"NodeCount:         {migration.NodeCount}", output.getvalue())
+        self.assertIn(f"NodeOffsets:       {migration.NodeOffsets}", output.getvalue())
+
+    def test_pickle(self):
+        array_layer = ArrayLayer.from_arrays(self.sources, self.destinations, self.rates)
+        layer = array_layer.to_layer()
+        layer[int(self.sources[0])][1000] = 1.0
+        for expected in [array_layer, layer]:
+            copy = pickle.loads(pickle.dumps(expected))
+            self.assertIsInstance(copy, type(expected))
+            self.assertEqual(dict(copy), dict(expected))
+            self.assertEqual([a.tolist() for a in copy.to_arrays()], [a.tolist() for a in expected.to_arrays()])
+
+
+if __name__ == '__main__':
+    unittest.main()
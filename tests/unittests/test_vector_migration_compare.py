@@ -0,0 +1,106 @@
+import contextlib
+import io
+import json
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import numpy as np
+
+from emodpy_malaria.vector_migration.compare import compare_files, main
+from emodpy_malaria.vector_migration.vector_migration import VectorMigration, _record_dtype, from_arrays
+
+
+class CompareTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        # 4 source nodes with 3 destinations each
+        self.sources = np.repeat([1, 2, 3, 4], 3)
+        self.destinations = np.array([2, 3, 4, 1, 3, 4, 1, 2, 4, 1, 2, 3])
+        self.rates = np.arange(1, 13) / 100
+        self.old_file = from_arrays(self.sources, self.destinations, self.rates).to_file(
+            self.test_dir.joinpath("old.bin"))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def write(self, name, sources, destinations, rates, value_limit=100):
+        return from_arrays(sources, destinations, rates).to_file(self.test_dir.joinpath(name), value_limit=value_limit)
+
+    def test_identical(self):
+        report = compare_files(self.old_file, self.old_file)
+        layer = report["layers"][0]
+        self.assertEqual(layer["common_edges"], 12)
+        self.assertEqual([layer["added_edges"], layer["removed_edges"], layer["changed_rates"]], [0, 0, 0])
+        self.assertEqual(layer["max_delta"], 0)
+
+    def test_changes(self):
+        rates = self.rates.copy()
+        rates[0] *= 1.5     # 1 -> 2 changed by 50%
+        rates[4] += 0.001   # 2 -> 3 changed slightly
+        keep = np.arange(12) != 11  # 4 -> 3 removed
+        sources = np.append(self.sources[keep], 5)  # 5 -> 1 added, node 5 added
+        destinations = np.append(self.destinations[keep], 1)
+        new_file = self.write("new.bin", sources, destinations, np.append(rates[keep], 0.5))
+
+        layer = compare_files(self.old_file, new_file)["layers"][0]
+        self.assertEqual([layer["old_edges"], layer["new_edges"]], [12, 12])
+        self.assertEqual([layer["added_edges"], layer["removed_edges"], layer["common_edges"]], [1, 1, 11])
+        self.assertEqual([layer["added_nodes"], layer["removed_nodes"]], [1, 0])
+        self.assertEqual(layer["changed_rates"], 2)
+        self.assertAlmostEqual(layer["max_delta"], 0.005)
+        self.assertAlmostEqual(layer["max_relative_delta"], 0.5)
+        # Means are over changed rates only.
+        self.assertAlmostEqual(layer["mean_delta"], 0.006 / 2)
+        self.assertAlmostEqual(layer["mean_relative_delta"], (0.5 + 0.001 / 0.05) / 2)
+
+        layer = compare_files(self.old_file, new_file, atol=0.002)["layers"][0]
+        self.assertEqual(layer["changed_rates"], 1)
+        self.assertAlmostEqual(layer["mean_delta"], 0.005)
+
+    def test_duplicate_edges(self):
+        # Duplicate the last destination of node 1 (1 -> 4) in place of its first one (1 -> 2), with another rate.
+        new_file = self.write("duplicates.bin", self.sources, self.destinations, self.rates)
+        records = np.fromfile(new_file, dtype=_record_dtype(3))
+        records["destinations"][0, 0] = records["destinations"][0, 2]
+        records["rates"][0, 0] = 0.5
+        records.tofile(new_file)
+
+        layer = compare_files(self.old_file, new_file)["layers"][0]
+        self.assertEqual([layer["old_edges"], layer["new_edges"]], [12, 11])
+        self.assertEqual([layer["added_edges"], layer["removed_edges"], layer["common_edges"]], [0, 1, 11])
+        self.assertEqual(layer["added_edges"] + layer["common_edges"], layer["new_edges"])
+        self.assertEqual(layer["removed_edges"] + layer["common_edges"], layer["old_edges"])
+
+    def test_truncation(self):
+        new_file = self.write("truncated.bin", self.sources, self.destinations, self.rates, value_limit=2)
+        layer = compare_files(self.old_file, new_file)["layers"][0]
+        # All nodes use all destinations in both files, the lowest rate of each node is truncated.
+        self.assertEqual([layer["old_full_nodes"], layer["new_full_nodes"]], [4, 4])
+        self.assertEqual(layer["removed_edges"], 4)
+        self.assertEqual(layer["removed_from_full_nodes"], 4)
+
+    def test_layers(self):
+        migration = VectorMigration()
+        migration.GenderDataType = VectorMigration.ONE_FOR_EACH_GENDER
+        migration[1:0][2] = 0.1
+        migration[1:1][2] = 0.2
+        new_file = migration.to_file(self.test_dir.joinpath("layers.bin"))
+        report = compare_files(self.old_file, new_file)
+        self.assertEqual([report["old"]["layers"], report["new"]["layers"]], [1, 2])
+        self.assertEqual(len(report["layers"]), 1)
+
+    def test_main(self):
+        json_file = self.test_dir.joinpath("report.json")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            report = main([str(self.old_file), str(self.old_file), "--json", str(json_file)])
+        self.assertIn("layer 0:", output.getvalue())
+        self.assertEqual(json.loads(json_file.read_text()), report)
+
+
+if __name__ == '__main__':
+    unittest.main()
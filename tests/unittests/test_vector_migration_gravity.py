@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+
+from unittest import mock
+
+from geographiclib.geodesic import Geodesic
+
+from emodpy_malaria.vector_migration.gravity import _top_destinations, geodesic_distances, gravity_migration, \
+    gravity_rates
+
+
+def reference_rates(node_ids, lat, lon, populations, gravity_params, exclude_nodes=()):
+    """Rates computed pair by pair, as from_demographics_and_gravity_params previously did."""
+    geodesic = Geodesic.WGS84
+    rates = {}
+    for i, source_id in enumerate(node_ids):
+        if source_id in exclude_nodes:
+            continue
+        for j, dest_id in enumerate(node_ids):
+            if i == j or dest_id in exclude_nodes:
+                continue
+            distance = geodesic.Inverse(lat[i], lon[i], lat[j], lon[j], Geodesic.DISTANCE)['s12'] / 1000
+            if populations[i] == 0 or populations[j] == 0:
+                rate = 0
+            else:
+                rate = gravity_params[0] * (populations[i] ** (gravity_params[1] - 1)) \
+                       * (populations[j] ** gravity_params[2]) * (distance ** gravity_params[3])
+                rate = min(1., rate)
+            rates.setdefault(source_id, {})[dest_id] = rate
+    return rates
+
+
+class GravityTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.node_count = 60
+        self.node_ids = list(rng.permutation(np.arange(1, self.node_count + 1) * 3).tolist())
+        self.lat = rng.uniform(-15, 15, self.node_count)
+        self.lon = rng.uniform(20, 40, self.node_count)
+        self.populations = rng.integers(100, 10000, self.node_count).astype(float)
+        self.populations[5] = 0
+        self.gravity_params = [7.5e-4, 0.8, 0.9, -1.5]
+
+    def test_distances(self):
+        lat = np.array([0, 10, -33.9, 51.5, 89.9, 0])
+        lon = np.array([0, 10, 18.4, -0.1, 45, 179.9])
+        distances = geodesic_distances(lat, lon, lat, lon)
+        for i in range(len(lat)):
+            for j in range(len(lat)):
+                expected = Geodesic.WGS84.Inverse(lat[i], lon[i], lat[j], lon[j])['s12'] / 1000
+                self.assertAlmostEqual(distances[i, j], expected, delta=max(1e-6, expected * 1e-4))
+        self.assertTrue(np.all(np.diag(distances) == 0))
+
+    def test_rates(self):
+        rates = gravity_rates([0.1, 1, 1, -1], np.array([0, 10]), np.array([10, 1e9]), np.array([[5, 5], [5, 5]]))
+        self.assertTrue(np.allclose(rates, [[0, 0], [0.2, 1]]))
+
+    def test_matches_reference(self):
+        expected = reference_rates(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params)
+        actual = gravity_migration(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params)
+        self.assertEqual(len(actual), self.node_count)
+        for source_id, destinations, rates in actual:
+            self.assertEqual(sorted(destinations.tolist()), sorted(expected[source_id]))
+            self.assertNotIn(source_id, destinations)
+            expected_rates = [expected[source_id][d] for d in destinations.tolist()]
+            self.assertTrue(np.allclose(rates, expected_rates, rtol=1e-4, atol=0))
+            # Ordered descending on rate.
+            self.assertTrue(np.all(np.diff(rates) <= 0))
+
+    def test_max_destinations(self):
+        expected = reference_rates(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params)
+        actual = gravity_migration(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params,
+                                   max_destinations=10)
+        for source_id, destinations, rates in actual:
+            self.assertEqual(len(destinations), 10)
+            # The same destinations to_file() keeps: descending on rate and ascending on node id.
+            top = sorted(expected[source_id].items(), key=lambda item: (-item[1], item[0]))[:10]
+            self.assertEqual(destinations.tolist(), [d for d, _ in top])
+
+    def test_ties(self):
+        # Equal populations on a symmetric layout result in equal rates, ties are broken on ascending node id.
+        actual = dict((s, d.tolist()) for s, d, _ in gravity_migration([9, 4, 7, 1], [0, 1, 0, -1], [0, 0, 1, 0],
+                                                                         [100] * 4, [1, 1, 1, -1], max_destinations=2))
+        self.assertEqual(actual[9], [1, 4])
+        self.assertEqual(actual[7], [9, 1])
+        self.assertEqual(actual[4], [9, 7])
+
+    def test_top_destinations(self):
+        # Many ties, including at the k-th key, are ordered on column index as a full stable sort orders them.
+        keys = np.random.default_rng(1).integers(0, 4, (50, 30)).astype(float)
+        keys[:, 7] = np.inf
+        for k in [1, 5, 29, 30]:
+            expected = np.argsort(keys, axis=1, kind="stable")[:, :k]
+            self.assertTrue(np.array_equal(_top_destinations(keys, k), expected))
+
+    def test_chunks(self):
+        expected = gravity_migration(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params,
+                                     max_destinations=10)
+        # A budget of one row of temporaries processes one source node at a time.
+        with mock.patch("emodpy_malaria.vector_migration.gravity._CHUNK_BYTES", 1):
+            actual = gravity_migration(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params,
+                                       max_destinations=10)
+        self.assertEqual(len(actual), len(expected))
+        for (s1, d1, r1), (s2, d2, r2) in zip(actual, expected):
+            self.assertEqual(s1, s2)
+            self.assertTrue(np.array_equal(d1, d2))
+            self.assertTrue(np.array_equal(r1, r2))
+
+    def test_exclude_nodes(self):
+        exclude_nodes = self.node_ids[:5]
+        expected = reference_rates(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params,
+                                   exclude_nodes=exclude_nodes)
+        actual = gravity_migration(self.node_ids, self.lat, self.lon, self.populations, self.gravity_params,
+                                   exclude_nodes=exclude_nodes)
+        self.assertEqual(sorted(s for s, _, _ in actual), sorted(expected))
+        for source_id, destinations, _ in actual:
+            self.assertFalse(set(destinations.tolist()) & set(exclude_nodes))
+
+    def test_single_node(self):
+        self.assertEqual(gravity_migration([1], [0], [0], [100], self.gravity_params), [])
+        with self.assertRaises(ValueError):
+            gravity_migration([1, 2], [0], [0], [100], self.gravity_params)
+
+
+if __name__ == '__main__':
+    unittest.main()
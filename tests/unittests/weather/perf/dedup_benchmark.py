@@ -0,0 +1,82 @@
+"""
+Benchmark of weather time series deduplication in WeatherData.from_dict, comparing the vectorized implementation
+with the previous per-series hashing approach. Both must produce identical .bin and .bin.json content.
+
+Usage:
+    python dedup_benchmark.py [node_count ...]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from emodpy_malaria.weather.weather_data import WeatherData
+from emodpy_malaria.weather.weather_metadata import SERIES_BYTE_VALUE_SIZE
+from emodpy_malaria.weather.weather_utils import hash_series, invert_dict, unique_series
+
+_NODE_COUNTS = [1000, 10000, 100000]
+_SERIES_LEN = 365
+_UNIQUE_RATIO = 0.1
+
+
+def make_node_series(node_count: int, series_len: int = _SERIES_LEN, unique_ratio: float = _UNIQUE_RATIO):
+    """Create node-series dictionary where about unique_ratio of series are distinct."""
+    rng = np.random.default_rng(seed=node_count)
+    unique_count = max(1, int(node_count * unique_ratio))
+    patterns = rng.normal(20, 5, size=(unique_count, series_len)).astype(np.float32)
+    pattern_idx = rng.integers(0, unique_count, size=node_count)
+    return {node_id: patterns[i] for node_id, i in zip(range(1, node_count + 1), pattern_idx)}
+
+
+def legacy_dedup(node_series):
+    """Previous from_dict deduplication, hashing series one at a time. Returns unique series and node offsets."""
+    series_len = len(next(iter(node_series.values())))
+    node_series_hashes = {int(n): hash_series(s) for n, s in node_series.items()}
+    unique_nodes = {h: nn[0] for h, nn in invert_dict(node_series_hashes).items()}
+    unique_series = [node_series[n] for n in unique_nodes.values()]
+    offset_increment = series_len * SERIES_BYTE_VALUE_SIZE
+    node_offsets = {n: (i * offset_increment) for i, n in enumerate(unique_nodes.values())}
+    node_offsets.update({n: node_offsets[unique_nodes[h]] for n, h in node_series_hashes.items()})
+    node_offsets = dict(sorted(node_offsets.items()))
+    return np.array(unique_series, dtype=np.float32), node_offsets
+
+
+def vectorized_dedup(node_series):
+    """Current from_dict deduplication, on a matrix of stacked series. Returns unique series and node offsets."""
+    series_values = np.array(list(node_series.values()), dtype=np.float32)
+    unique_idx, inverse = unique_series(series_values)
+    offsets = inverse * series_values.shape[1] * SERIES_BYTE_VALUE_SIZE
+    node_ids = np.array(list(node_series))
+    order = np.argsort(node_ids, kind="stable")
+    node_offsets = dict(zip(node_ids[order].tolist(), offsets[order].tolist()))
+    return series_values[unique_idx], node_offsets
+
+
+def run(node_counts=None):
+    node_counts = node_counts or _NODE_COUNTS
+    print(f"{'nodes':>8} {'legacy(s)':>10} {'vectorized(s)':>14} {'speedup':>8} {'from_dict(s)':>13}")
+    for node_count in node_counts:
+        node_series = make_node_series(node_count)
+
+        tic = time.perf_counter()
+        expected_data, expected_offsets = legacy_dedup(node_series)
+        legacy_time = time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        actual_data, actual_offsets = vectorized_dedup(node_series)
+        vectorized_time = time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        wd = WeatherData.from_dict(node_series=node_series)
+        from_dict_time = time.perf_counter() - tic
+
+        # Confirm identical .bin content and node offsets.
+        assert np.array_equal(expected_data, actual_data) and np.array_equal(expected_data, wd.data)
+        assert expected_offsets == actual_offsets == wd.metadata.node_offsets
+        speedup = legacy_time / vectorized_time
+        print(f"{node_count:>8} {legacy_time:>10.3f} {vectorized_time:>14.3f} {speedup:>8.1f} {from_dict_time:>13.3f}")
+
+
+if __name__ == '__main__':
+    run([int(a) for a in sys.argv[1:]])
@@ -0,0 +1,44 @@
+"""
+Benchmark of weather metadata offset assignment and NodeOffsets string codec, which are expected to scale linearly
+with the number of nodes.
+
+Usage:
+    python metadata_benchmark.py [node_count ...]
+"""
+
+import sys
+import time
+
+from emodpy_malaria.weather.weather_metadata import WeatherMetadata
+
+_NODE_COUNTS = [20000, 200000]
+_SERIES_LEN = 365
+_REPEAT = 3
+
+
+def measure(node_count: int, series_len: int = _SERIES_LEN, repeat: int = _REPEAT) -> float:
+    """Best time of creating metadata for node_count nodes and decoding its NodeOffsets string."""
+    node_ids = list(range(node_count, 0, -1))
+    timings = []
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        wm = WeatherMetadata(node_ids=node_ids, series_len=series_len)
+        node_offsets = WeatherMetadata._convert_offset_str_to_dict(wm.node_offset_str)
+        timings.append(time.perf_counter() - tic)
+
+    # Confirm the codec round-trips and offsets are assigned in node order.
+    assert node_offsets == wm.node_offsets
+    assert wm.node_offsets[node_count] == 0 and wm.node_offsets[1] == (node_count - 1) * series_len * 4
+    return min(timings)
+
+
+def run(node_counts=None):
+    node_counts = node_counts or _NODE_COUNTS
+    print(f"{'nodes':>8} {'time(s)':>8} {'us/node':>8}")
+    for node_count in node_counts:
+        duration = measure(node_count)
+        print(f"{node_count:>8} {duration:>8.3f} {duration / node_count * 1e6:>8.2f}")
+
+
+if __name__ == '__main__':
+    run([int(a) for a in sys.argv[1:]])
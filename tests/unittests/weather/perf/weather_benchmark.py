@@ -0,0 +1,239 @@
+"""
+Weather package benchmark, timing reading, writing and conversion of synthetic weather data and recording
+peak memory of each operation. Results are written as JSON, so they can be compared between releases.
+
+Synthetic weather data has a configurable number of nodes, series length and ratio of distinct series
+(deduplication ratio), which determines the size of .bin files relative to the number of nodes.
+
+Usage:
+    python weather_benchmark.py [--nodes 1000 10000] [--series-len 365] [--unique-ratio 0.1] [--repeat 3]
+                                [--output results.json]
+    python weather_benchmark.py --generate weather_dir [--nodes 10000] [--series-len 365] [--unique-ratio 0.1]
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from emodpy_malaria.node_offsets import decode_node_offsets, encode_node_offsets
+from emodpy_malaria.weather.weather_data import WeatherData
+from emodpy_malaria.weather.weather_metadata import WeatherMetadata, SERIES_BYTE_VALUE_SIZE
+from emodpy_malaria.weather.weather_set import WeatherSet
+from emodpy_malaria.weather.weather_variable import WeatherVariable
+
+_NODE_COUNTS = [1000, 10000, 100000]
+_SERIES_LEN = 365
+_UNIQUE_RATIO = 0.1
+_REPEAT = 3
+
+
+def make_weather_data(node_count: int,
+                      series_len: int = _SERIES_LEN,
+                      unique_ratio: float = _UNIQUE_RATIO,
+                      seed: int = 0) -> WeatherData:
+    """
+    Create synthetic weather data, where about 'unique_ratio' of node series are distinct.
+
+    Args:
+        node_count: The number of nodes, with ids from 1 to node_count.
+        series_len: (Optional) The series length. The default is 365.
+        unique_ratio: (Optional) The ratio of distinct series to nodes, between 0 and 1. The default is 0.1.
+        seed: (Optional) Random generator seed.
+
+    Returns:
+        WeatherData object.
+    """
+    rng = np.random.default_rng(seed=seed)
+    unique_count = min(node_count, max(1, int(round(node_count * unique_ratio))))
+    data = rng.normal(20, 5, size=(unique_count, series_len)).astype(np.float32)
+    # Each distinct series is used at least once, the remaining nodes pick a series at random.
+    rows = np.concatenate([np.arange(unique_count), rng.integers(0, unique_count, size=node_count - unique_count)])
+    offsets = rows * series_len * SERIES_BYTE_VALUE_SIZE
+    node_offsets = dict(zip(range(1, node_count + 1), offsets.tolist()))
+    metadata = WeatherMetadata(node_ids=node_offsets, series_len=series_len)
+    return WeatherData(data=data, metadata=metadata)
+
+
+def make_weather_set(node_count: int,
+                     series_len: int = _SERIES_LEN,
+                     unique_ratio: float = _UNIQUE_RATIO,
+                     seed: int = 0) -> WeatherSet:
+    """Create synthetic weather set, containing synthetic weather data for each weather variable."""
+    ws = WeatherSet()
+    for i, v in enumerate(WeatherVariable.list()):
+        ws[v] = make_weather_data(node_count, series_len=series_len, unique_ratio=unique_ratio, seed=seed + i)
+
+    return ws
+
+
+def generate(dir_path: Union[str, Path],
+             node_count: int,
+             series_len: int = _SERIES_LEN,
+             unique_ratio: float = _UNIQUE_RATIO,
+             seed: int = 0) -> Dict[WeatherVariable, str]:
+    """Write synthetic weather files for all weather variables into 'dir_path'. Returns weather file names."""
+    ws = make_weather_set(node_count, series_len=series_len, unique_ratio=unique_ratio, seed=seed)
+    ws.to_files(dir_path=dir_path)
+    return ws.file_names
+
+
+def measure(func: Callable[[], Any], repeat: int = _REPEAT) -> Dict[str, float]:
+    """
+    Measure the execution time and peak memory of a function. Time is the best of 'repeat' runs without memory
+    tracing, which would slow the function down. Peak memory is measured in a separate run, using tracemalloc.
+
+    Args:
+        func: The function to measure, without arguments.
+        repeat: (Optional) The number of timed runs.
+
+    Returns:
+        Dictionary containing the best time, the mean time (in seconds) and the peak memory (in MB).
+    """
+    times = []
+    for _ in range(max(1, repeat)):
+        tic = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - tic)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(times), "mean_seconds": float(np.mean(times)), "peak_mb": peak / 2 ** 20}
+
+
+def benchmark(node_count: int,
+              series_len: int = _SERIES_LEN,
+              unique_ratio: float = _UNIQUE_RATIO,
+              repeat: int = _REPEAT) -> List[Dict[str, Union[str, int, float]]]:
+    """
+    Benchmark weather operations on synthetic weather data of a given size.
+
+    Args:
+        node_count: The number of nodes.
+        series_len: (Optional) The series length.
+        unique_ratio: (Optional) The ratio of distinct series to nodes.
+        repeat: (Optional) The number of timed runs of each operation.
+
+    Returns:
+        List of results, one for each operation.
+    """
+    wd = make_weather_data(node_count, series_len=series_len, unique_ratio=unique_ratio)
+    ws = make_weather_set(node_count, series_len=series_len, unique_ratio=unique_ratio)
+    node_series = wd.to_dict()
+    df = wd.to_dataframe()
+    node_ids = np.fromiter(wd.metadata.node_offsets.keys(), dtype=np.int64)
+    offsets = np.fromiter(wd.metadata.node_offsets.values(), dtype=np.int64)
+    offset_str = encode_node_offsets(node_ids, offsets)
+
+    test_dir = Path(tempfile.mkdtemp(suffix="emodpy_malaria_benchmark"))
+    try:
+        bin_file = test_dir.joinpath("weather.bin")
+        set_dir = test_dir.joinpath("weather_set")
+        wd.to_file(bin_file)
+        ws.to_files(dir_path=set_dir)
+
+        operations = {
+            "WeatherData.to_file": lambda: wd.to_file(bin_file),
+            "WeatherData.from_file": lambda: WeatherData.from_file(bin_file),
+            "WeatherData.from_file(validate=False)": lambda: WeatherData.from_file(bin_file, validate=False),
+            "WeatherData.from_file(mmap=True)": lambda: WeatherData.from_file(bin_file, mmap=True),
+            "WeatherData.from_dict": lambda: WeatherData.from_dict(node_series=node_series),
+            "WeatherData.to_dict": lambda: wd.to_dict(),
+            "WeatherData.from_dataframe": lambda: WeatherData.from_dataframe(df),
+            "WeatherData.to_dataframe": lambda: wd.to_dataframe(),
+            "encode_node_offsets": lambda: encode_node_offsets(node_ids, offsets),
+            "decode_node_offsets": lambda: decode_node_offsets(offset_str, count=node_count),
+            "WeatherSet.to_files": lambda: ws.to_files(dir_path=set_dir),
+            "WeatherSet.from_files": lambda: WeatherSet.from_files(dir_path=set_dir),
+        }
+
+        results = []
+        for name, func in operations.items():
+            result = measure(func, repeat=repeat)
+            results.append({"operation": name,
+                            "nodes": node_count,
+                            "series_len": series_len,
+                            "unique_ratio": unique_ratio,
+                            "unique_series": wd.metadata.series_unique_count,
+                            **result})
+    finally:
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+    return results
+
+
+def environment() -> Dict[str, str]:
+    """Collect versions and platform info, used to tell benchmark results apart."""
+    try:
+        version = importlib_metadata.version("emodpy_malaria")
+    except importlib_metadata.PackageNotFoundError:
+        version = "unknown"
+
+    return {"emodpy_malaria": version,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "date": datetime.now().isoformat(timespec="seconds")}
+
+
+def run(node_counts: List[int] = None,
+        series_len: int = _SERIES_LEN,
+        unique_ratio: float = _UNIQUE_RATIO,
+        repeat: int = _REPEAT,
+        output: Union[str, Path] = None) -> Dict[str, Any]:
+    """Run benchmarks for each node count, print a summary and optionally save results as JSON."""
+    node_counts = node_counts or _NODE_COUNTS
+    report = {"environment": environment(),
+              "config": {"nodes": node_counts, "series_len": series_len, "unique_ratio": unique_ratio,
+                         "repeat": repeat},
+              "results": []}
+
+    print(f"{'operation':<40} {'nodes':>8} {'seconds':>10} {'peak(MB)':>10}")
+    for node_count in node_counts:
+        for r in benchmark(node_count, series_len=series_len, unique_ratio=unique_ratio, repeat=repeat):
+            print(f"{r['operation']:<40} {r['nodes']:>8} {r['seconds']:>10.4f} {r['peak_mb']:>10.1f}")
+            report["results"].append(r)
+
+    if output:
+        Path(output).write_text(json.dumps(report, indent=2))
+
+    return report
+
+
+def parse_args(args: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Weather package benchmark.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=None, help=f"Node counts, default: {_NODE_COUNTS}")
+    parser.add_argument("--series-len", type=int, default=_SERIES_LEN, help="Series length.")
+    parser.add_argument("--unique-ratio", type=float, default=_UNIQUE_RATIO, help="Ratio of distinct series.")
+    parser.add_argument("--repeat", type=int, default=_REPEAT, help="The number of timed runs.")
+    parser.add_argument("--output", default=None, help="JSON results file path.")
+    parser.add_argument("--generate", default=None, help="Only write synthetic weather files into this directory.")
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    a = parse_args(sys.argv[1:])
+    if a.generate:
+        generate(a.generate, node_count=(a.nodes or _NODE_COUNTS)[0], series_len=a.series_len,
+                 unique_ratio=a.unique_ratio)
+    else:
+        run(a.nodes, series_len=a.series_len, unique_ratio=a.unique_ratio, repeat=a.repeat, output=a.output)
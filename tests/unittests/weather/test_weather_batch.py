@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pathlib import Path
+
+from emodpy_malaria.weather import *
+
+
+class WeatherBatchTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.current_dir: Path = Path(__file__).parent
+        self.dtk_dir_all = str(self.current_dir.joinpath("case_default_names_all"))
+        self.test_dir: Path = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        self.base = WeatherSet.from_files(dir_path=self.dtk_dir_all)
+        self.scenarios = {
+            f"temp_{t}": {WeatherVariable.AIR_TEMPERATURE: lambda wd, t=t: wd.add(t)} for t in [1, 2]}
+        self.scenarios["rain_humid"] = {
+            WeatherVariable.RAINFALL: lambda wd: wd.scale(wd.expand_monthly(np.linspace(0.5, 1.5, 12))),
+            WeatherVariable.RELATIVE_HUMIDITY: lambda wd: wd.clip(upper=0.9)}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def test_write_scenarios(self):
+        manifest = write_scenarios(base=self.base, scenarios=self.scenarios, dir_path=self.test_dir, share="hardlink")
+        self.assertEqual(list(manifest), ["base", "temp_1", "temp_2", "rain_humid"])
+        saved = json.loads(self.test_dir.joinpath("manifest.json").read_text())
+        self.assertEqual(saved["temp_1"]["airtemp"], manifest["temp_1"][WeatherVariable.AIR_TEMPERATURE])
+
+        base_files = manifest["base"]
+        for name in ["temp_1", "temp_2"]:
+            files = manifest[name]
+            self.assertEqual(Path(files[WeatherVariable.AIR_TEMPERATURE]).parent, self.test_dir.joinpath(name))
+            # Unchanged variables are hardlinked to base files.
+            for v in [WeatherVariable.RAINFALL, WeatherVariable.RELATIVE_HUMIDITY, WeatherVariable.LAND_TEMPERATURE]:
+                self.assertTrue(os.path.samefile(files[v], base_files[v]))
+                self.assertTrue(os.path.samefile(f"{files[v]}.json", f"{base_files[v]}.json"))
+
+        ws = WeatherSet.from_files(dir_path=self.test_dir.joinpath("temp_2"))
+        air_temp = WeatherVariable.AIR_TEMPERATURE
+        for n in self.base[air_temp].metadata.nodes:
+            self.assertTrue(np.array_equal(ws[air_temp].get_series(n), self.base[air_temp].get_series(n) + 2))
+
+        ws = WeatherSet.from_files(dir_path=self.test_dir.joinpath("rain_humid"))
+        ws.validate()
+        self.assertLessEqual(ws[WeatherVariable.RELATIVE_HUMIDITY].data.max(), 0.9)
+
+        # Base weather set is not modified.
+        self.assertEqual(self.base, WeatherSet.from_files(dir_path=self.dtk_dir_all))
+
+    def test_write_scenarios_reference(self):
+        manifest = write_scenarios(base=self.base, scenarios=self.scenarios, dir_path=self.test_dir,
+                                   share="reference", max_workers=4)
+        self.assertEqual(manifest["temp_1"][WeatherVariable.RAINFALL], manifest["base"][WeatherVariable.RAINFALL])
+        self.assertEqual(len(list(self.test_dir.joinpath("temp_1").glob("*.bin"))), 1)
+        self.assertEqual(len(list(self.test_dir.joinpath("rain_humid").glob("*.bin"))), 2)
+
+    def test_write_scenarios_copy(self):
+        manifest = write_scenarios(base=self.base, scenarios=self.scenarios, dir_path=self.test_dir)
+        rain_files = [manifest[n][WeatherVariable.RAINFALL] for n in ["base", "temp_1"]]
+        self.assertFalse(os.path.samefile(*rain_files))
+        self.assertEqual(Path(rain_files[0]).read_bytes(), Path(rain_files[1]).read_bytes())
+
+    def test_write_scenarios_hardlink_overwrite(self):
+        manifest = write_scenarios(base=self.base, scenarios=self.scenarios, dir_path=self.test_dir, share="hardlink")
+        base_file, linked_file = [manifest[n][WeatherVariable.RAINFALL] for n in ["base", "temp_1"]]
+        base_bytes = Path(base_file).read_bytes()
+        self.assertTrue(os.path.samefile(base_file, linked_file))
+
+        # Overwriting a hardlinked scenario file replaces it, so the base file is not modified.
+        WeatherData.from_file(linked_file).add(10).to_file(linked_file)
+        self.assertFalse(os.path.samefile(base_file, linked_file))
+        self.assertEqual(Path(base_file).read_bytes(), base_bytes)
+        self.assertEqual(WeatherData.from_file(base_file), self.base[WeatherVariable.RAINFALL])
+        base_wd, linked_wd = self.base[WeatherVariable.RAINFALL], WeatherData.from_file(linked_file)
+        for n in base_wd.metadata.nodes:
+            self.assertTrue(np.array_equal(linked_wd.get_series(n), base_wd.get_series(n) + 10))
+
+    def test_write_scenarios_invalid(self):
+        humidity = WeatherVariable.RELATIVE_HUMIDITY
+        for kwargs in [dict(share="symlink"),
+                       dict(scenarios={"base": {}}),
+                       dict(scenarios={"a/b": {}}),
+                       dict(scenarios={"short": {humidity: lambda wd: wd.slice_steps(0, 2)}}),
+                       dict(scenarios={"subset": {humidity: lambda wd: wd.subset(wd.metadata.nodes[:1])}})]:
+            kwargs = {"scenarios": self.scenarios, **kwargs}
+            with self.assertRaises(ValueError):
+                write_scenarios(base=self.base, dir_path=self.test_dir, **kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
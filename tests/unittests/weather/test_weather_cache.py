@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+from idmtools_platform_comps.comps_platform import COMPSPlatform
+
+from emodpy_malaria.weather import *
+
+
+class FakeAsset:
+    """Local stand-in for a COMPS asset, writing fixed content on download."""
+
+    def __init__(self, filename: str, content: bytes = b"weather"):
+        self.filename = filename
+        self.content = content
+        self.download_count = 0
+
+    def download_to_path(self, dest: str, force: bool = False):
+        self.download_count += 1
+        Path(dest).write_bytes(self.content)
+
+
+def make_platform():
+    platform = mock.MagicMock(spec=COMPSPlatform)
+    platform.endpoint = "https://comps.idmod.org"
+    return platform
+
+
+def make_work_item(asset_collection_id: str = "18124c48-1fa1-ec11-92e7-f0921c167864"):
+    work_item = mock.MagicMock()
+    comps_wi = work_item.get_platform_object.return_value
+    comps_wi.get_related_asset_collections.return_value = [mock.MagicMock(id=asset_collection_id)]
+    return work_item
+
+
+class WeatherCacheTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.current_dir: Path = Path(__file__).parent
+        self.sites_csv: Path = self.current_dir.joinpath("ssmt/sites.csv")
+        self.test_dir: Path = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        self.cache = WeatherCache(cache_dir=self.test_dir.joinpath("cache"))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def make_request(self, local_dir: str) -> WeatherRequest:
+        return WeatherRequest(platform=make_platform(), local_dir=str(self.test_dir.joinpath(local_dir)),
+                              cache=self.cache)
+
+    def make_files(self, dir_name: str, sizes):
+        dir_path = self.test_dir.joinpath(dir_name)
+        dir_path.mkdir()
+        files = []
+        for i, size in enumerate(sizes):
+            f = dir_path.joinpath(f"file_{i}.bin")
+            f.write_bytes(b"x" * size)
+            files.append(f)
+
+        return files
+
+    def test_key(self):
+        wa1 = WeatherArgs(site_file=self.sites_csv, start_date=2015, node_column="nodes")
+        # The same site file content, under a different name.
+        sites_copy = self.test_dir.joinpath("sites_copy.csv")
+        shutil.copy(self.sites_csv, sites_copy)
+        wa2 = WeatherArgs(site_file=sites_copy, start_date=2015, node_column="nodes")
+        wa3 = WeatherArgs(site_file=self.sites_csv, start_date=2016, node_column="nodes")
+
+        self.assertEqual(WeatherCache.key(wa1, "ERA5"), WeatherCache.key(wa2, "ERA5"))
+        self.assertNotEqual(WeatherCache.key(wa1, "ERA5"), WeatherCache.key(wa3, "ERA5"))
+        self.assertNotEqual(WeatherCache.key(wa1, "ERA5"), WeatherCache.key(wa1, "Other"))
+
+    def test_put_get(self):
+        files = self.make_files("src", [10, 20])
+        self.assertIsNone(self.cache.get("abc", self.test_dir.joinpath("dst")))
+
+        self.cache.put("abc", files)
+        actual = self.cache.get("abc", self.test_dir.joinpath("dst"))
+        self.assertEqual([Path(f).name for f in actual], [f.name for f in files])
+        for f, a in zip(files, actual):
+            self.assertEqual(f.read_bytes(), Path(a).read_bytes())
+
+        self.assertEqual(self.cache.size, 30)
+
+    def test_get_copies_by_default(self):
+        files = self.make_files("src", [10])
+        self.cache.put("abc", files)
+        actual, = self.cache.get("abc", self.test_dir.joinpath("dst"))
+        self.assertFalse(os.path.samefile(actual, self.cache.cache_dir.joinpath("abc", files[0].name)))
+
+    def test_get_modified_entry(self):
+        files = self.make_files("src", [10])
+        metadata_file = files[0].parent.joinpath(f"{files[0].name}.json")
+        metadata_file.write_text("{}")
+        cache = WeatherCache(cache_dir=self.test_dir.joinpath("cache"), hardlink=True)
+        cache.put("abc", files + [metadata_file])
+        actual = cache.get("abc", self.test_dir.joinpath("dst"))
+        self.assertIsNotNone(actual)
+
+        # Modify the hardlinked file in place, the modified entry is not used again.
+        with open(actual[0], "r+b") as file:
+            file.write(b"y")
+        self.assertIsNone(cache.get("abc", self.test_dir.joinpath("dst2")))
+        self.assertFalse(cache.cache_dir.joinpath("abc").exists())
+
+    def test_lru_eviction(self):
+        cache = WeatherCache(cache_dir=self.test_dir.joinpath("cache"), max_size=250)
+        cache.put("a", self.make_files("a", [100]))
+        cache.put("b", self.make_files("b", [100]))
+        # Make "a" most recently used, then add "c" which requires one entry to be evicted.
+        entry_a, entry_b = [cache.cache_dir.joinpath(k, "entry.json") for k in ["a", "b"]]
+        os.utime(entry_a, (100, 100))
+        os.utime(entry_b, (50, 50))
+        cache.get("a", self.test_dir.joinpath("dst"))
+
+        cache.put("c", self.make_files("c", [100]))
+        self.assertIsNotNone(cache.get("a", self.test_dir.joinpath("dst")))
+        self.assertIsNone(cache.get("b", self.test_dir.joinpath("dst")))
+        self.assertIsNotNone(cache.get("c", self.test_dir.joinpath("dst")))
+        self.assertEqual(cache.size, 200)
+
+    @mock.patch.object(WeatherRequest, "_init_work_item")
+    @mock.patch.object(WeatherRequest, "_fetch_asset_collection")
+    def test_request_cache_hit_skips_platform(self, fetch_mock, init_mock):
+        wa = WeatherArgs(site_file=self.sites_csv, start_date=2015, node_column="nodes")
+
+        # First request: cache miss, work item is run and downloaded files are cached.
+        init_mock.return_value = make_work_item()
+        wr1 = self.make_request("weather1")
+        fetch_mock.return_value = [FakeAsset(Path(f).name, content=Path(f).name.encode()) for f in wr1.files]
+        wr1.generate(weather_args=wa).download()
+        self.assertEqual(wr1.report.cache, "miss")
+        self.assertEqual(init_mock.call_count, 1)
+        init_mock.return_value.run.assert_called_once()
+        self.assertTrue(wr1.files_exist)
+
+        # Second request: cache hit, files are placed into the local dir without running a work item.
+        init_mock.reset_mock()
+        fetch_mock.reset_mock()
+        wr2 = self.make_request("weather2")
+        wr2.generate(weather_args=wa).download()
+        self.assertEqual(wr2.report.cache, "hit")
+        init_mock.assert_not_called()
+        fetch_mock.assert_not_called()
+        self.assertEqual(len(wr2.report.download["skip"]), len(wr2.files))
+        for f1, f2 in zip(wr1.files, wr2.files):
+            self.assertEqual(Path(f1).read_bytes(), Path(f2).read_bytes())
+
+        # Different dates: cache miss.
+        init_mock.return_value = make_work_item()
+        wr3 = self.make_request("weather3")
+        wr3.generate(weather_args=WeatherArgs(site_file=self.sites_csv, start_date=2016, node_column="nodes"))
+        self.assertEqual(wr3.report.cache, "miss")
+        init_mock.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
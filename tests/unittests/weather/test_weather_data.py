@@ -6,11 +6,18 @@ import unittest
 
 from pathlib import Path
 from typing import Dict, List
+from unittest import mock
 
-from emodpy_malaria.weather.weather_metadata import WeatherMetadata, WeatherAttributes
+from emodpy_malaria.weather.weather_metadata import WeatherMetadata, WeatherAttributes, WeatherValidationError
 from emodpy_malaria.weather.weather_data import WeatherData, DataFrameInfo
+from emodpy_malaria.weather.weather_utils import unique_series
 from test_weather_metadata import read_metafile
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 
 class WeatherDataTests(unittest.TestCase):
 
@@ -101,6 +108,62 @@ class WeatherDataTests(unittest.TestCase):
         self.assertEqual(wd.data.shape, (wm.series_count, wm.series_len))
         self.assertTrue(np.array_equal(expected_data, wd.data.reshape(-1)))
 
+    def test_data_read_mmap(self):
+        wd1: WeatherData = WeatherData.from_file(self.case_dtk_data_file)
+        wd2: WeatherData = WeatherData.from_file(self.case_dtk_data_file, mmap=True)
+
+        self.assertIsInstance(wd2.data, np.memmap)
+        self.assertEqual(wd1, wd2)
+        for node_id in wd1.metadata.nodes:
+            self.assertTrue(np.array_equal(wd1.get_series(node_id), wd2.get_series(node_id)))
+
+        data_dict = wd2.to_dict(copy_data=False)
+        self.assertTrue(np.array_equal(list(data_dict.values())[0], wd1.to_dict()[list(data_dict)[0]]))
+
+    def test_validate(self):
+        data = np.array([[1, 2, 3], [4, np.nan, np.inf]], dtype=np.float32)
+        wm = WeatherMetadata(node_ids={10: 0, 20: 4, 30: 0}, series_len=3, validate=False)
+        with self.assertRaises(WeatherValidationError) as cm:
+            WeatherData(data=data, metadata=wm)
+
+        # All failures are reported at once.
+        errors = cm.exception.errors
+        self.assertEqual(len(errors), 3)
+        self.assertIn("offsets distance", errors[0])
+        self.assertIn("not aligned", errors[1])
+        self.assertIn("1 'NaN' and 1 'inf'", errors[2])
+
+        wd = WeatherData(data=data, metadata=wm, validate=False)
+        with self.assertRaises(WeatherValidationError) as cm:
+            wd.validate(values=False)
+        self.assertEqual(len(cm.exception.errors), 2)
+
+        wm = WeatherMetadata(node_ids={10: 0, 20: 12, 30: 36}, series_len=3)
+        with self.assertRaisesRegex(WeatherValidationError, "outside of data"):
+            WeatherData(data=np.ones((3, 3), dtype=np.float32), metadata=wm)
+
+    def test_data_read_no_validation(self):
+        wd1 = WeatherData.from_file(self.case_dtk_data_file)
+        wd2 = WeatherData.from_file(self.case_dtk_data_file, validate=False)
+        self.assertEqual(wd1, wd2)
+
+    def test_edit_file_mmap(self):
+        shutil.copy2(self.case_dtk_data_file, self.test_data_file)
+        shutil.copy2(self.case_dtk_meta_file, self.test_meta_file)
+        expected_bin = read_bin(self.test_data_file)
+
+        new_data_value = 1012
+        wd: WeatherData = WeatherData.from_file(self.test_data_file, mmap=True)
+        wd.data[1, 2] = new_data_value
+
+        # Edits are copy-on-write, the file is not changed until saved.
+        self.assertTrue(np.array_equal(read_bin(self.test_data_file), expected_bin))
+
+        wd.to_file(self.test_data_file)
+        actual_bin = read_bin(self.test_data_file).reshape(wd.data.shape)
+        self.assertEqual(actual_bin[1, 2], new_data_value)
+        self.assertTrue(np.array_equal(actual_bin, wd.data))
+
     def test_to_dict(self):
         wd1 = WeatherData.from_dict(node_series=self.repeated_node_series)
         data_dict1 = wd1.to_dict()
@@ -123,6 +186,36 @@ class WeatherDataTests(unittest.TestCase):
 
         self.assertSequenceEqual(wd1.metadata.nodes, wd2.metadata.nodes)
 
+    def test_from_dict_unique_series_order(self):
+        node_series = {
+            30: [7., 8., 9.],
+            10: [1., 2., 3.],
+            20: [7., 8., 9.],
+            40: [1., 2., 3.],
+            50: [4., 5., 6.],
+        }
+        wd = WeatherData.from_dict(node_series=node_series)
+
+        # Unique series are stored in order of first appearance, nodes are sorted.
+        expected_data = np.array([[7., 8., 9.], [1., 2., 3.], [4., 5., 6.]], dtype=np.float32)
+        self.assertTrue(np.array_equal(wd.data, expected_data))
+        self.assertEqual(wd.metadata.node_offsets, {10: 12, 20: 0, 30: 0, 40: 12, 50: 24})
+
+    def test_unique_series(self):
+        series = np.array([[1, 2], [3, 4], [1, 2], [5, 6], [3, 4]], dtype=np.float32)
+        unique_idx, inverse = unique_series(series)
+        self.assertSequenceEqual(unique_idx.tolist(), [0, 1, 3])
+        self.assertSequenceEqual(inverse.tolist(), [0, 1, 0, 2, 1])
+        self.assertTrue(np.array_equal(series[unique_idx][inverse], series))
+
+    def test_unique_series_hash_collisions(self):
+        series = np.array([[1, 2], [3, 4], [1, 2], [5, 6], [3, 4]], dtype=np.float32)
+        # All rows have the same hash, so rows are grouped by comparing their bytes.
+        with mock.patch("emodpy_malaria.weather.weather_utils._row_hashes", return_value=np.zeros(5, np.uint64)):
+            unique_idx, inverse = unique_series(series, chunk_size=2)
+        self.assertSequenceEqual(unique_idx.tolist(), [0, 1, 3])
+        self.assertSequenceEqual(inverse.tolist(), [0, 1, 0, 2, 1])
+
     def test_from_dict_with_metadata(self):
         # Specify node ids and weather time series
         data = {
@@ -201,6 +294,26 @@ class WeatherDataTests(unittest.TestCase):
 
         return wd
 
+    def test_from_dataframe_unsorted(self):
+        df = read_df(self.csv_path)
+        wd1 = WeatherData.from_dataframe(df)
+        wd2 = WeatherData.from_dataframe(df.sample(frac=1, random_state=1))
+        self.assertEqual(wd1.metadata.node_offsets, wd2.metadata.node_offsets)
+        self.assertTrue(np.array_equal(wd1.data, wd2.data))
+
+    def test_from_dataframe_irregular_steps(self):
+        df_all = pd.DataFrame({"nodes": [1, 1, 1, 2, 2, 2],
+                               "steps": [1, 2, 3, 1, 2, 3],
+                               "values": [1., 2., 3., 4., 5., 6.]})
+        WeatherData.from_dataframe(df_all)
+
+        # Missing step, different steps, duplicated steps and gapped steps.
+        for steps in [[1, 2, 3, 1, 2], [1, 2, 3, 1, 2, 4], [1, 2, 3, 1, 2, 2], [1, 2, 4, 1, 2, 4]]:
+            df = df_all[:len(steps)].copy()
+            df["steps"] = steps
+            with self.assertRaises(ValueError):
+                WeatherData.from_dataframe(df)
+
     def test_to_csv(self):
         expected_csv_path = str(self.current_dir.joinpath("case_csv/data.csv"))
         expected_df = read_df(expected_csv_path)
@@ -216,6 +329,21 @@ class WeatherDataTests(unittest.TestCase):
         actual_df = read_df(actual_csv_path)
         self.assertTrue(expected_df.equals(actual_df))
 
+    def test_to_csv_chunks(self):
+        wd = WeatherData.from_file(self.case_dtk_data_file)
+        expected_csv_path = Path(self.test_dir).joinpath("expected.csv")
+        actual_csv_path = Path(self.test_dir).joinpath("actual.csv")
+        wd.to_csv(expected_csv_path)
+        for chunk_size in [1, wd.metadata.series_len * 3 + 1, 10 ** 9]:
+            self.assertIsNone(wd.to_csv(actual_csv_path, chunk_size=chunk_size))
+            self.assertEqual(expected_csv_path.read_text(), actual_csv_path.read_text())
+
+        info = DataFrameInfo(only_unique_series=True)
+        wd.to_csv(expected_csv_path, info=info)
+        wd.to_csv(actual_csv_path, info=info, chunk_size=100)
+        self.assertEqual(expected_csv_path.read_text(), actual_csv_path.read_text())
+        self.assertEqual(len(pd.read_csv(actual_csv_path)), wd.metadata.series_unique_count * wd.metadata.series_len)
+
     def test_from_csv(self):
         df = read_df(self.csv_path)
         values = np.array(df["data"])
@@ -225,6 +353,140 @@ class WeatherDataTests(unittest.TestCase):
         expected_values = values.reshape(-1)[:len(actual_values)]
         self.assertTrue(np.array_equal(expected_values, actual_values))
 
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_to_from_parquet(self):
+        wd1 = WeatherData.from_file(self.case_dtk_data_file)
+        parquet_path = Path(self.test_dir).joinpath("data.parquet")
+        info = DataFrameInfo(value_column="airtemp")
+        df = wd1.to_parquet(parquet_path, info=info)
+        self.assertEqual(pd.read_parquet(parquet_path)["airtemp"].dtype, np.float32)
+
+        wd2 = WeatherData.from_parquet(parquet_path, info=info, attributes=wd1.metadata.attributes)
+        self.assertTrue(np.array_equal(wd1.data, wd2.data))
+        self.assertEqual(wd1.metadata.node_offsets, wd2.metadata.node_offsets)
+
+        # Read a subset of nodes, with and without specifying columns.
+        node_ids = wd1.metadata.nodes[1:3]
+        for wd3 in [WeatherData.from_parquet(parquet_path, info=info, node_ids=node_ids),
+                    WeatherData.from_parquet(parquet_path, node_ids=node_ids)]:
+            self.assertEqual(wd3.metadata.nodes, node_ids)
+            for n in node_ids:
+                self.assertTrue(np.array_equal(wd3.get_series(n), wd1.get_series(n)))
+
+    def test_subset(self):
+        wd = WeatherData.from_dict(node_series={10: [1, 2, 3], 20: [4, 5, 6], 30: [1, 2, 3], 40: [7, 8, 9]})
+        wd2 = wd.subset([30, 40, 10])
+        self.assertEqual(wd2.metadata.node_offsets, {10: 0, 30: 0, 40: 12})
+        self.assertTrue(np.array_equal(wd2.data, np.array([[1, 2, 3], [7, 8, 9]], dtype=np.float32)))
+
+        with self.assertRaises(KeyError):
+            wd.subset([10, 50])
+
+    def test_extract_nodes(self):
+        from emodpy_malaria.weather import extract_nodes
+        wd1 = WeatherData.from_file(self.case_dtk_data_file)
+        node_ids = wd1.metadata.nodes[::2]
+        wd2 = extract_nodes(self.case_dtk_data_file, self.test_data_file, node_ids=node_ids)
+        wd3 = WeatherData.from_file(self.test_data_file)
+
+        self.assertEqual(wd2, wd3)
+        self.assertEqual(wd3.metadata.nodes, sorted(node_ids))
+        self.assertEqual(wd3.metadata.attributes.provenance, wd1.metadata.attributes.provenance)
+        self.assertLessEqual(wd3.metadata.series_unique_count, len(node_ids))
+        for n in node_ids:
+            self.assertTrue(np.array_equal(wd3.get_series(n), wd1.get_series(n)))
+
+    def test_slice_steps(self):
+        wd = WeatherData.from_dict(node_series={10: [1, 2, 3, 4], 20: [5, 2, 3, 6], 30: [1, 2, 3, 4]})
+        wd2 = wd.slice_steps(1, 3)
+        self.assertEqual(wd2.metadata.series_len, 2)
+        self.assertEqual(wd2.metadata.attributes_dict["DatavalueCount"], 2)
+        # All nodes have the same series after slicing.
+        self.assertEqual(wd2.metadata.node_offsets, {10: 0, 20: 0, 30: 0})
+        self.assertTrue(np.array_equal(wd2.data, np.array([[2, 3]], dtype=np.float32)))
+
+        wd3 = wd.slice_steps(stop=-1)
+        self.assertEqual(wd3.metadata.node_offsets, {10: 0, 20: 12, 30: 0})
+        self.assertTrue(np.array_equal(wd3.get_series(20), np.array([5, 2, 3], dtype=np.float32)))
+
+        with self.assertRaises(ValueError):
+            wd.slice_steps(3, 3)
+
+    def test_resample(self):
+        wd = WeatherData.from_dict(node_series={10: [1, 2, 3, 4, 5], 20: [2, 1, 4, 3, 5], 30: [1, 1, 1, 1, 1]})
+        wd2 = wd.resample(2, how="sum")
+        self.assertEqual(wd2.metadata.series_len, 3)
+        self.assertEqual(wd2.metadata.node_offsets, {10: 0, 20: 0, 30: 12})
+        self.assertTrue(np.array_equal(wd2.get_series(10), np.array([3, 7, 5], dtype=np.float32)))
+        self.assertTrue(np.array_equal(wd2.get_series(30), np.array([2, 2, 1], dtype=np.float32)))
+
+        wd3 = wd.resample(2)
+        self.assertTrue(np.array_equal(wd3.get_series(10), np.array([1.5, 3.5, 5], dtype=np.float32)))
+        self.assertTrue(np.array_equal(wd3.get_series(30), np.array([1, 1, 1], dtype=np.float32)))
+
+        wd4 = wd.resample(5)
+        self.assertEqual(wd4.metadata.series_len, 1)
+        self.assertTrue(np.array_equal(wd4.get_series(20), np.array([3], dtype=np.float32)))
+
+        for factor, how in [(0, "mean"), (2, "max")]:
+            with self.assertRaises(ValueError):
+                wd.resample(factor, how=how)
+
+    def test_add_scale(self):
+        wd = WeatherData.from_dict(node_series={10: [1, 2, 3], 20: [4, 5, 6], 30: [1, 2, 3]})
+        self.assertIs(wd.add(1).scale([1, 2, 3]), wd)
+        self.assertEqual(wd.metadata.series_unique_count, 2)
+        self.assertTrue(np.array_equal(wd.get_series(10), np.array([2, 6, 12], dtype=np.float32)))
+        self.assertTrue(np.array_equal(wd.get_series(20), np.array([5, 12, 21], dtype=np.float32)))
+
+        with self.assertRaises(ValueError):
+            wd.add([1, 2])
+
+    def test_add_per_node(self):
+        wd = WeatherData.from_dict(node_series={10: [1, 2, 3], 20: [4, 5, 6], 30: [1, 2, 3], 40: [1, 2, 3]})
+        # Node 30 shares the series with 10 and 40, so the series is split.
+        wd.add({30: 10, 20: [-3, -3, -3]})
+        self.assertEqual(wd.metadata.series_unique_count, 2)
+        self.assertEqual(wd.metadata.node_offsets[10], wd.metadata.node_offsets[20])
+        self.assertTrue(np.array_equal(wd.get_series(40), np.array([1, 2, 3], dtype=np.float32)))
+        self.assertTrue(np.array_equal(wd.get_series(30), np.array([11, 12, 13], dtype=np.float32)))
+        self.assertEqual(wd, WeatherData.from_dict(wd.to_dict()))
+
+        with self.assertRaises(KeyError):
+            wd.scale({50: 2})
+
+    def test_clip(self):
+        wd = WeatherData.from_dict(node_series={10: [-1, 0.5, 2], 20: [0, 0.5, 1]})
+        wd.clip(lower=0, upper=1)
+        # Series became identical and are deduplicated.
+        self.assertEqual(wd.metadata.node_offsets, {10: 0, 20: 0})
+        self.assertTrue(np.array_equal(wd.data, np.array([[0, 0.5, 1]], dtype=np.float32)))
+
+        with self.assertRaises(ValueError):
+            wd.clip()
+
+    def test_expand_monthly(self):
+        wd = WeatherData.from_dict(node_series={10: np.zeros(730)})
+        monthly = wd.expand_monthly(np.arange(1, 13))
+        self.assertEqual(len(monthly), 730)
+        self.assertEqual(monthly[30], 1)
+        self.assertEqual(monthly[31], 2)
+        self.assertEqual(monthly[364], 12)
+        self.assertEqual(monthly[365], 1)
+
+        wd.metadata.update({"StartDayOfYear": 32})
+        self.assertEqual(wd.expand_monthly(np.arange(1, 13))[0], 2)
+
+        wd.add(monthly)
+        self.assertTrue(np.array_equal(wd.get_series(10), monthly))
+
+    def test_copy(self):
+        wd1 = WeatherData.from_file(self.case_dtk_data_file, mmap=True)
+        wd2 = wd1.copy().scale(2)
+        self.assertNotIsInstance(wd2.data, np.memmap)
+        self.assertTrue(np.array_equal(wd1.data * 2, wd2.data))
+        self.assertEqual(wd1.metadata.node_offsets, wd2.metadata.node_offsets)
+
     def test_edit_file(self):
         wd: WeatherData = WeatherData.from_file(self.case_dtk_data_file)
         wm = wd.metadata
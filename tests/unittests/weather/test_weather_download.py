@@ -0,0 +1,140 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+from emodpy_malaria.weather import *
+
+from test_weather_cache import FakeAsset, make_platform
+
+
+class SlowFakeAsset(FakeAsset):
+    """Fake asset which takes time to download and fails the first 'fail_count' attempts."""
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self, filename: str, delay: float = 0.0, fail_count: int = 0):
+        super().__init__(filename, content=filename.encode())
+        self.delay = delay
+        self.fail_count = fail_count
+        self.attempts = 0
+
+    def download_to_path(self, dest: str, force: bool = False):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            time.sleep(self.delay)
+            self.attempts += 1
+            if self.attempts <= self.fail_count:
+                Path(dest).write_bytes(b"partial")
+                raise ConnectionError("Connection reset")
+
+            super().download_to_path(dest, force)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+class WeatherDownloadTests(unittest.TestCase):
+    asset_collection_id = "18124c48-1fa1-ec11-92e7-f0921c167864"
+
+    def setUp(self) -> None:
+        self.test_dir: Path = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        self.wr = WeatherRequest(platform=make_platform(), local_dir=str(self.test_dir))
+        SlowFakeAsset.active = SlowFakeAsset.max_active = 0
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def download(self, assets, **kwargs):
+        with mock.patch.object(WeatherRequest, "_fetch_asset_collection", return_value=assets):
+            self.wr._asset_file_tuples = None
+            return self.wr.download(data_id=self.asset_collection_id, **kwargs).report.download
+
+    def make_assets(self, **kwargs):
+        return [SlowFakeAsset(Path(f).name, **kwargs) for f in self.wr.files]
+
+    def test_download_parallel(self):
+        assets = self.make_assets(delay=0.2)
+        start = time.perf_counter()
+        report = self.download(assets, max_workers=len(assets))
+        duration = time.perf_counter() - start
+
+        self.assertEqual(len(report["ok"]), len(assets))
+        self.assertGreater(SlowFakeAsset.max_active, 1)
+        self.assertLess(duration, 0.2 * len(assets))
+        for a, f in zip(assets, report["ok"]):
+            self.assertEqual(Path(f).read_bytes(), a.filename.encode())
+
+        # Files exist, so a second download is skipped unless forced.
+        self.assertEqual(len(self.download(assets)["skip"]), len(assets))
+        self.assertEqual(len(self.download(assets, force=True)["ok"]), len(assets))
+
+    def test_download_max_workers(self):
+        assets = self.make_assets(delay=0.05)
+        report = self.download(assets, max_workers=2)
+        self.assertEqual(len(report["ok"]), len(assets))
+        self.assertLessEqual(SlowFakeAsset.max_active, 2)
+
+    def test_download_retry(self):
+        assets = self.make_assets(fail_count=2)
+        with mock.patch("time.sleep") as sleep_mock:
+            report = self.download(assets, retries=2, backoff=0.5)
+
+        self.assertEqual(len(report["ok"]), len(assets))
+        self.assertIn(mock.call(0.5), sleep_mock.call_args_list)
+        self.assertIn(mock.call(1.0), sleep_mock.call_args_list)
+        self.assertEqual(sorted(p.name for p in self.test_dir.glob("*.bin*")), sorted(a.filename for a in assets))
+
+    def test_download_fail(self):
+        assets = self.make_assets()
+        assets[0].fail_count = 10
+        report = self.download(assets, retries=1, backoff=0)
+
+        self.assertEqual(report["fail"], [str(self.test_dir.joinpath(assets[0].filename))])
+        self.assertEqual(len(report["ok"]), len(assets) - 1)
+        self.assertEqual(list(self.wr.report.errors), report["fail"])
+        self.assertIn("ConnectionError", self.wr.report.errors[report["fail"][0]])
+        # No partial or temp files are left.
+        self.assertFalse(self.test_dir.joinpath(assets[0].filename).exists())
+        self.assertEqual(len(list(self.test_dir.glob("*.bin*"))), len(assets) - 1)
+
+    def test_download_error_not_retried(self):
+        assets = self.make_assets()
+        assets[0].download_to_path = mock.MagicMock(side_effect=TypeError("unexpected argument"))
+        report = self.download(assets, retries=3, backoff=0.5)
+
+        # The error is not retried and doesn't affect other files.
+        self.assertEqual(assets[0].download_to_path.call_count, 1)
+        self.assertEqual(report["fail"], [str(self.test_dir.joinpath(assets[0].filename))])
+        self.assertEqual(len(report["ok"]), len(assets) - 1)
+        self.assertIn("TypeError: unexpected argument", self.wr.report.errors[report["fail"][0]])
+        self.assertFalse([f for f in self.test_dir.iterdir() if f.suffix == ".tmp"])
+
+    def test_download_stale(self):
+        assets = self.make_assets()
+        self.download(assets)
+        index_files = list(self.test_dir.glob("*.integrity.json"))
+        self.assertEqual(len(index_files), len(assets) // 2)
+        self.assertTrue(self.wr.files_exist)
+
+        # Truncate one downloaded file, only that file and its metadata are downloaded again.
+        bin_file = Path(self.wr.files[0])
+        bin_file.write_bytes(b"x")
+        self.assertFalse(self.wr.files_exist)
+        report = self.download(assets)
+        self.assertEqual(sorted(report["ok"]), sorted([str(bin_file), f"{bin_file}.json"]))
+        self.assertEqual(len(report["skip"]), len(assets) - 2)
+        self.assertEqual(bin_file.read_bytes(), bin_file.name.encode())
+        self.assertTrue(self.wr.files_exist)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+from emodpy_malaria.weather import *
+
+from test_weather_cache import make_platform, make_work_item
+
+
+class FakeWorkItem:
+    """Work item stand-in which finishes after a given number of status refreshes."""
+
+    def __init__(self, name: str, polls: int, succeeded: bool = True):
+        self.id = name
+        self.name = name
+        self.polls = polls
+        self.run_count = 0
+        self.done = False
+        self._succeeded = succeeded
+        self._platform_object = make_work_item(f"{name:0>36}").get_platform_object.return_value
+
+    @property
+    def succeeded(self):
+        return self.done and self._succeeded
+
+    def run(self, **kwargs):
+        self.run_count += 1
+
+    def refresh(self):
+        self.polls -= 1
+        self.done = self.polls <= 0
+
+    def get_platform_object(self, force=False):
+        return self._platform_object
+
+
+class WeatherGenerateTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.current_dir: Path = Path(__file__).parent
+        self.sites_csv: Path = self.current_dir.joinpath("ssmt/sites.csv")
+        self.test_dir: Path = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        self.platform = make_platform()
+        self.platform.refresh_status.side_effect = lambda wi: wi.refresh()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def make_requests(self, polls):
+        work_items = [FakeWorkItem(str(i), p) for i, p in enumerate(polls)]
+        requests = []
+        for i, wi in enumerate(work_items):
+            wr = WeatherRequest(platform=self.platform, local_dir=str(self.test_dir.joinpath(str(i))))
+            wr._init_work_item = mock.MagicMock(return_value=wi)
+            wa = WeatherArgs(site_file=self.sites_csv, start_date=2015 + i, node_column="nodes")
+            requests.append((wr, wa))
+
+        return requests, work_items
+
+    def test_generate_as_completed_order(self):
+        requests, work_items = self.make_requests(polls=[3, 1, 2])
+        with mock.patch("time.sleep"):
+            completed = list(generate_as_completed(requests, poll_interval=0))
+
+        # Yielded in the order of completion.
+        self.assertEqual([wr for wr, _ in requests].index(completed[0]), 1)
+        self.assertEqual([wr for wr, _ in requests].index(completed[1]), 2)
+        self.assertEqual([wr for wr, _ in requests].index(completed[2]), 0)
+        for wr, wi in zip([wr for wr, _ in requests], work_items):
+            self.assertEqual(wi.run_count, 1)
+            self.assertEqual(wr.data_id, f"{wi.id:0>36}")
+            self.assertEqual(wr.report.generate, "ok")
+
+    def test_generate_as_completed_concurrency_limit(self):
+        requests, work_items = self.make_requests(polls=[3, 3, 3, 3, 3])
+        running_counts = []
+
+        def count_running(seconds):
+            running_counts.append(sum(1 for wi in work_items if wi.run_count > 0 and not wi.done))
+
+        with mock.patch("time.sleep", side_effect=count_running) as sleep_mock:
+            completed = list(generate_as_completed(requests, max_concurrent=2, poll_interval=5))
+
+        self.assertEqual(len(completed), len(requests))
+        self.assertEqual(max(running_counts), 2)
+        sleep_mock.assert_called_with(5)
+
+    def test_generate_as_completed_failed(self):
+        requests, work_items = self.make_requests(polls=[1, 1])
+        work_items[0]._succeeded = False
+        with mock.patch("time.sleep"):
+            completed = list(generate_as_completed(requests, poll_interval=0))
+
+        self.assertEqual(len(completed), 2)
+        wr0 = requests[0][0]
+        self.assertIsNone(wr0.data_id)
+        self.assertEqual(wr0.report.generate, "fail")
+        self.assertEqual(requests[1][0].report.generate, "ok")
+
+    def test_generate_as_completed_no_asset_collection(self):
+        requests, work_items = self.make_requests(polls=[1, 2])
+        work_items[0]._platform_object.get_related_asset_collections.return_value = []
+        with mock.patch("time.sleep"):
+            completed = list(generate_as_completed(requests, poll_interval=0))
+
+        # The failed request is reported like any other failure, the other request still completes.
+        self.assertEqual(completed, [wr for wr, _ in requests])
+        wr0 = requests[0][0]
+        self.assertIsNone(wr0.data_id)
+        self.assertEqual(wr0.report.generate, "fail")
+        self.assertIsNone(wr0._collect())
+        self.assertEqual(requests[1][0].report.generate, "ok")
+
+    def test_generate_waits(self):
+        (wr, wa), = self.make_requests(polls=[1])[0]
+        wi = wr._init_work_item.return_value
+        wi.wait = mock.MagicMock(side_effect=wi.refresh)
+        self.assertIs(wr.generate(weather_args=wa), wr)
+        wi.wait.assert_called_once()
+        self.assertEqual(wr.data_id, f"{wi.id:0>36}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from emod_api.demographics.Demographics import Demographics
+from emod_api.demographics.Node import Node
+
+from emodpy_malaria.weather import *
+from emodpy_malaria.weather.weather_interpolation import interpolation_weights
+
+
+class WeatherInterpolationTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # 3 x 3 grid with 1 degree cells, where series values are linear functions of coordinates.
+        lats, lons = np.meshgrid([0., 1., 2.], [10., 11., 12.], indexing="ij")
+        self.grid = pd.DataFrame({"nodes": np.arange(1, 10), "lat": lats.reshape(-1), "lon": lons.reshape(-1)})
+        node_series = {n: [lat, lon, lat + lon] for n, lat, lon in self.grid.itertuples(index=False)}
+        wd = WeatherData.from_dict(node_series=node_series)
+        self.ws = WeatherSet()
+        self.ws[WeatherVariable.AIR_TEMPERATURE] = wd
+        self.ws[WeatherVariable.RAINFALL] = WeatherData.from_dict(node_series={n: [1., 1., 1.] for n in node_series})
+
+    @staticmethod
+    def make_demographics(coordinates):
+        nodes = [Node(lat=lat, lon=lon, pop=100, forced_id=i + 100) for i, (lat, lon) in enumerate(coordinates)]
+        return Demographics(nodes=nodes, idref="interpolation_test")
+
+    def assert_series(self, ws, node_id, expected, atol=1e-5):
+        actual = ws[WeatherVariable.AIR_TEMPERATURE].get_series(node_id)
+        self.assertTrue(np.allclose(actual, expected, atol=atol), f"{actual} != {expected}")
+
+    def test_nearest(self):
+        demog = self.make_demographics([(0.1, 10.2), (1.9, 11.6), (0.2, 9.9)])
+        ws = self.ws.interpolate_to_nodes(demog, grid=self.grid)
+        self.assert_series(ws, 100, [0, 10, 10])
+        self.assert_series(ws, 101, [2, 12, 14])
+
+        # Nodes 100 and 102 have the same nearest cell, so they share the series.
+        wd = ws[WeatherVariable.AIR_TEMPERATURE]
+        self.assertEqual(wd.metadata.node_offsets[100], wd.metadata.node_offsets[102])
+        self.assertEqual(wd.metadata.series_unique_count, 2)
+        self.assertEqual(ws[WeatherVariable.RAINFALL].metadata.series_unique_count, 1)
+
+    def test_bilinear(self):
+        demog = self.make_demographics([(0.25, 10.5), (1.5, 11.75), (5, 11.5), (1, 11)])
+        ws = self.ws.interpolate_to_nodes(demog, grid=self.grid, method="bilinear")
+        # Series values are linear in lat and lon, so bilinear interpolation is exact.
+        self.assert_series(ws, 100, [0.25, 10.5, 10.75])
+        self.assert_series(ws, 101, [1.5, 11.75, 13.25])
+        # Outside of the grid, values are taken from the grid edge.
+        self.assert_series(ws, 102, [2, 11.5, 13.5])
+        self.assert_series(ws, 103, [1, 11, 12])
+
+    def test_bilinear_missing_cells(self):
+        grid = self.grid[self.grid.nodes != 5]
+        demog = self.make_demographics([(0.5, 10.5), (1, 11)])
+        ws = self.ws.interpolate_to_nodes(demog, grid=grid, method="bilinear")
+        # One of 4 surrounding cells is missing, the weights of the other 3 are renormalized.
+        self.assert_series(ws, 100, [1 / 3, 31 / 3, 32 / 3])
+        # The only surrounding cell is missing, the value of the nearest cell is used.
+        series = ws[WeatherVariable.AIR_TEMPERATURE].get_series(101)
+        self.assertIn(tuple(series), [(0, 11, 11), (1, 10, 11), (1, 12, 13), (2, 11, 13)])
+
+    def test_idw(self):
+        demog = self.make_demographics([(0.5, 10.5), (1, 11)])
+        ws = self.ws.interpolate_to_nodes(demog, grid=self.grid, method="idw", k=4)
+        # Nearly equidistant from 4 cells (distances are on the sphere).
+        self.assert_series(ws, 100, [0.5, 10.5, 11], atol=1e-3)
+        # Exactly at a cell.
+        self.assert_series(ws, 101, [1, 11, 12])
+
+        indices, weights = interpolation_weights(self.grid.lat.values, self.grid.lon.values,
+                                                 np.array([0.1]), np.array([10.1]), method="idw", k=3)
+        self.assertEqual(indices.shape, (1, 3))
+        self.assertAlmostEqual(weights.sum(), 1)
+        self.assertEqual(indices[0, 0], 0)
+
+    def test_attributes(self):
+        demog = self.make_demographics([(0.25, 10.5), (1.5, 11.75)])
+        grid = {n: (lat, lon) for n, lat, lon in self.grid.itertuples(index=False)}
+        ws = self.ws.interpolate_to_nodes(demog, grid=grid, method="idw")
+        for wd in ws.values():
+            self.assertEqual(wd.metadata.id_reference, "interpolation_test")
+            self.assertEqual(wd.metadata.attributes_dict["BottomLatitude"], 0.25)
+            self.assertEqual(wd.metadata.attributes_dict["UpperLatitude"], 1.5)
+            self.assertEqual(wd.metadata.attributes_dict["LeftLongitude"], 10.5)
+            self.assertEqual(wd.metadata.attributes_dict["RightLongitude"], 11.75)
+            self.assertEqual(wd.metadata.nodes, [100, 101])
+
+    def test_invalid(self):
+        demog = self.make_demographics([(0.25, 10.5)])
+        with self.assertRaises(ValueError):
+            self.ws.interpolate_to_nodes(demog, grid=self.grid, method="cubic")
+
+        with self.assertRaises(KeyError):
+            self.ws.interpolate_to_nodes(demog, grid={99: (0, 0)})
+
+    def test_scaling(self):
+        """Interpolate 1e5 nodes from a 1 degree grid, which is expected to take seconds."""
+        lats, lons = np.meshgrid(np.arange(-10., 10.), np.arange(20., 40.), indexing="ij")
+        grid = pd.DataFrame({"nodes": np.arange(1, lats.size + 1), "lat": lats.reshape(-1), "lon": lons.reshape(-1)})
+        rng = np.random.default_rng(0)
+        wd = WeatherData.from_dict(node_series={n: rng.random(365) for n in grid.nodes})
+        ws = WeatherSet()
+        ws[WeatherVariable.AIR_TEMPERATURE] = wd
+
+        node_count = 100000
+        coordinates = np.column_stack([rng.uniform(-10, 9, node_count), rng.uniform(20, 39, node_count)])
+        demog = self.make_demographics(coordinates)
+        for method in ["nearest", "bilinear"]:
+            start = time.perf_counter()
+            ws2 = ws.interpolate_to_nodes(demog, grid=grid, method=method)
+            self.assertLess(time.perf_counter() - start, 60)
+            self.assertEqual(ws2[WeatherVariable.AIR_TEMPERATURE].metadata.node_count, node_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
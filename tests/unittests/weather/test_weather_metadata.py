@@ -6,7 +6,7 @@ import unittest
 from datetime import datetime
 from pathlib import Path
 
-from emodpy_malaria.weather import WeatherMetadata, WeatherAttributes
+from emodpy_malaria.weather import WeatherMetadata, WeatherAttributes, WeatherValidationError
 from emodpy_malaria.weather.weather_metadata import _META_ID_REFERENCE
 
 
@@ -90,6 +90,30 @@ class WeatherMetadataTests(unittest.TestCase):
             with self.assertRaises(ValueError):
                 wm: WeatherMetadata = WeatherMetadata(node_ids={1: offset}, series_len=3)
 
+    def test_metadata_validation_all_errors(self):
+        with self.assertRaises(WeatherValidationError) as cm:
+            WeatherMetadata(node_ids={0: 0, 2: -4, 3: 24}, series_len=3)
+
+        self.assertEqual(len(cm.exception.errors), 2)
+        self.assertIn("Node values", cm.exception.errors[0])
+        self.assertIn("Node offset values", cm.exception.errors[1])
+
+        with self.assertRaises(WeatherValidationError):
+            WeatherMetadata(node_ids={1: 0, 2: 24}, series_len=3)
+
+    def test_metadata_validation_declared_counts(self):
+        content = json.loads(Path(self.case_dtk_file).read_text())
+        content["Metadata"]["NodeCount"] += 1
+        self.test_file.write_text(json.dumps(content))
+        with self.assertRaises(WeatherValidationError) as cm:
+            WeatherMetadata.from_file(self.test_file)
+        self.assertIn("NodeCount", str(cm.exception))
+
+        # Validation is skipped and counts are reset based on node offsets.
+        wm = WeatherMetadata.from_file(self.test_file, validate=False)
+        self.assertEqual(wm.node_count, content["Metadata"]["NodeCount"] - 1)
+        self.assertEqual(wm.attributes_dict["NodeCount"], wm.node_count)
+
     def test_metadata_create_new_from_existing_node_list(self):
         wm1: WeatherMetadata = WeatherMetadata.from_file(self.case_dtk_file)
         wm2: WeatherMetadata = WeatherMetadata(series_len=wm1.datavalue_count,
@@ -143,6 +167,14 @@ class WeatherMetadataTests(unittest.TestCase):
 
         self.assertEqual(wm1.node_offset_str, wm2.node_offset_str)
 
+    def test_metadata_offsets_many_nodes(self):
+        node_count = 20000
+        wm = WeatherMetadata(node_ids=list(range(node_count, 0, -1)), series_len=365)
+        node_offsets = WeatherMetadata._convert_offset_str_to_dict(wm.node_offset_str)
+        self.assertEqual(node_offsets, wm.node_offsets)
+        self.assertEqual(wm.node_offsets[node_count], 0)
+        self.assertEqual(wm.node_offsets[1], (node_count - 1) * 365 * 4)
+
 
 def read_metafile(path):
     content = json.loads(Path(path).read_text())
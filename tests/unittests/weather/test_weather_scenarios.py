@@ -58,6 +58,10 @@ class WeatherScenariosTests(unittest.TestCase):
         df_expected = read_df(self.dtk_dir_all_csv)
         self.assertTrue(df_expected.equals(df_actual))
 
+        df_actual, wa = weather_to_csv(weather_dir=self.dtk_dir_all, csv_file=self.test_csv_file, chunk_size=10)
+        self.assertIsNone(df_actual)
+        self.assertTrue(df_expected.equals(read_df(self.test_csv_file)))
+
     def test_getting_started_readme_example(self):
         weather_dir, weather_dir2 = self.dtk_dir_all, self.test_dir
 
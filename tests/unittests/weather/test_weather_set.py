@@ -15,6 +15,11 @@ from emodpy_malaria.weather.weather_set import WeatherSet
 from test_weather_data import read_df, read_bin
 from test_weather_metadata import read_metafile
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 
 class WeatherSetTests(unittest.TestCase):
 
@@ -204,6 +209,29 @@ class WeatherSetTests(unittest.TestCase):
         df_expected = read_df(self.data_all_defaults_csv)
         self.assertTrue(df_expected.equals(df_actual))
 
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_to_from_parquet(self):
+        ws1 = WeatherSet.from_files(dir_path=self.dtk_dir_all)
+        parquet_path = self.test_dir.joinpath("data.parquet")
+        df = ws1.to_parquet(parquet_path)
+        attributes = ws1.values()[0].metadata.attributes
+
+        ws2 = WeatherSet.from_parquet(parquet_path, weather_columns=ws1.weather_columns, attributes=attributes)
+        # Compare per node content, since some of the original files contain duplicate series.
+        self.assertEqual(ws1.weather_variables, ws2.weather_variables)
+        self.assertTrue(df.equals(ws2.to_dataframe()))
+        self.assertTrue(df.equals(pd.read_parquet(parquet_path)))
+
+        # Read a subset of weather variables and nodes.
+        node_ids = ws1.values()[0].metadata.nodes[:2]
+        weather_columns = {WeatherVariable.RAINFALL: ws1.weather_columns[WeatherVariable.RAINFALL]}
+        ws3 = WeatherSet.from_parquet(parquet_path, weather_columns=weather_columns, node_ids=node_ids)
+        self.assertEqual(ws3.weather_variables, [WeatherVariable.RAINFALL])
+        wd1, wd3 = ws1[WeatherVariable.RAINFALL], ws3[WeatherVariable.RAINFALL]
+        self.assertEqual(wd3.metadata.nodes, node_ids)
+        for n in node_ids:
+            self.assertTrue(np.array_equal(wd3.get_series(n), wd1.get_series(n)))
+
     # Test from/to files
     def test_from_files(self):
         ws = WeatherSet.from_files(dir_path=self.dtk_dir_all)
@@ -242,12 +270,61 @@ class WeatherSetTests(unittest.TestCase):
             self.assertTrue(ff.stat().st_size == wd_expected.metadata.total_value_count*4)
             self.assertTrue(np.array_equal(wd_expected.data, wd_actual.data))
 
+    def test_parallel_same_as_sequential(self):
+        ws1 = WeatherSet.from_files(dir_path=self.dtk_dir_all)
+        ws2 = WeatherSet.from_files(dir_path=self.dtk_dir_all, max_workers=4)
+        self.assertEqual(ws1.weather_variables, ws2.weather_variables)
+        self.assertEqual(ws1, ws2)
+
+        df1 = ws1.to_dataframe()
+        df2 = ws2.to_dataframe(max_workers=4)
+        self.assertTrue(df1.equals(df2))
+
+        ws2.to_files(dir_path=self.test_dir, max_workers=4)
+        ws3 = WeatherSet.from_files(dir_path=self.test_dir)
+        self.assertEqual(ws1, ws3)
+
+        ws4 = WeatherSet.from_csv(file_path=self.data_all_csv,
+                                  node_column="node",
+                                  step_column="step",
+                                  weather_columns=self.data_all_csv_columns,
+                                  max_workers=4)
+        ws5 = WeatherSet.from_csv(file_path=self.data_all_csv,
+                                  node_column="node",
+                                  step_column="step",
+                                  weather_columns=self.data_all_csv_columns)
+        self.assertEqual(list(ws4.keys()), list(self.data_all_csv_columns))
+        self.assertEqual(ws4, ws5)
+
+    def test_transforms(self):
+        ws1 = WeatherSet.from_files(dir_path=self.dtk_dir_all)
+        ws2 = ws1.copy()
+        ws2.add({WeatherVariable.AIR_TEMPERATURE: 2}).scale({WeatherVariable.RAINFALL: 1.5})
+        ws2.clip({WeatherVariable.RELATIVE_HUMIDITY: (None, 0.5)})
+
+        for n in ws1[WeatherVariable.AIR_TEMPERATURE].metadata.nodes:
+            self.assertTrue(np.array_equal(ws1[WeatherVariable.AIR_TEMPERATURE].get_series(n) + 2,
+                                           ws2[WeatherVariable.AIR_TEMPERATURE].get_series(n)))
+            self.assertTrue(np.array_equal(ws1[WeatherVariable.RAINFALL].get_series(n) * np.float32(1.5),
+                                           ws2[WeatherVariable.RAINFALL].get_series(n)))
+
+        self.assertLessEqual(ws2[WeatherVariable.RELATIVE_HUMIDITY].data.max(), 0.5)
+        self.assertEqual(ws1[WeatherVariable.LAND_TEMPERATURE], ws2[WeatherVariable.LAND_TEMPERATURE])
+        ws2.validate()
+
     def test_load_fail_diff_resolution(self):
         """Tests validation of attributes which must be the same in all files in a weather set."""
         with self.assertRaises(AssertionError):
             # This fails because this dir contains files of different resolution.
             ws = WeatherSet.from_files(dir_path=self.dtk_dir)
 
+    def test_to_csv_chunks(self):
+        ws = WeatherSet.from_files(dir_path=self.dtk_dir_all, mmap=True)
+        ws.to_csv(file_path=self.test_dir.joinpath("expected.csv"), node_column="ids")
+        self.assertIsNone(ws.to_csv(file_path=self.test_dir.joinpath("actual.csv"), node_column="ids", chunk_size=50))
+        self.assertEqual(self.test_dir.joinpath("expected.csv").read_text(),
+                         self.test_dir.joinpath("actual.csv").read_text())
+
     def test_load_df_save(self):
         ws1 = WeatherSet.from_files(dir_path=self.dtk_dir, prefix="dtk_15arc")
         ws1.to_csv(file_path=self.test_dir.joinpath("data.csv"))
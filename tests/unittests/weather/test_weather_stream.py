@@ -0,0 +1,124 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+from emodpy_malaria.integrity import index_path, verify
+from emodpy_malaria.weather import *
+
+
+class WeatherStreamTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp(suffix="emodpy_malaria_unittests"))
+        self.csv_file = self.test_dir.joinpath("data.csv")
+        self.weather_columns = {WeatherVariable.AIR_TEMPERATURE: "temp", WeatherVariable.RAINFALL: "rain"}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def make_csv(self, node_count: int = 50, series_len: int = 12, shuffle_steps: bool = True) -> pd.DataFrame:
+        rng = np.random.default_rng(seed=0)
+        patterns = rng.normal(20, 5, size=(5, series_len)).astype(np.float32)
+        pattern_idx = rng.integers(0, len(patterns), size=node_count)
+        nodes = np.repeat(np.arange(1, node_count + 1) * 10, series_len)
+        steps = np.tile(np.arange(1, series_len + 1), node_count)
+        if shuffle_steps:
+            # Rows of each node stay together, but steps of each node are not in order.
+            steps = np.concatenate([rng.permutation(steps[:series_len]) for _ in range(node_count)])
+
+        temp = patterns[pattern_idx[nodes // 10 - 1], steps - 1]
+        df = pd.DataFrame({"nodes": nodes, "steps": steps, "temp": temp, "rain": np.ones(len(nodes))})
+        df.to_csv(self.csv_file, index=False)
+        return df
+
+    def test_stream_same_as_in_memory(self):
+        df = self.make_csv()
+        expected_dir = self.test_dir.joinpath("expected")
+        csv_to_weather(csv_data=df, weather_columns=self.weather_columns, weather_dir=expected_dir)
+
+        for chunk_size in [5, 12, 13, 100, 10000]:
+            actual_dir = self.test_dir.joinpath(f"actual_{chunk_size}")
+            file_names = stream_csv_to_weather(csv_file=self.csv_file,
+                                               weather_dir=actual_dir,
+                                               weather_columns=self.weather_columns,
+                                               chunk_size=chunk_size)
+            for v, n in file_names.items():
+                expected_file, actual_file = expected_dir.joinpath(n), actual_dir.joinpath(n)
+                self.assertEqual(expected_file.read_bytes(), actual_file.read_bytes())
+                self.assertTrue(verify(actual_file, deep=True))
+                expected_wm = WeatherMetadata.from_file(f"{expected_file}.json")
+                actual_wm = WeatherMetadata.from_file(f"{actual_file}.json")
+                self.assertEqual(expected_wm.node_offset_str, actual_wm.node_offset_str)
+
+    def test_csv_to_weather_chunk_size(self):
+        df = self.make_csv()
+        expected = csv_to_weather(csv_data=df, weather_columns=self.weather_columns)
+        actual = csv_to_weather(csv_data=self.csv_file,
+                                weather_columns=self.weather_columns,
+                                weather_dir=self.test_dir.joinpath("weather"),
+                                chunk_size=30)
+
+        self.assertIsInstance(actual[WeatherVariable.AIR_TEMPERATURE].data, np.memmap)
+        for v in self.weather_columns:
+            self.assertTrue(np.array_equal(expected[v].data, actual[v].data))
+            self.assertEqual(expected[v].metadata.node_offsets, actual[v].metadata.node_offsets)
+
+    def test_csv_to_weather_chunk_size_requires_dir(self):
+        self.make_csv()
+        with self.assertRaises(ValueError):
+            csv_to_weather(csv_data=self.csv_file, weather_columns=self.weather_columns, chunk_size=30)
+
+    def test_csv_to_weather_chunk_size_requires_csv(self):
+        df = self.make_csv()
+        with self.assertRaises(ValueError):
+            csv_to_weather(csv_data=df, weather_columns=self.weather_columns,
+                           weather_dir=self.test_dir.joinpath("weather"), chunk_size=30)
+
+    def test_stream_unsorted_nodes(self):
+        df = self.make_csv(shuffle_steps=False)
+        df.iloc[::-1].to_csv(self.csv_file, index=False)
+        weather_dir = self.test_dir.joinpath("weather")
+        for chunk_size in [5, 10000]:
+            with self.assertRaises(ValueError):
+                stream_csv_to_weather(csv_file=self.csv_file,
+                                      weather_dir=weather_dir,
+                                      weather_columns=self.weather_columns,
+                                      chunk_size=chunk_size)
+
+            # No partially written weather or temporary files are left behind.
+            self.assertEqual(list(weather_dir.iterdir()), [])
+
+    def test_stream_failure_keeps_existing_files(self):
+        df = self.make_csv()
+        weather_dir = self.test_dir.joinpath("weather")
+        file_names = stream_csv_to_weather(csv_file=self.csv_file, weather_dir=weather_dir,
+                                           weather_columns=self.weather_columns, chunk_size=30)
+        expected = {n: weather_dir.joinpath(n).read_bytes() for n in file_names.values()}
+
+        df.iloc[::-1].to_csv(self.csv_file, index=False)
+        with self.assertRaises(ValueError):
+            stream_csv_to_weather(csv_file=self.csv_file, weather_dir=weather_dir,
+                                  weather_columns=self.weather_columns, chunk_size=30)
+
+        for n, content in expected.items():
+            self.assertEqual(weather_dir.joinpath(n).read_bytes(), content)
+            self.assertTrue(index_path(weather_dir.joinpath(n)).is_file())
+        self.assertFalse([f for f in weather_dir.iterdir() if f.suffix == ".tmp"])
+
+    def test_stream_different_series_length(self):
+        df = self.make_csv()
+        df.iloc[:-1].to_csv(self.csv_file, index=False)
+        with self.assertRaises(ValueError):
+            stream_csv_to_weather(csv_file=self.csv_file,
+                                  weather_dir=self.test_dir.joinpath("weather"),
+                                  weather_columns=self.weather_columns,
+                                  chunk_size=20)
+
+
+if __name__ == '__main__':
+    unittest.main()